@@ -0,0 +1,41 @@
+"""
+Service providers for the routes.
+
+The services read settings and build their clients when first requested,
+not when the app is imported; main.py requests them from a startup hook so
+the first call does not pay for it. Tests can swap one out through
+app.dependency_overrides.
+"""
+from functools import lru_cache
+
+from app.config import get_settings
+from app.services.job_service import JobManager
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictService
+from app.services.similarity_service import SimilarityService, create_similarity_service
+
+
+@lru_cache()
+def get_openai_service() -> OpenAIService:
+    return OpenAIService()
+
+@lru_cache()
+def get_similarity_service() -> SimilarityService:
+    # Shares the OpenAI service so word similarity scores are cached once
+    return create_similarity_service(get_settings(), get_openai_service())
+
+@lru_cache()
+def get_predict_service() -> PredictService:
+    return PredictService(get_openai_service(), get_similarity_service())
+
+@lru_cache()
+def get_job_manager() -> JobManager:
+    settings = get_settings()
+    return JobManager(
+        get_predict_service().predict_images,
+        max_workers=settings.JOBS_MAX_WORKERS,
+        max_queued=settings.JOBS_MAX_QUEUED,
+        ttl_seconds=settings.JOBS_TTL_SECONDS,
+        max_stored=settings.JOBS_MAX_STORED,
+        endpoint="/api/v1/jobs/predict",
+    )
@@ -0,0 +1,77 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+from fastapi import HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from app.services.metrics import (
+    HTTP_ERRORS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, STAGE_DURATION, current_endpoint,
+)
+
+# When the route handler got the request, to time body parsing and validation up to the endpoint
+_received_at: ContextVar[Optional[float]] = ContextVar("received_at", default=None)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an async endpoint to record the "parse" stage: everything FastAPI did before calling it."""
+    # include_router() rebuilds routes from the already wrapped endpoint
+    if not inspect.iscoroutinefunction(endpoint) or getattr(endpoint, "_timed", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        received_at = _received_at.get()
+        if received_at is not None:
+            STAGE_DURATION.observe(time.perf_counter() - received_at, endpoint=current_endpoint.get(), stage="parse")
+        return await endpoint(*args, **kwargs)
+
+    timed._timed = True
+    return timed
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route that records in-flight requests, response time by status and errors
+    by type, and labels metrics recorded during the request with the route
+    template (see current_endpoint). Streaming responses are timed until
+    their headers are ready.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        endpoint = self.path_format
+
+        async def instrumented_handler(request: Request) -> Response:
+            token = current_endpoint.set(endpoint)
+            start_time = time.perf_counter()
+            _received_at.set(start_time)
+            status = 500
+            HTTP_REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                HTTP_ERRORS.inc(endpoint=endpoint, type=f"http_{status}")
+                raise
+            except RequestValidationError:
+                status = 422
+                HTTP_ERRORS.inc(endpoint=endpoint, type="validation")
+                raise
+            except Exception as e:
+                HTTP_ERRORS.inc(endpoint=endpoint, type=type(e).__name__)
+                raise
+            finally:
+                HTTP_REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start_time, endpoint=endpoint, method=request.method, status=str(status)
+                )
+                current_endpoint.reset(token)
+
+        return instrumented_handler
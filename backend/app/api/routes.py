@@ -1,39 +1,63 @@
-import base64
-import re
+import json
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.api.instrumentation import InstrumentedRoute
 
-router = APIRouter()
-from pydantic import BaseModel, Field, Field, field_validator
+router = APIRouter(route_class=InstrumentedRoute)
+from pydantic import ValidationError
 from datetime import datetime
 
+from app.api.dependencies import get_job_manager, get_openai_service, get_predict_service, get_similarity_service
 from app.services.openai_service import OpenAIService
+from app.services.similarity_service import SimilarityService
 from app.services.predict_service import PredictService
+from app.services.image_service import InvalidImageError
+from app.services.provider_router import OverloadedError, UpstreamResponseError
+from app.services.job_service import Job, JobConflictError, JobManager
 from app.model import (
     ImageInput, PredictionRequest, PredictionResponse, 
-    BaseRequest, BaseResponse, ComparisonRequest, ComparisonResponse
+    BaseRequest, BaseResponse, ComparisonRequest, ComparisonResponse,
+    BatchComparisonRequest, BatchComparisonResponse,
+    JobResponse, JudgeRequest, JudgeResponse, LiveSessionStart, Priority, StrokePath, MAX_BATCH_SIZE, MAX_IMAGE_BYTES
 )
+from app.config import get_settings
+from app.services.live_session import LiveDrawingSession
+from app.services.worker_pool import get_worker_pool
+from app.services.upstream_scheduler import get_upstream_scheduler
+from app.services.http_transport import get_http_transport
+from app.api.uploads import check_content_length, detect_format, read_limited, read_upload
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-openai_service = OpenAIService()
-predict_service = PredictService()
 
 
+def _too_many_requests(e: OverloadedError) -> HTTPException:
+    """429 telling the client when the upstream budget is expected to have room again."""
+    logger.warning("Upstream overloaded: %s", str(e))
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+
+def _bad_gateway(e: UpstreamResponseError) -> HTTPException:
+    """502 for a model answer that could not be used; the validation details stay in the log."""
+    logger.error("Unusable upstream answer: %s", str(e))
+    return HTTPException(status_code=502, detail=str(e))
+
 @router.post("/generate", response_model=BaseResponse)
-async def generate_response(request: BaseRequest):
+async def generate_response(request: BaseRequest, openai_service: OpenAIService = Depends(get_openai_service)):
     logger.info("Received prediction request with %d images", len(request.images))
     try:
         logger.debug("Request data: %s", request)
         response = await openai_service.generate_response(request.prompt)
         return BaseResponse(response=response)
+    except OverloadedError as e:
+        raise _too_many_requests(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/predict", response_model=PredictionResponse)
-async def predict_images(request: PredictionRequest):
+async def predict_images(request: PredictionRequest, predict_service: PredictService = Depends(get_predict_service)):
     """
     Process images and return predictions using OpenAI's Vision API.
 
@@ -48,7 +72,7 @@ async def predict_images(request: PredictionRequest):
         if not request.images:
             raise HTTPException(status_code=400, detail="No images provided in request")
 
-        if any(not img.base64_data for img in request.images):
+        if any(not (img.base64_data or img.strokes) for img in request.images):
             raise HTTPException(status_code=400, detail="Invalid image data provided")
 
         # Process images and get predictions
@@ -57,8 +81,46 @@ async def predict_images(request: PredictionRequest):
         logger.debug("Response data: %s", response)
         return response
 
-    except ValueError as e:
-        logger.error("ValueError: %s", str(e))
+    except OverloadedError as e:
+        raise _too_many_requests(e)
+    except InvalidImageError as e:
+        logger.error("Invalid image: %s", str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamResponseError as e:
+        raise _bad_gateway(e)
+    except Exception as e:
+        logger.error("Exception: %s", str(e))
+        raise HTTPException(
+            status_code=500, detail=f"Error processing image prediction: {str(e)}"
+        )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/predict/stream")
+async def predict_images_stream(
+    request: PredictionRequest, predict_service: PredictService = Depends(get_predict_service)
+):
+    """
+    Server-Sent Events variant of /predict. Each image is sent as soon as it is done.
+
+    Events:
+    - partial: {"image_id", "label"} top-1 label, before the full prediction is finished
+    - prediction: an ImagePrediction
+    - error: {"image_id", "error_message"} for an image that could not be predicted,
+      or {"error_message"} alone if the whole request failed before the summary
+    - summary: {"request_id", "status", "total_images", "reused", "failed", ...}, always last
+    """
+    if not request.images:
+        raise HTTPException(status_code=400, detail="No images provided in request")
+    if any(not (img.base64_data or img.strokes) for img in request.images):
+        raise HTTPException(status_code=400, detail="Invalid image data provided")
+
+    # Decode the images before the response starts, so bad input still gets a 400
+    try:
+        stream = await predict_service.predict_images_stream(request)
+    except InvalidImageError as e:
+        logger.error("Invalid image: %s", str(e))
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("Exception: %s", str(e))
@@ -66,8 +128,291 @@ async def predict_images(request: PredictionRequest):
             status_code=500, detail=f"Error processing image prediction: {str(e)}"
         )
 
+    async def events():
+        try:
+            async for event, data in stream:
+                yield _sse(event, data)
+        except Exception as e:
+            logger.error("Exception while streaming: %s", str(e))
+            yield _sse("error", {"error_message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _predict_uploaded(
+    predict_service: PredictService, images: List[ImageInput], image_bytes: List[bytes], model: str, top_k: int,
+    confidence_threshold: float, session_id: Optional[str], priority: Priority
+) -> PredictionResponse:
+    """Run already-validated raw uploads through the same pipeline as /predict."""
+    # Uploads are already validated by magic bytes and size, so skip the base64 validators
+    request = PredictionRequest.model_construct(
+        images=images,
+        model=model,
+        top_k=top_k,
+        confidence_threshold=confidence_threshold,
+        session_id=session_id,
+        priority=priority,
+    )
+    try:
+        response = await predict_service.predict_images(request, image_bytes=image_bytes)
+        logger.info("Successfully processed upload prediction request")
+        return response
+    except OverloadedError as e:
+        raise _too_many_requests(e)
+    except InvalidImageError as e:
+        logger.error("Invalid image: %s", str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamResponseError as e:
+        raise _bad_gateway(e)
+    except Exception as e:
+        logger.error("Exception: %s", str(e))
+        raise HTTPException(
+            status_code=500, detail=f"Error processing image prediction: {str(e)}"
+        )
+
+@router.post("/predict/upload", response_model=PredictionResponse)
+async def predict_upload(
+    files: List[UploadFile] = File(description="Raw image files (PNG, JPEG or GIF)"),
+    model: str = Form(description="Model to use for prediction"),
+    top_k: int = Form(default=3, ge=1, le=10),
+    confidence_threshold: float = Form(default=0.1, ge=0.0, le=1.0),
+    session_id: Optional[str] = Form(default=None),
+    priority: Priority = Form(default="normal"),
+    image_ids: Optional[List[str]] = Form(default=None, description="Image ids in file order; defaults to file names"),
+    predict_service: PredictService = Depends(get_predict_service),
+):
+    """
+    Multipart variant of /predict that takes raw image bytes instead of base64 JSON.
+
+    Returns:
+    - PredictionResponse: Same as /predict
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No images provided in request")
+    if len(files) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch size exceeds {MAX_BATCH_SIZE} images")
+    if image_ids is not None and len(image_ids) != len(files):
+        raise HTTPException(status_code=400, detail="image_ids must match the number of files")
+
+    images, image_bytes = [], []
+    for idx, upload in enumerate(files):
+        data = await read_upload(upload)
+        image_id = image_ids[idx] if image_ids else (upload.filename or f"image_{idx}")
+        images.append(ImageInput.model_construct(image_id=image_id, base64_data="", format=detect_format(data)))
+        image_bytes.append(data)
+
+    return await _predict_uploaded(predict_service, images, image_bytes, model, top_k, confidence_threshold, session_id, priority)
+
+@router.post("/predict/raw", response_model=PredictionResponse)
+async def predict_raw(
+    request: Request,
+    model: str = Query(description="Model to use for prediction"),
+    image_id: str = Query(default="image_0"),
+    top_k: int = Query(default=3, ge=1, le=10),
+    confidence_threshold: float = Query(default=0.1, ge=0.0, le=1.0),
+    session_id: Optional[str] = Query(default=None),
+    priority: Priority = Query(default="normal"),
+    predict_service: PredictService = Depends(get_predict_service),
+):
+    """
+    Single-image variant of /predict taking an application/octet-stream body.
+    Metadata is passed as query parameters.
+
+    Returns:
+    - PredictionResponse: Same as /predict
+    """
+    check_content_length(request.headers.get("content-length"), MAX_IMAGE_BYTES)
+    data = await read_limited(request.stream())
+    image = ImageInput.model_construct(image_id=image_id, base64_data="", format=detect_format(data))
+    return await _predict_uploaded(predict_service, [image], [data], model, top_k, confidence_threshold, session_id, priority)
+
+async def _receive_object(websocket: WebSocket) -> dict:
+    """Next frame as a JSON object; ValueError for bad JSON, non-objects and binary frames."""
+    try:
+        text = await websocket.receive_text()
+    except KeyError:
+        # Starlette looks up the "text" key of the frame, which binary frames lack
+        raise ValueError("expected a text frame")
+    message = json.loads(text)
+    if not isinstance(message, dict):
+        raise ValueError("expected a JSON object")
+    return message
+
+@router.websocket("/ws/draw")
+async def live_drawing(websocket: WebSocket, predict_service: PredictService = Depends(get_predict_service)):
+    """
+    Live drawing session fed by stroke deltas instead of full PNG uploads.
+
+    Client messages:
+    - {"type": "start", "model", "top_k", "width", "height", "session_id"} (first message)
+    - {"type": "stroke", "path": CanvasPath}
+    - {"type": "clear"}
+    - {"type": "predict"} to predict immediately
+
+    Server messages:
+    - {"type": "ready", "session_id"}
+    - {"type": "prediction", "version", "prediction": ImagePrediction, "latency_ms"}
+    - {"type": "error", "error_message"}
+    """
+    await websocket.accept()
+    settings = get_settings()
+    session = None
+
+    async def send(message: dict) -> None:
+        await websocket.send_json(message)
+
+    try:
+        try:
+            start = LiveSessionStart.model_validate(await _receive_object(websocket))
+        except (ValidationError, ValueError) as e:
+            await send({"type": "error", "error_message": f"Invalid start message: {str(e)}"})
+            await websocket.close(code=1008)
+            return
+
+        session = LiveDrawingSession(
+            predict_service, send,
+            model=start.model,
+            top_k=start.top_k,
+            width=start.width,
+            height=start.height,
+            session_id=start.session_id,
+            canvas_size=settings.LIVE_CANVAS_SIZE,
+            debounce_ms=settings.LIVE_DEBOUNCE_MS,
+            min_change_ratio=settings.LIVE_MIN_CHANGE_RATIO,
+        )
+        await send({"type": "ready", "session_id": session.session_id})
+
+        while True:
+            try:
+                message = await _receive_object(websocket)
+            except ValueError as e:
+                # Malformed frames (bad JSON, non-objects, binary frames) are answered, not fatal
+                await send({"type": "error", "error_message": f"Invalid message: {str(e)}"})
+                continue
+            kind = message.get("type")
+            try:
+                if kind == "stroke":
+                    session.add_stroke(StrokePath.model_validate(message.get("path")))
+                elif kind == "clear":
+                    session.clear()
+                elif kind == "predict":
+                    session.request_prediction()
+                else:
+                    await send({"type": "error", "error_message": f"Unknown message type: {kind}"})
+            except ValidationError as e:
+                await send({"type": "error", "error_message": f"Invalid {kind} message: {str(e)}"})
+
+    except WebSocketDisconnect:
+        logger.info("Live drawing session disconnected")
+    finally:
+        if session is not None:
+            logger.info("Live drawing session stats: %s", session.stats())
+            session.close()
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+def _job_response(job: Job, job_manager: JobManager) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=_timestamp(job.created_at),
+        started_at=_timestamp(job.started_at),
+        finished_at=_timestamp(job.finished_at),
+        expires_at=_timestamp(job.finished_at + job_manager.ttl_seconds if job.finished_at else None),
+        result=job.result,
+        error_message=job.error_message,
+        error_status=job.error_status,
+        retry_after=job.retry_after,
+    )
+
+@router.post("/jobs/predict", response_model=JobResponse, status_code=202)
+async def submit_prediction_job(
+    request: PredictionRequest,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Queue a /predict request and return right away with the job to poll.
+
+    The prediction runs in the background, so it survives proxy timeouts and
+    client disconnects. Send an Idempotency-Key header to make retries safe:
+    the same key and request return the job already created (unless it
+    failed); the same key with another request is rejected with 409.
+    """
+    if not request.images:
+        raise HTTPException(status_code=400, detail="No images provided in request")
+    if any(not (img.base64_data or img.strokes) for img in request.images):
+        raise HTTPException(status_code=400, detail="Invalid image data provided")
+
+    try:
+        job = await job_manager.submit(request, idempotency_key)
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except OverloadedError as e:
+        raise _too_many_requests(e)
+    logger.info("Queued prediction job %s", job.id)
+    return _job_response(job, job_manager)
+
+@router.get("/jobs/stats")
+async def job_stats(job_manager: JobManager = Depends(get_job_manager)):
+    """
+    Report background job queue depth, outcomes, deduplicated submissions and timings.
+    """
+    return job_manager.stats()
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for the job to finish before answering"),
+    job_manager: JobManager = Depends(get_job_manager),
+):
+    """
+    Get a job's status, and its result once finished. With wait, the answer is
+    held until the job finishes or the wait (capped by JOBS_MAX_WAIT_SECONDS) runs out.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    await job_manager.wait(job, min(wait, get_settings().JOBS_MAX_WAIT_SECONDS))
+    return _job_response(job, job_manager)
+
+@router.post("/judge", response_model=JudgeResponse)
+async def judge_drawing(request: JudgeRequest, predict_service: PredictService = Depends(get_predict_service)):
+    """
+    Predict what a drawing shows and how close each label is to the topic, in one round trip.
+
+    Parameters:
+    - request (JudgeRequest): The drawing, the topic it should show and prediction parameters
+
+    Returns:
+    - JudgeResponse: Top predictions, each with its similarity to the topic
+    """
+    try:
+        response = await predict_service.judge(request)
+        logger.info("Successfully judged drawing")
+        return response
+
+    except OverloadedError as e:
+        raise _too_many_requests(e)
+    except InvalidImageError as e:
+        logger.error("Invalid image: %s", str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except UpstreamResponseError as e:
+        raise _bad_gateway(e)
+    except Exception as e:
+        logger.error("Exception: %s", str(e))
+        raise HTTPException(
+            status_code=500, detail=f"Error judging drawing: {str(e)}"
+        )
+
 @router.post("/compare", response_model=ComparisonResponse)
-async def compare_words(request: ComparisonRequest):
+async def compare_words(
+    request: ComparisonRequest, similarity_service: SimilarityService = Depends(get_similarity_service)
+):
     """
     Compare the semantic similarity between two words.
     
@@ -78,8 +423,102 @@ async def compare_words(request: ComparisonRequest):
     - ComparisonResponse: Similarity score between 0 and 1
     """
     try:
-        similarity = await openai_service.compare_semantics(request.word1, request.word2)
+        similarity = await similarity_service.compare(request.word1, request.word2)
         return ComparisonResponse(similarity=similarity)
+    except OverloadedError as e:
+        raise _too_many_requests(e)
     except Exception as e:
         logger.error("Error in semantic comparison: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/compare/batch", response_model=BatchComparisonResponse)
+async def compare_words_batch(
+    request: BatchComparisonRequest, similarity_service: SimilarityService = Depends(get_similarity_service)
+):
+    """
+    Compare one reference word with many candidates in a single model call.
+
+    Parameters:
+    - request (BatchComparisonRequest): Reference word and the candidates to score
+
+    Returns:
+    - BatchComparisonResponse: Similarity score for each candidate, in request order
+    """
+    try:
+        similarities = await similarity_service.compare_batch(request.reference, request.candidates)
+        return BatchComparisonResponse(
+            reference=request.reference,
+            candidates=request.candidates,
+            results=[ComparisonResponse(similarity=similarity) for similarity in similarities],
+        )
+    except OverloadedError as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        logger.error("Error in batched semantic comparison: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def cache_stats(
+    predict_service: PredictService = Depends(get_predict_service),
+    openai_service: OpenAIService = Depends(get_openai_service),
+    similarity_service: SimilarityService = Depends(get_similarity_service),
+):
+    """
+    Report prediction cache and near-duplicate reuse counters.
+    """
+    if predict_service.cache is None:
+        stats = {"enabled": False}
+    else:
+        stats = {"enabled": True, **predict_service.cache.stats()}
+    if predict_service.near_duplicates is not None:
+        stats["near_duplicates"] = predict_service.near_duplicates.stats()
+    stats["predict_in_flight"] = predict_service.in_flight.stats()
+    stats["compare_in_flight"] = openai_service.compare_in_flight.stats()
+    if openai_service.similarity_cache is not None:
+        stats["similarity"] = openai_service.similarity_cache.stats()
+    stats["similarity_backend"] = similarity_service.stats()
+    return stats
+
+@router.get("/workers/stats")
+async def worker_stats():
+    """
+    Report image worker pool queue depth and utilization.
+    """
+    return get_worker_pool().stats()
+
+@router.get("/batching/stats")
+async def batching_stats(predict_service: PredictService = Depends(get_predict_service)):
+    """
+    Report micro-batching fill ratio and added queueing delay.
+    """
+    if predict_service.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **predict_service.batcher.stats()}
+
+@router.get("/cascade/stats")
+async def cascade_stats(predict_service: PredictService = Depends(get_predict_service)):
+    """
+    Report small/large model latency, token usage and escalation rate of the model cascade.
+    """
+    return predict_service.cascade.stats()
+
+@router.get("/providers/stats")
+async def provider_stats(predict_service: PredictService = Depends(get_predict_service)):
+    """
+    Report per-provider latency percentiles, hedge delays, circuit state and retries.
+    """
+    return predict_service.router.stats()
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """
+    Report upstream budget levels, queue depth and wait times per priority.
+    """
+    return get_upstream_scheduler().stats()
+
+@router.get("/transport/stats")
+async def transport_stats():
+    """
+    Report the shared HTTP connection pool: open/idle connections, handshakes and warmups.
+    """
+    return get_http_transport().stats()
@@ -0,0 +1,53 @@
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException, UploadFile
+from app.model import MAX_IMAGE_BYTES
+from app.services.image_service import sniff_image_format
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_limited(chunks: AsyncIterator[bytes], limit: int = MAX_IMAGE_BYTES) -> bytes:
+    """Accumulate a byte stream, rejecting it as soon as it grows past the limit."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            raise HTTPException(status_code=413, detail=f"Image size exceeds {limit // (1024 * 1024)}MB limit")
+    return bytes(buffer)
+
+
+async def _iter_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def read_upload(upload: UploadFile, limit: int = MAX_IMAGE_BYTES) -> bytes:
+    """
+    Read a multipart file part, rejecting it when it is over the limit.
+
+    Starlette has already received and spooled the whole part (in memory or a
+    temporary file) before the route runs, so this bounds what is decoded and
+    sent upstream, not what is received; BodySizeLimitMiddleware bounds that.
+    """
+    if upload.size is not None and upload.size > limit:
+        raise HTTPException(status_code=413, detail=f"Image size exceeds {limit // (1024 * 1024)}MB limit")
+    return await read_limited(_iter_upload(upload), limit)
+
+
+def check_content_length(value: Optional[str], limit: int) -> None:
+    """Reject a request up front when its declared length is already too large."""
+    if value is not None and value.isdigit() and int(value) > limit:
+        raise HTTPException(status_code=413, detail="Request body too large")
+
+
+def detect_format(data: bytes) -> str:
+    """Validate an uploaded image by its magic bytes and return its mime type."""
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    mime_type = sniff_image_format(data)
+    if mime_type is None:
+        raise HTTPException(status_code=415, detail="Unsupported image format, expected PNG, JPEG or GIF")
+    return mime_type
@@ -8,27 +8,172 @@ logger = logging.getLogger(__name__)
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
     GEMINI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    GEMINI_BASE_URL: str = "https://generativelanguage.googleapis.com/v1beta"
     MODEL_NAME: str = "gpt-4o-2024-08-06"
-    GEMINI_MODEL_NAME: str = "gemini-pro-vision"
+    GEMINI_MODEL_NAME: str = "gemini-1.5-flash"
     MAX_TOKENS: int = 1000
     TEMPERATURE: float = 0.8
     ENV: str = "development"
 
+    # Largest accepted request body: 10 images x 4MB, base64-inflated, plus JSON overhead
+    MAX_REQUEST_BODY_BYTES: int = 56 * 1024 * 1024
+
+    # Resolution vector strokes are rendered at (requests with "strokes" instead of base64_data)
+    STROKE_RASTER_SIZE: int = 256
+
+    # Live drawing WebSocket sessions
+    LIVE_CANVAS_SIZE: int = 256
+    LIVE_DEBOUNCE_MS: int = 400
+    LIVE_MIN_CHANGE_RATIO: float = 0.002
+
+    # Worker pool for CPU-bound image work ("thread" or "process")
+    WORKER_POOL_KIND: str = "thread"
+    WORKER_POOL_SIZE: int = 4
+
+    # Prediction fan-out
+    PREDICT_FAN_OUT: bool = True
+    PREDICT_MAX_CONCURRENCY: int = 4
+    PREDICT_MAX_TOKENS_PER_IMAGE: int = 300
+
+    # Provider routing ("openai" or "gemini", chosen by the request's model field).
+    # A call still running after the provider's PROVIDER_HEDGE_PERCENTILE latency
+    # (clamped to the min/max delay) is also started on the other provider
+    PROVIDER_DEFAULT: str = "openai"
+    PROVIDER_HEDGE_ENABLED: bool = True
+    PROVIDER_HEDGE_PERCENTILE: float = 0.95
+    PROVIDER_HEDGE_MIN_SAMPLES: int = 20
+    PROVIDER_HEDGE_MIN_DELAY_MS: int = 500
+    PROVIDER_HEDGE_MAX_DELAY_MS: int = 8000
+    PROVIDER_LATENCY_WINDOW: int = 500
+    PROVIDER_TIMEOUT_SECONDS: float = 30
+    PROVIDER_MAX_RETRIES: int = 2
+    PROVIDER_RETRY_BASE_MS: int = 200
+    PROVIDER_RETRY_MAX_MS: int = 2000
+    PROVIDER_BREAKER_FAILURES: int = 5
+    PROVIDER_BREAKER_RESET_SECONDS: int = 30
+
+    # Admission control for upstream calls: request/token budgets per provider (0 = unlimited),
+    # served by priority (final > normal > preview > background). Calls that cannot be admitted
+    # within their priority's queue deadline are rejected with 429 and Retry-After
+    ADMISSION_ENABLED: bool = True
+    OPENAI_RPM_LIMIT: int = 500
+    OPENAI_TPM_LIMIT: int = 30000
+    GEMINI_RPM_LIMIT: int = 1000
+    GEMINI_TPM_LIMIT: int = 4000000
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_DEADLINE_FINAL_MS: int = 15000
+    ADMISSION_DEADLINE_NORMAL_MS: int = 5000
+    ADMISSION_DEADLINE_PREVIEW_MS: int = 1000
+    ADMISSION_DEADLINE_BACKGROUND_MS: int = 60000
+
+    # Model cascade: requests that are not final go to the small model first and are
+    # escalated to the large model only if its top confidence is below the threshold
+    CASCADE_ENABLED: bool = False
+    CASCADE_SMALL_MODEL_NAME: str = "gpt-4o-mini"
+    GEMINI_SMALL_MODEL_NAME: str = "gemini-1.5-flash-8b"
+    CASCADE_CONFIDENCE_THRESHOLD: float = 0.6
+
+    # Micro-batching of single-image calls across clients
+    MICRO_BATCH_ENABLED: bool = False
+    MICRO_BATCH_WINDOW_MS: int = 50
+    MICRO_BATCH_MAX_SIZE: int = 8
+    MICRO_BATCH_FALLBACK_TO_DIRECT: bool = True
+
+    # Prediction cache ("memory", "sqlite" or "none")
+    PREDICTION_CACHE_BACKEND: str = "memory"
+    PREDICTION_CACHE_TTL_SECONDS: int = 3600
+    PREDICTION_CACHE_MAX_ENTRIES: int = 2048
+    PREDICTION_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    PREDICTION_CACHE_SQLITE_PATH: str = "prediction_cache.sqlite3"
+
+    # Canonical forms for compare: identical canonical words score 1.0 without a model call.
+    # LEXICON_ALIASES_PATH adds {"canonical": ["alias", ...]} entries to the built-in aliases
+    LEXICAL_FAST_PATH_ENABLED: bool = True
+    LEXICON_ALIASES_PATH: Optional[str] = None
+
+    # Word similarity backend ("llm", "embedding" or "hybrid"). The embedding table is a
+    # memory-mapped .npy matrix of unit vectors plus a vocabulary file, one word per line
+    SIMILARITY_BACKEND: str = "llm"
+    EMBEDDING_VECTORS_PATH: str = "embeddings/vectors.npy"
+    EMBEDDING_VOCAB_PATH: str = "embeddings/vocab.txt"
+    # hybrid: embedding scores inside this band are re-scored by the LLM
+    EMBEDDING_HYBRID_MIN: float = 0.35
+    EMBEDDING_HYBRID_MAX: float = 0.75
+
+    # Word similarity cache, shared by /compare, /compare/batch and /judge
+    # ("memory", "tiered" = memory in front of SQLite, or "none"); "tiered" writes
+    # SIMILARITY_CACHE_SQLITE_PATH, so it is opt-in
+    SIMILARITY_CACHE_BACKEND: str = "memory"
+    SIMILARITY_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    SIMILARITY_CACHE_MAX_ENTRIES: int = 100000
+    SIMILARITY_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    SIMILARITY_CACHE_SQLITE_PATH: str = "similarity_cache.sqlite3"
+    SIMILARITY_CACHE_DISK_MAX_ENTRIES: int = 1000000
+    SIMILARITY_CACHE_DISK_MAX_BYTES: int = 64 * 1024 * 1024
+    # JSON file of {"topics": [...], "labels": [...]}; every topic x label pair is
+    # scored in the background at startup so round scoring hits the cache
+    SIMILARITY_WARMUP_PATH: Optional[str] = None
+    SIMILARITY_WARMUP_CONCURRENCY: int = 2
+
+    # Near-duplicate reuse for incremental canvas snapshots (per session_id)
+    NEAR_DUPLICATE_ENABLED: bool = True
+    NEAR_DUPLICATE_HASH_SIZE: int = 8
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 4
+    NEAR_DUPLICATE_WINDOW: int = 20
+    NEAR_DUPLICATE_TTL_SECONDS: int = 600
+    NEAR_DUPLICATE_MAX_SESSIONS: int = 1000
+
+    # Image preprocessing before provider upload
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_MAX_EDGE: int = 512
+    IMAGE_TRIM_MARGINS: bool = True
+    IMAGE_GRAYSCALE: bool = False
+    IMAGE_OUTPUT_FORMAT: str = "png"  # png, jpeg or webp
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_DETAIL: str = "low"  # OpenAI vision detail: low, high or auto
+
+    # Provider SDKs are imported and their clients built on first use; with warmup enabled
+    # that happens in a background task right after startup instead of on the first request
+    PROVIDER_WARMUP_ENABLED: bool = True
+
+    # Pooled HTTP transport shared by every provider client. With warmup enabled, HTTP_WARMUP_CONNECTIONS
+    # connections per upstream are opened at startup and again every HTTP_WARMUP_INTERVAL_SECONDS (0 = once)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    HTTP2_ENABLED: bool = False  # needs the h2 package
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5
+    HTTP_TIMEOUT_PREDICT_SECONDS: float = 30
+    HTTP_TIMEOUT_COMPARE_SECONDS: float = 10
+    HTTP_WARMUP_CONNECTIONS: int = 2
+    HTTP_WARMUP_INTERVAL_SECONDS: float = 45
+
+    # Background prediction jobs (/api/v1/jobs): JOBS_MAX_WORKERS jobs run at once, at most JOBS_MAX_QUEUED
+    # wait (then 429), finished jobs are kept JOBS_TTL_SECONDS (the oldest go first beyond JOBS_MAX_STORED);
+    # polls wait at most JOBS_MAX_WAIT_SECONDS
+    JOBS_MAX_WORKERS: int = 2
+    JOBS_MAX_QUEUED: int = 100
+    JOBS_TTL_SECONDS: int = 3600
+    JOBS_MAX_STORED: int = 1000
+    JOBS_MAX_WAIT_SECONDS: float = 30
+
+    # How often the event loop lag probe behind the event_loop_lag_seconds metric runs (0 = off)
+    EVENT_LOOP_LAG_INTERVAL_MS: int = 100
+
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
         case_sensitive = True
 
-    @classmethod
-    def validate_environment(cls) -> None:
+    def validate_environment(self) -> None:
         """Validate that required environment variables are set."""
-        settings = cls()
         missing_vars = []
         
-        if not settings.OPENAI_API_KEY:
+        if not self.OPENAI_API_KEY:
             missing_vars.append("OPENAI_API_KEY")
         
-        if not settings.GEMINI_API_KEY:
+        if not self.GEMINI_API_KEY:
             missing_vars.append("GEMINI_API_KEY")
         
         if missing_vars:
@@ -42,7 +187,7 @@ def get_settings() -> Settings:
     """Get cached settings instance with validation."""
     try:
         settings = Settings()
-        Settings.validate_environment()
+        settings.validate_environment()
         logger.info(f"Loading settings for environment: {settings.ENV}")
         return settings
     except Exception as e:
@@ -1,7 +1,13 @@
+import asyncio
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.dependencies import get_job_manager, get_openai_service, get_predict_service, get_similarity_service
 from app.api.routes import router as api_router
 from app.config import Settings, get_settings
+from app.middleware import BodySizeLimitMiddleware
+from app.services.http_transport import get_http_transport
+from app.services.metrics import REGISTRY, monitor_event_loop_lag
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +25,62 @@ async def validate_config():
         logger.error(f"Configuration validation failed: {str(e)}")
         raise
 
+# Build the services (and their caches and clients) before the first request instead of during it
+@app.on_event("startup")
+async def build_services():
+    get_job_manager()
+
+# Precompute topic x label similarities in the background so startup is not delayed
+@app.on_event("startup")
+async def warm_similarity_cache():
+    settings = get_settings()
+    if settings.SIMILARITY_WARMUP_PATH:
+        app.state.similarity_warmup = asyncio.ensure_future(get_similarity_service().warm_up_from_file(
+            settings.SIMILARITY_WARMUP_PATH, settings.SIMILARITY_WARMUP_CONCURRENCY
+        ))
+
+# Provider SDKs are imported lazily; load them and open upstream connections in the
+# background so the port is bound right away
+@app.on_event("startup")
+async def warm_up_providers():
+    if get_settings().PROVIDER_WARMUP_ENABLED:
+        app.state.provider_warmup = asyncio.ensure_future(_warm_up_providers())
+
+async def _warm_up_providers():
+    await get_predict_service().router.warm_up()
+    await get_http_transport().keep_warm()
+
+# Feeds event_loop_lag_seconds: blocking work on the loop shows up as late wakeups
+@app.on_event("startup")
+async def start_event_loop_lag_probe():
+    interval_ms = get_settings().EVENT_LOOP_LAG_INTERVAL_MS
+    if interval_ms > 0:
+        app.state.event_loop_lag_probe = asyncio.ensure_future(monitor_event_loop_lag(interval_ms / 1000))
+
+# Queued and running jobs fail with 503 instead of hanging their long-polls
+@app.on_event("shutdown")
+async def stop_jobs():
+    await get_job_manager().close()
+
+# SQLite caches buffer hit access times; write them so LRU order survives the restart
+@app.on_event("shutdown")
+async def flush_caches():
+    for cache in (get_predict_service().cache, get_openai_service().similarity_cache):
+        if cache is not None:
+            cache.flush()
+
+@app.on_event("shutdown")
+async def close_http_transport():
+    for task_name in ("provider_warmup", "event_loop_lag_probe"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    await get_http_transport().aclose()
+
+# Reject oversized bodies while they stream in, before any parsing. Added before CORS so
+# CORSMiddleware wraps it and its 413 still carries the CORS headers browsers need to read it
+app.add_middleware(BodySizeLimitMiddleware)
+
 # CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -44,4 +106,9 @@ async def health_check():
         raise HTTPException(
             status_code=500,
             detail="Application configuration error"
-        )
\ No newline at end of file
+        )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
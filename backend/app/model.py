@@ -1,47 +1,135 @@
-import base64
 import re
-from typing import List, Optional
-from pydantic import BaseModel, Field, Field, field_validator
-from app.services.openai_service import OpenAIService
+from typing import List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, field_validator, model_validator
+from app.services.lexicon import normalize_word
 from datetime import datetime
 
+MAX_IMAGE_BYTES = 1024 * 1024 * 4  # 4MB per decoded image
+MAX_BATCH_SIZE = 10
+MAX_COMPARE_CANDIDATES = 50
+
+# "preview": interim guesses while drawing, "final": the scored submission
+Priority = Literal["preview", "normal", "final"]
+
+MAX_STROKE_POINTS = 50000  # per image, across all strokes
+
+DATA_URL_PREFIX = re.compile(r"^data:image/[a-zA-Z]+;base64,")
+# Line-wrapped base64 (MIME, PEM style) is accepted; the whitespace is dropped before validation
+BASE64_WHITESPACE = re.compile(r"[ \t\r\n\f\v]+")
+
+class StrokePath(BaseModel):
+    """One stroke as emitted by the drawing canvas (react-sketch-canvas CanvasPath)"""
+
+    model_config = {"populate_by_name": True}
+
+    paths: List[Tuple[float, float]] = Field(
+        description="Points of the stroke in drawing order, in canvas pixels, as {x, y} objects or [x, y] pairs",
+        min_length=1,
+        max_length=5000,
+    )
+    stroke_width: float = Field(
+        default=4.0, alias="strokeWidth", gt=0.0, le=200.0, description="Stroke width in canvas pixels"
+    )
+    stroke_color: str = Field(
+        default="black", alias="strokeColor", max_length=32, description="CSS colour of the stroke"
+    )
+    draw_mode: bool = Field(
+        default=True, alias="drawMode", description="False if the stroke was drawn with the eraser"
+    )
+
+    @field_validator("paths", mode="before")
+    def points_as_pairs(cls, v):
+        # The canvas emits {x, y} objects; [x, y] pairs are the compact form
+        if isinstance(v, list) and v and isinstance(v[0], dict):
+            return [(p.get("x"), p.get("y")) if isinstance(p, dict) else p for p in v]
+        return v
+
+    @property
+    def is_eraser(self) -> bool:
+        return not self.draw_mode
+
+
 class ImageInput(BaseModel):
-    """Single image input in Base64 format"""
+    """Single image input, either Base64 image data or the canvas strokes to rasterize"""
 
     image_id: str = Field(
         description="Unique identifier for the image", examples=["img_123abc"]
     )
-    base64_data: str = Field(
+    base64_data: Optional[str] = Field(
+        default=None,
         description="Base64 encoded image data",
         examples=["data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAA..."],
     )
     format: str = Field(
+        default="image/png",
         description="Image format/mime type",
         pattern="^image/(png|jpeg|jpg|gif)$",
         examples=["image/png", "image/jpeg"],
     )
+    strokes: Optional[List[StrokePath]] = Field(
+        default=None,
+        description="Vector strokes as emitted by the drawing canvas, rendered on the server instead of base64_data",
+        max_length=5000,
+    )
+    canvas_width: Optional[float] = Field(
+        default=None, gt=0.0, description="Width of the client canvas the strokes were drawn on, in pixels"
+    )
+    canvas_height: Optional[float] = Field(
+        default=None, gt=0.0, description="Height of the client canvas the strokes were drawn on, in pixels"
+    )
 
     @field_validator("base64_data")
-    def validate_base64(cls, v: str) -> str:
-        # Remove data URL prefix if present
+    def validate_base64(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        # Skip past the data URL prefix if present; the payload is kept as sent
+        # so the upstream data URL can reuse it without another copy
+        start = 0
         if v.startswith("data:"):
-            v = re.sub(r"^data:image/[a-zA-Z]+;base64,", "", v)
+            prefix = DATA_URL_PREFIX.match(v)
+            if prefix:
+                start = prefix.end()
+        if BASE64_WHITESPACE.search(v, start):
+            v = v[:start] + BASE64_WHITESPACE.sub("", v[start:])
 
-        try:
-            # Validate base64 encoding
-            decoded = base64.b64decode(v)
-            if len(decoded) > 1024 * 1024 * 4:  # 4MB limit
-                raise ValueError("Image size exceeds 4MB limit")
-            return v
-        except Exception:
+        # Only O(1) checks here, on the event loop. Decoding, the character set and
+        # the exact size are checked once, in the worker pool, by PredictService
+        length = len(v) - start
+        if length % 4 != 0:
             raise ValueError("Invalid base64 encoding")
+        if length // 4 * 3 - v.count("=", -2) > MAX_IMAGE_BYTES:
+            raise ValueError("Image size exceeds 4MB limit")
+        return v
+
+    @model_validator(mode="after")
+    def validate_source(self) -> "ImageInput":
+        if (self.base64_data is None) == (self.strokes is None):
+            raise ValueError("Exactly one of base64_data or strokes is required")
+        if self.strokes is not None:
+            if not self.strokes:
+                raise ValueError("strokes must contain at least one stroke")
+            if self.canvas_width is None or self.canvas_height is None:
+                raise ValueError("canvas_width and canvas_height are required with strokes")
+            if sum(len(stroke.paths) for stroke in self.strokes) > MAX_STROKE_POINTS:
+                raise ValueError(f"Drawing exceeds {MAX_STROKE_POINTS} points")
+        return self
+
+    def _payload_start(self) -> int:
+        prefix = DATA_URL_PREFIX.match(self.base64_data)
+        return prefix.end() if prefix else 0
+
+    def data_url(self) -> str:
+        """Data URL for the image, reusing the submitted string when it already is one."""
+        if self._payload_start():
+            return self.base64_data
+        return f"data:{self.format};base64,{self.base64_data}"
 
 
 class PredictionRequest(BaseModel):
     """Request model for batch image prediction"""
 
     images: List[ImageInput] = Field(
-        description="List of images to process", max_length=10  # Limit batch size
+        description="List of images to process", max_length=MAX_BATCH_SIZE
     )
     model: str = Field(
         description="Model to use for prediction", examples=["gemni", "openai"]
@@ -58,6 +146,15 @@ class PredictionRequest(BaseModel):
         le=1.0,
         description="Minimum confidence threshold for predictions",
     )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Drawing session (e.g. room/round) used to reuse predictions for near-duplicate snapshots",
+        examples=["room_42:round_3"],
+    )
+    priority: Priority = Field(
+        default="normal",
+        description="Final submissions always use the large model; others may be answered by the model cascade",
+    )
 
 # Removed examples cus openAI api doesn't allow for json parsing
 class PredictionDetail(BaseModel):
@@ -85,7 +182,10 @@ class PredictionDetail(BaseModel):
     def validate_single_word(cls, v: str) -> str:
         if len(v.split()) > 1:
             raise ValueError("Label must be a single word")
-        return v.lower()
+        label = normalize_word(v)
+        if not label:
+            raise ValueError("Label must be a word")
+        return label
 
 
 class ImagePrediction(BaseModel):
@@ -103,6 +203,15 @@ class ImagePrediction(BaseModel):
     processing_time_ms: float = Field(
         description="Time taken to process prediction in milliseconds", ge=0.0
     )
+    reused: bool = Field(
+        default=False,
+        description="True if the prediction was reused instead of calling the model",
+    )
+    reuse_source: Optional[str] = Field(
+        default=None,
+        description="Where a reused prediction came from",
+        pattern="^(cache|near_duplicate)$",
+    )
 
 
 class PredictionResponse(BaseModel):
@@ -125,6 +234,28 @@ class PredictionResponse(BaseModel):
         default=None, description="Error message if status is 'error'"
     )
 
+class JobResponse(BaseModel):
+    """State of a background prediction job"""
+
+    job_id: str = Field(description="Job identifier, used to poll GET /api/v1/jobs/{job_id}")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(description="Job state")
+    created_at: datetime = Field(description="When the job was submitted")
+    started_at: Optional[datetime] = Field(default=None, description="When a worker started the job")
+    finished_at: Optional[datetime] = Field(default=None, description="When the job succeeded or failed")
+    expires_at: Optional[datetime] = Field(
+        default=None, description="When the finished job and its result are deleted"
+    )
+    result: Optional[PredictionResponse] = Field(
+        default=None, description="Predictions, once the job has succeeded"
+    )
+    error_message: Optional[str] = Field(default=None, description="Why the job failed")
+    error_status: Optional[int] = Field(
+        default=None, description="HTTP status the synchronous endpoint would have answered the failure with"
+    )
+    retry_after: Optional[float] = Field(
+        default=None, description="Seconds to wait before resubmitting, for failures with error_status 429"
+    )
+
 class BaseRequest(BaseModel):
     """Base response model for API endpoints"""
 
@@ -135,6 +266,78 @@ class BaseResponse(BaseModel):
 
     response: str = Field(description="Generated response")
 
+class LiveSessionStart(BaseModel):
+    """First message of a live drawing WebSocket session"""
+
+    model: str = Field(description="Model to use for prediction", examples=["openai"])
+    top_k: int = Field(default=3, ge=1, le=10, description="Number of top predictions per update")
+    width: float = Field(gt=0.0, description="Client canvas width in pixels")
+    height: float = Field(gt=0.0, description="Client canvas height in pixels")
+    session_id: Optional[str] = Field(
+        default=None, description="Drawing session (e.g. room/round); generated if omitted"
+    )
+
+
+class JudgeRequest(BaseModel):
+    """Request model for judging a drawing against its topic"""
+
+    image: ImageInput = Field(description="Drawing to judge")
+    topic: str = Field(description="Word the drawer was asked to draw", min_length=1, examples=["cat"])
+    model: str = Field(
+        description="Model to use for prediction", examples=["gemni", "openai"]
+    )
+    top_k: Optional[int] = Field(
+        default=3,
+        ge=1,
+        le=10,
+        description="Number of top predictions to return",
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Drawing session (e.g. room/round) used to reuse predictions for near-duplicate snapshots",
+        examples=["room_42:round_3"],
+    )
+    priority: Priority = Field(
+        default="final",
+        description="Final submissions always use the large model; others may be answered by the model cascade",
+    )
+
+
+class JudgedPrediction(PredictionDetail):
+    """Prediction for a single label, scored against the topic"""
+
+    similarity: float = Field(
+        description="Semantic similarity between the label and the topic, between 0 and 1", ge=0.0, le=1.0
+    )
+
+
+class JudgeResponse(BaseModel):
+    """Predictions for a drawing plus how close each label is to the topic"""
+
+    request_id: str = Field(description="Unique identifier for the request")
+    status: str = Field(
+        description="Status of the request", pattern="^(success|error)$"
+    )
+    model: str = Field(description="Model used for prediction")
+    topic: str = Field(description="Topic the labels were compared with")
+    image_id: str = Field(description="Unique identifier for the submitted image")
+    predictions: List[JudgedPrediction] = Field(
+        description="Top predictions for the image, each with its similarity to the topic"
+    )
+    processing_time_ms: float = Field(
+        description="Time taken to judge the drawing in milliseconds", ge=0.0
+    )
+    reused: bool = Field(
+        default=False,
+        description="True if the predictions were reused instead of calling the model",
+    )
+    reuse_source: Optional[str] = Field(
+        default=None,
+        description="Where reused predictions came from",
+        pattern="^(cache|near_duplicate)$",
+    )
+
+
 class ComparisonRequest(BaseModel):
     """Request model for semantic comparison"""
     
@@ -145,3 +348,27 @@ class ComparisonResponse(BaseModel):
     """Response model for semantic comparison"""
     
     similarity: float = Field(description="Similarity score between 0 and 1", ge=0.0, le=1.0)
+
+class BatchComparisonRequest(BaseModel):
+    """Request model for scoring many words against one reference word"""
+
+    reference: str = Field(description="Word every candidate is compared with", min_length=1, examples=["cat"])
+    candidates: List[str] = Field(
+        description="Words to compare with the reference",
+        min_length=1,
+        max_length=MAX_COMPARE_CANDIDATES,
+        examples=[["kitten", "dog", "car"]],
+    )
+
+    @field_validator("candidates")
+    def validate_candidates(cls, v: List[str]) -> List[str]:
+        if any(not word.strip() for word in v):
+            raise ValueError("Candidates must not be empty")
+        return v
+
+class BatchComparisonResponse(BaseModel):
+    """Response model for batched semantic comparison"""
+
+    reference: str = Field(description="Word every candidate was compared with")
+    candidates: List[str] = Field(description="Candidates, in request order")
+    results: List[ComparisonResponse] = Field(description="Similarity for each candidate, in request order")
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from loguru import logger
+from app.services.provider_router import UpstreamResponseError
+
+
+class MicroBatcher:
+    """
+    Merge single-item calls from concurrent callers into batched calls.
+
+    Items with the same group key are collected for up to window_ms, or until
+    max_batch_size items are waiting, then sent with one run_batch call. Each
+    caller gets back the result for its own item. run_batch returns results
+    aligned with its items, using None for any item it could not answer; with
+    fallback_to_direct those items (or the whole batch, if the call fails)
+    are retried one by one with run_single.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Optional[Any]]]],
+        run_single: Callable[[Any], Awaitable[Any]],
+        window_ms: int = 50,
+        max_batch_size: int = 8,
+        fallback_to_direct: bool = True,
+    ):
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.fallback_to_direct = fallback_to_direct
+        # group key -> waiting (item, future, enqueued_at)
+        self._queues: Dict[Hashable, List[Tuple[Any, asyncio.Future, float]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # Running batches, referenced so they are not garbage-collected mid-flight
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.fallbacks = 0
+        self.total_queue_delay_ms = 0.0
+
+    async def submit(self, group_key: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(group_key, [])
+        queue.append((item, future, time.monotonic()))
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(group_key)
+        elif len(queue) == 1:
+            self._timers[group_key] = loop.call_later(self.window, self._flush, group_key)
+        return await future
+
+    def _flush(self, group_key: Hashable) -> None:
+        timer = self._timers.pop(group_key, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._queues.pop(group_key, None)
+        if queue:
+            task = asyncio.ensure_future(self._run(queue))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done, queue=queue: self._batch_done(done, queue))
+
+    def _batch_done(self, task: asyncio.Task, queue: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        self._tasks.discard(task)
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        if error is None:
+            return
+        logger.error(f"Batch of {len(queue)} items failed unexpectedly: {error!r}")
+        # Nobody else will answer these callers
+        for _, future, _ in queue:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run(self, queue: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        now = time.monotonic()
+        self.batches += 1
+        self.items += len(queue)
+        self.total_queue_delay_ms += sum(now - enqueued_at for _, _, enqueued_at in queue) * 1000
+
+        items = [item for item, _, _ in queue]
+        futures = [future for _, future, _ in queue]
+        try:
+            if len(items) == 1:
+                results: List[Optional[Any]] = [await self.run_single(items[0])]
+            else:
+                results = await self.run_batch(items)
+        except Exception as e:
+            if not self.fallback_to_direct:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            logger.warning(f"Batched call for {len(items)} items failed, falling back to direct calls: {str(e)}")
+            results = [None] * len(items)
+
+        retries = []
+        for item, future, result in zip(items, futures, results):
+            if future.done():
+                continue
+            if result is not None:
+                future.set_result(result)
+            elif self.fallback_to_direct:
+                retries.append(self._run_direct(item, future))
+            else:
+                future.set_exception(UpstreamResponseError("No result returned for batched item"))
+        if retries:
+            self.fallbacks += len(retries)
+            await asyncio.gather(*retries)
+
+    async def _run_direct(self, item: Any, future: asyncio.Future) -> None:
+        try:
+            result = await self.run_single(item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "waiting": sum(len(queue) for queue in self._queues.values()),
+            "batches": self.batches,
+            "items": self.items,
+            "fallbacks": self.fallbacks,
+            "fill_ratio": self.items / (self.batches * self.max_batch_size) if self.batches else 0.0,
+            "avg_queue_delay_ms": self.total_queue_delay_ms / self.items if self.items else 0.0,
+        }
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+# Relative SQLite cache paths are resolved against this directory, not the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_cache_key(digest: str, namespace: str) -> str:
+    """
+    Content-addressed key: sha256 hex digest of the decoded image bytes,
+    prefixed with a namespace covering everything else that changes the
+    answer (prompt version, model, top_k).
+    """
+    return f"{namespace}:{digest}"
+
+
+def make_pair_key(word1: str, word2: str, namespace: str) -> str:
+    """
+    Symmetric key for a word pair: both words are normalised and sorted so
+    (a, b) and (b, a) share one entry.
+    """
+    first, second = sorted((word1.strip().lower(), word2.strip().lower()))
+    return f"{namespace}:{first}|{second}"
+
+
+class PredictionCache(ABC):
+    """
+    Base class for prediction caches.
+
+    Values are JSON-serialisable lists of prediction dicts so the cache stays
+    independent of the pydantic models and can be persisted as-is. The same
+    classes also hold plain similarity scores for word pairs.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the value stored under key, or None on a miss or once it expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        """Store value under key, evicting the least recently used entries over budget."""
+
+    async def aget(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """get() for callers on the event loop; caches doing I/O run it in a thread."""
+        return self.get(key)
+
+    async def aset(self, key: str, value: List[Dict[str, Any]]) -> None:
+        """set() for callers on the event loop; caches doing I/O run it in a thread."""
+        self.set(key, value)
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every entry."""
+
+    def flush(self) -> None:
+        """Write anything buffered to storage; a no-op for caches that do not buffer."""
+
+    @abstractmethod
+    def _size(self) -> Tuple[int, int]:
+        """Return (entries, bytes) currently held."""
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size_bytes = self._size()
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryPredictionCache(PredictionCache):
+    """In-process LRU cache with TTL and a byte-size budget."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int):
+        super().__init__(ttl_seconds, max_entries, max_bytes)
+        # key -> (expires_at, size, payload)
+        self._entries: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, payload = entry
+            if expires_at < time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(payload)
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        payload = json.dumps(value)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, size, payload)
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _size(self) -> Tuple[int, int]:
+        return len(self._entries), self._bytes
+
+
+class SqlitePredictionCache(PredictionCache):
+    """
+    On-disk cache so hits survive machine restarts. Same LRU/TTL/byte-budget semantics.
+
+    The database is opened on first use. Relative paths are resolved against
+    the backend directory, so the file does not depend on the working
+    directory. Hits do not write: their access times are collected and
+    written in one transaction with the next set(), or once
+    TOUCH_FLUSH_SIZE of them are pending. Entry and byte totals are counted
+    once on open and kept up to date, so eviction never rescans the table.
+    On the event loop, use aget()/aset(), which run in a thread.
+    """
+
+    TOUCH_FLUSH_SIZE = 256
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, max_bytes: int):
+        super().__init__(ttl_seconds, max_entries, max_bytes)
+        self.path = path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._touched: Dict[str, float] = {}
+        self._entries = 0
+        self._bytes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions ("
+                    " key TEXT PRIMARY KEY,"
+                    " payload TEXT NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " expires_at REAL NOT NULL,"
+                    " last_access REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_predictions_last_access ON predictions (last_access)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_predictions_expires_at ON predictions (expires_at)"
+                )
+                conn.commit()
+                self._entries, self._bytes = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions"
+                ).fetchone()
+                self._conn = conn
+            return self._conn
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self._lock:
+            row = self._db().execute(
+                "SELECT payload, size, expires_at FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            payload, size, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                self._conn.commit()
+                self._entries -= 1
+                self._bytes -= size
+                self._touched.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._write_touched()
+                self._conn.commit()
+            self.hits += 1
+            return json.loads(payload)
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        payload = json.dumps(value)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._write_touched()
+            replaced = self._db().execute("SELECT size FROM predictions WHERE key = ?", (key,)).fetchone()
+            if replaced is not None:
+                self._entries -= 1
+                self._bytes -= replaced[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, payload, size, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now + self.ttl_seconds, now),
+            )
+            self._entries += 1
+            self._bytes += size
+            self._delete_expired(now)
+            self._evict()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._db().execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._entries = 0
+            self._bytes = 0
+
+    def flush(self) -> None:
+        """Write pending access times (e.g. before shutdown)."""
+        with self._lock:
+            if self._touched:
+                self._write_touched()
+                self._conn.commit()
+
+    def _write_touched(self) -> None:
+        if self._touched:
+            self._db().executemany(
+                "UPDATE predictions SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _delete_expired(self, now: float) -> None:
+        # Both statements use the expires_at index, so this only touches expired rows
+        entries, size_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions WHERE expires_at < ?", (now,)
+        ).fetchone()
+        if entries:
+            self._conn.execute("DELETE FROM predictions WHERE expires_at < ?", (now,))
+            self._entries -= entries
+            self._bytes -= size_bytes
+
+    def _evict(self) -> None:
+        while self._entries and (self._entries > self.max_entries or self._bytes > self.max_bytes):
+            key, size = self._conn.execute(
+                "SELECT key, size FROM predictions ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            self._conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            self._entries -= 1
+            self._bytes -= size
+            self.evictions += 1
+
+    def _size(self) -> Tuple[int, int]:
+        with self._lock:
+            self._db()
+            return self._entries, self._bytes
+
+
+class TieredCache(PredictionCache):
+    """
+    In-memory LRU in front of a persistent cache. Reads are served from
+    memory when possible; misses fall through to disk and are promoted.
+    Writes go to both tiers, so entries survive restarts.
+    """
+
+    def __init__(self, memory: MemoryPredictionCache, disk: PredictionCache):
+        super().__init__(disk.ttl_seconds, disk.max_entries, disk.max_bytes)
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        # Memory hits never leave the event loop; only misses wait for the disk tier
+        value = self.memory.get(key)
+        if value is None:
+            value = await self.disk.aget(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        await self.disk.aset(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
+
+    def flush(self) -> None:
+        self.disk.flush()
+
+    def _size(self) -> Tuple[int, int]:
+        return self.disk._size()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats(),
+        }
+
+
+def create_prediction_cache(settings) -> Optional[PredictionCache]:
+    """Build the cache backend selected by PREDICTION_CACHE_BACKEND ("memory", "sqlite" or "none")."""
+    backend = settings.PREDICTION_CACHE_BACKEND.lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        logger.info(f"Using SQLite prediction cache at {settings.PREDICTION_CACHE_SQLITE_PATH}")
+        return SqlitePredictionCache(
+            settings.PREDICTION_CACHE_SQLITE_PATH,
+            ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+            max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.PREDICTION_CACHE_MAX_BYTES,
+        )
+    if backend == "memory":
+        return MemoryPredictionCache(
+            ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+            max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+            max_bytes=settings.PREDICTION_CACHE_MAX_BYTES,
+        )
+    raise ValueError(f"Unknown prediction cache backend: {settings.PREDICTION_CACHE_BACKEND}")
+
+
+def create_similarity_cache(settings) -> Optional[PredictionCache]:
+    """
+    Build the word similarity cache selected by SIMILARITY_CACHE_BACKEND:
+    "memory", "tiered" (memory in front of SQLite) or "none".
+    """
+    backend = settings.SIMILARITY_CACHE_BACKEND.lower()
+    if backend == "none":
+        return None
+    memory = MemoryPredictionCache(
+        ttl_seconds=settings.SIMILARITY_CACHE_TTL_SECONDS,
+        max_entries=settings.SIMILARITY_CACHE_MAX_ENTRIES,
+        max_bytes=settings.SIMILARITY_CACHE_MAX_BYTES,
+    )
+    if backend == "memory":
+        return memory
+    if backend == "tiered":
+        logger.info(f"Using tiered similarity cache backed by {settings.SIMILARITY_CACHE_SQLITE_PATH}")
+        return TieredCache(memory, SqlitePredictionCache(
+            settings.SIMILARITY_CACHE_SQLITE_PATH,
+            ttl_seconds=settings.SIMILARITY_CACHE_TTL_SECONDS,
+            max_entries=settings.SIMILARITY_CACHE_DISK_MAX_ENTRIES,
+            max_bytes=settings.SIMILARITY_CACHE_DISK_MAX_BYTES,
+        ))
+    raise ValueError(f"Unknown similarity cache backend: {settings.SIMILARITY_CACHE_BACKEND}")
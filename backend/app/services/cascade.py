@@ -0,0 +1,136 @@
+import time
+from typing import Any, Callable, Dict, Optional, Type
+from pydantic import BaseModel
+from loguru import logger
+from app.services.provider_router import (
+    DeltaCallback, LatencyHistogram, OverloadedError, ProviderResponse, ProviderRouter,
+)
+
+# Top confidence of a parsed structured output; the lowest one across images for batched calls
+ConfidenceFn = Callable[[BaseModel], float]
+
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+class TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.latency = LatencyHistogram()
+        self.tokens = dict.fromkeys(TOKEN_FIELDS, 0)
+
+    def record(self, latency_ms: float, usage: Dict[str, int]) -> None:
+        self.calls += 1
+        self.latency.record(latency_ms)
+        for field in TOKEN_FIELDS:
+            self.tokens[field] += usage.get(field) or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "latency": self.latency.stats(),
+            "tokens": dict(self.tokens),
+            "avg_total_tokens": self.tokens["total_tokens"] / self.calls if self.calls else 0.0,
+        }
+
+
+class ModelCascade:
+    """
+    Two-tier model cascade over the provider router.
+
+    Calls that are not final go to each provider's small model first. If the
+    top confidence of the answer is below confidence_threshold (or the small
+    call fails), the call is escalated to the large model and the small
+    answer is dropped. Final calls, and every call while the cascade is
+    disabled, go straight to the large model.
+
+    Per-tier latency and token usage plus the escalation rate are kept, so
+    the threshold can be tuned: a higher one escalates more often, trading
+    the small model's latency and cost savings for the large model's answers.
+    """
+
+    def __init__(self, router: ProviderRouter, confidence_threshold: float = 0.6, enabled: bool = True):
+        self.router = router
+        self.confidence_threshold = confidence_threshold
+        self.enabled = enabled
+        self.tiers = {"small": TierStats(), "large": TierStats()}
+        self.accepted = 0
+        self.escalations = 0
+        self.direct = 0
+        # End-to-end latency of escalated calls, small attempt included
+        self.escalated_latency = LatencyHistogram()
+
+    def uses_small(self, final: bool) -> bool:
+        return self.enabled and not final
+
+    async def _call(
+        self,
+        tier: str,
+        messages: list,
+        response_format: Type[BaseModel],
+        max_tokens: int,
+        provider: Optional[str],
+        on_delta: Optional[DeltaCallback],
+        priority: str,
+    ) -> ProviderResponse:
+        stats = self.tiers[tier]
+        start_time = time.time()
+        try:
+            response = await self.router.parse(
+                messages, response_format, max_tokens,
+                provider=provider, on_delta=on_delta, small=tier == "small", priority=priority,
+            )
+        except Exception:
+            stats.failures += 1
+            raise
+        stats.record((time.time() - start_time) * 1000, response.usage)
+        return response
+
+    async def parse(
+        self,
+        messages: list,
+        response_format: Type[BaseModel],
+        max_tokens: int,
+        confidence: ConfidenceFn,
+        provider: Optional[str] = None,
+        final: bool = False,
+        on_delta: Optional[DeltaCallback] = None,
+        priority: str = "normal",
+    ) -> ProviderResponse:
+        if not self.uses_small(final):
+            self.direct += 1
+            return await self._call("large", messages, response_format, max_tokens, provider, on_delta, priority)
+
+        start_time = time.time()
+        try:
+            response = await self._call("small", messages, response_format, max_tokens, provider, on_delta, priority)
+            top = confidence(response.parsed)
+            if top >= self.confidence_threshold:
+                self.accepted += 1
+                return response
+            logger.info(f"Small model confidence {top:.2f} below {self.confidence_threshold}, escalating")
+        except OverloadedError:
+            # Escalating would only add load to a saturated budget
+            raise
+        except Exception as e:
+            logger.warning(f"Small model call failed, escalating: {str(e)}")
+
+        self.escalations += 1
+        response = await self._call("large", messages, response_format, max_tokens, provider, on_delta, priority)
+        self.escalated_latency.record((time.time() - start_time) * 1000)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        cascaded = self.accepted + self.escalations
+        return {
+            "enabled": self.enabled,
+            "confidence_threshold": self.confidence_threshold,
+            "cascaded": cascaded,
+            "accepted": self.accepted,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / cascaded if cascaded else 0.0,
+            "direct": self.direct,
+            "escalated_latency": self.escalated_latency.stats(),
+            "tiers": {tier: stats.stats() for tier, stats in self.tiers.items()},
+        }
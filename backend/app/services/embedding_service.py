@@ -0,0 +1,140 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from app.services.cache_service import BACKEND_DIR
+
+# Multi-word phrases ("ice cream", "t-shirt") fall back to the mean of their tokens
+TOKEN_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def _normalize(word: str) -> str:
+    return word.strip().lower()
+
+
+class EmbeddingTable:
+    """
+    Word-embedding lookup backed by a memory-mapped NumPy matrix.
+
+    vectors_path holds a float32 (words x dims) .npy matrix with unit-length
+    rows, vocab_path the matching words, one per line. The matrix is opened
+    with mmap_mode="r", so only the rows that are actually looked up are paged
+    in and several workers share the same page cache. Cosine similarity is a
+    dot product of the unit rows, clamped to the 0-1 range used by /compare.
+    """
+
+    def __init__(self, vectors_path: str, vocab_path: str):
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+        with open(vocab_path, encoding="utf-8") as f:
+            words = [line.rstrip("\n") for line in f]
+        if len(words) != self.vectors.shape[0]:
+            raise ValueError(
+                f"Embedding vocabulary has {len(words)} words but the matrix has {self.vectors.shape[0]} rows"
+            )
+        self.index: Dict[str, int] = {word: row for row, word in enumerate(words)}
+        self.dims = self.vectors.shape[1]
+        logger.info(f"Loaded {len(words)} word embeddings ({self.dims} dims) from {vectors_path}")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, word: str) -> bool:
+        return self.vector(word) is not None
+
+    def vector(self, word: str) -> Optional[np.ndarray]:
+        """Unit vector for a word or phrase, or None if it is out of vocabulary."""
+        word = _normalize(word)
+        row = self.index.get(word)
+        if row is not None:
+            return np.asarray(self.vectors[row], dtype=np.float32)
+
+        tokens = [token for token in TOKEN_SEPARATORS.split(word) if token]
+        rows = [self.index.get(token) for token in tokens]
+        if len(tokens) < 2 or any(row is None for row in rows):
+            return None
+        mean = np.asarray(self.vectors[rows], dtype=np.float32).mean(axis=0)
+        norm = np.linalg.norm(mean)
+        return mean / norm if norm else None
+
+    def similarity(self, word1: str, word2: str) -> Optional[float]:
+        return self.similarities(word1, [word2])[0]
+
+    def similarities(self, reference: str, candidates: List[str]) -> List[Optional[float]]:
+        """
+        Similarity of every candidate to the reference, aligned with candidates.
+        None for out-of-vocabulary candidates, or for all of them if the
+        reference itself is unknown.
+        """
+        ref = self.vector(reference)
+        if ref is None:
+            return [None] * len(candidates)
+
+        vectors = [self.vector(word) for word in candidates]
+        known = [idx for idx, vector in enumerate(vectors) if vector is not None]
+        results: List[Optional[float]] = [None] * len(candidates)
+        if known:
+            # One matrix-vector product for every known candidate
+            scores = np.clip(np.stack([vectors[idx] for idx in known]) @ ref, 0.0, 1.0)
+            for idx, score in zip(known, scores.tolist()):
+                results[idx] = round(score, 4)
+        return results
+
+
+def resolve_table_path(path: str) -> str:
+    """Relative table paths are resolved against the backend directory, not the working directory."""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+def load_embedding_table(vectors_path: str, vocab_path: str) -> Optional[EmbeddingTable]:
+    """Open the embedding table, or return None (LLM only) if the files are missing or invalid."""
+    vectors_path, vocab_path = resolve_table_path(vectors_path), resolve_table_path(vocab_path)
+    if not (os.path.exists(vectors_path) and os.path.exists(vocab_path)):
+        logger.warning(f"Embedding table not found at {vectors_path}, word similarity will use the LLM only")
+        return None
+    try:
+        return EmbeddingTable(vectors_path, vocab_path)
+    except Exception as e:
+        logger.error(f"Could not load embedding table: {str(e)}")
+        return None
+
+
+def build_embedding_table(
+    lines: Iterable[str], vectors_path: str, vocab_path: str, max_words: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Convert word vectors in the GloVe/word2vec text format ("word v1 v2 ...",
+    one per line) into the files EmbeddingTable reads. Rows are normalised to
+    unit length; later duplicates of a word are skipped. Returns (words, dims).
+    """
+    words: List[str] = []
+    seen = set()
+    rows: List[np.ndarray] = []
+    dims = None
+    for line in lines:
+        parts = line.rstrip().split(" ")
+        if len(parts) < 3:
+            continue  # word2vec header ("count dims") or blank line
+        word = _normalize(parts[0])
+        if word in seen:
+            continue
+        vector = np.asarray(parts[1:], dtype=np.float32)
+        if dims is None:
+            dims = len(vector)
+        elif len(vector) != dims:
+            continue
+        norm = np.linalg.norm(vector)
+        if not norm:
+            continue
+        seen.add(word)
+        words.append(word)
+        rows.append(vector / norm)
+        if max_words is not None and len(words) >= max_words:
+            break
+
+    if not rows:
+        raise ValueError("No word vectors found")
+    np.save(vectors_path, np.stack(rows).astype(np.float32))
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(words) + "\n")
+    return len(words), dims
@@ -1,49 +1,113 @@
-import google.generativeai as genai
+import json
+from typing import Dict, List, Optional, Type
+from pydantic import BaseModel
 from loguru import logger
 from app.config import get_settings
+from app.services.http_transport import HttpTransport, get_http_transport
+from app.services.provider_router import ProviderResponse, UpstreamResponseError
 
-settings = get_settings()
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class GeminiAPIError(Exception):
+    """Non-2xx answer of the Gemini REST API; keeps the response for its status and Retry-After."""
+
+    def __init__(self, response):
+        try:
+            message = response.json()["error"]["message"]
+        except Exception:
+            message = response.text
+        super().__init__(f"Gemini API error {response.status_code}: {message}")
+        self.status_code = response.status_code
+        self.response = response
+
+def _image_part(data_url: str) -> dict:
+    """Inline image part from a data URL, keeping the image's own mime type and base64 data."""
+    header, _, data = data_url.partition(",")
+    mime_type = header[len("data:"):].split(";")[0] or "image/png"
+    return {"inlineData": {"mimeType": mime_type, "data": data}}
 
 class GeminiService:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL_NAME)
+    """
+    Gemini over its REST API, through the HTTP transport shared with the other
+    providers (the SDK brings its own gRPC stack and connection pool).
+    """
+    name = "gemini"
+
+    def __init__(self, transport: Optional[HttpTransport] = None):
+        settings = get_settings()
+        self.api_key = settings.GEMINI_API_KEY
+        self.model = settings.GEMINI_MODEL_NAME
+        self.small_model = settings.GEMINI_SMALL_MODEL_NAME
         self.temperature = settings.TEMPERATURE
-        
-    async def predict_images(self, messages, max_tokens):
-        """Process images using Gemini Vision API"""
-        try:
-            # Convert OpenAI message format to Gemini format
-            prompt_parts = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    prompt_parts.append(msg["content"])
-                elif msg["role"] == "user":
-                    for content in msg["content"]:
-                        if content["type"] == "text":
-                            prompt_parts.append(content["text"])
-                        elif content["type"] == "image_url":
-                            # Extract base64 data from data URL
-                            img_data = content["image_url"]["url"].split(",")[1]
-                            prompt_parts.append({
-                                "mime_type": "image/jpeg",
-                                "data": img_data
-                            })
-
-            response = await self.model.generate_content(
-                prompt_parts,
-                generation_config={
+        self.base_url = settings.GEMINI_BASE_URL.rstrip("/")
+        self.transport = transport or get_http_transport()
+        self.transport.add_origin(self.base_url)
+
+    def _build_parts(self, messages: list, response_format: Type[BaseModel]) -> List[dict]:
+        """Convert OpenAI-style chat messages into Gemini content parts."""
+        parts = []
+        for msg in messages:
+            if isinstance(msg["content"], str):
+                parts.append({"text": msg["content"]})
+                continue
+            for content in msg["content"]:
+                if content["type"] == "text":
+                    parts.append({"text": content["text"]})
+                elif content["type"] == "image_url":
+                    parts.append(_image_part(content["image_url"]["url"]))
+        # Gemini's response_schema rejects parts of pydantic's JSON schema, so the schema goes in the prompt
+        parts.append({
+            "text": "Respond with a single JSON object matching this JSON schema:\n"
+            + json.dumps(response_format.model_json_schema())
+        })
+        return parts
+
+    async def parse(
+        self, messages: list, response_format: Type[BaseModel], max_tokens: int, model: Optional[str] = None
+    ) -> ProviderResponse:
+        """Structured output from Gemini, validated against the same schema the OpenAI calls use."""
+        model = model or self.model
+        response = await self.transport.client.post(
+            f"{self.base_url}/models/{model}:generateContent",
+            headers={"x-goog-api-key": self.api_key or ""},
+            json={
+                "contents": [{"role": "user", "parts": self._build_parts(messages, response_format)}],
+                "generationConfig": {
                     "temperature": self.temperature,
-                    "max_output_tokens": max_tokens,
-                }
-            )
-            
-            # Parse the response to match OpenAI format
-            parsed_response = response.text
-            # TODO: Add proper JSON parsing of the response
-            
-            return parsed_response
-
-        except Exception as e:
-            logger.error(f"Gemini API error: {str(e)}")
-            raise
+                    "maxOutputTokens": max_tokens,
+                    "responseMimeType": "application/json",
+                },
+            },
+            timeout=self.transport.timeout("predict"),
+        )
+        if response.status_code >= 400:
+            raise GeminiAPIError(response)
+        body = response.json()
+
+        metadata = body.get("usageMetadata") or {}
+        usage: Dict[str, int] = {}
+        if metadata:
+            usage = {
+                "prompt_tokens": metadata.get("promptTokenCount", 0),
+                "completion_tokens": metadata.get("candidatesTokenCount", 0),
+                "total_tokens": metadata.get("totalTokenCount", 0),
+            }
+        candidates = body.get("candidates") or []
+        if not candidates:
+            reason = (body.get("promptFeedback") or {}).get("blockReason", "no candidates")
+            raise UpstreamResponseError(f"Gemini returned no answer: {reason}")
+        text = "".join(part.get("text", "") for part in candidates[0].get("content", {}).get("parts", []))
+        try:
+            parsed = response_format.model_validate_json(text)
+        except ValueError as e:
+            logger.error(f"Gemini returned output not matching {response_format.__name__}: {str(e)}")
+            raise UpstreamResponseError(f"Provider {self.name} returned output not matching {response_format.__name__}")
+        return ProviderResponse(parsed, usage, self.name, model)
+
+    @staticmethod
+    def retryable(error: Exception) -> bool:
+        import httpx
+
+        if isinstance(error, httpx.TransportError):
+            return True
+        return isinstance(error, GeminiAPIError) and error.status_code in RETRYABLE_STATUS_CODES
@@ -0,0 +1,235 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from loguru import logger
+from app.config import get_settings
+from app.services.provider_router import LatencyHistogram
+
+# Read timeouts per call type, in seconds; connect, write and pool timeouts are shared
+DEFAULT_TIMEOUTS = {"predict": 30.0, "compare": 10.0, "warmup": 5.0}
+
+
+class HttpTransport:
+    """
+    One pooled async HTTP client shared by every provider client.
+
+    Connections to each upstream origin are kept alive between calls (up to
+    max_keepalive of them, for keepalive_expiry seconds), so only the first
+    call to an origin pays for DNS, TCP and TLS. warm_up() pays that before
+    traffic arrives: it opens warmup_connections connections to every
+    registered origin with cheap HEAD requests, and keep_warm() repeats it
+    every warmup_interval seconds so idle connections do not expire between
+    bursts.
+
+    HTTP/2 multiplexes concurrent calls over one connection per origin; it
+    needs the h2 package and falls back to HTTP/1.1 without it.
+
+    Connection setup is traced, so stats() shows how many connections and
+    TLS handshakes the pool needed and how long they took, next to its
+    current idle/active connections.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 60,
+        http2: bool = False,
+        connect_timeout: float = 5,
+        timeouts: Optional[Dict[str, float]] = None,
+        warmup_connections: int = 2,
+        warmup_interval: float = 0,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        # One connection per origin serves every concurrent call over HTTP/2
+        self.warmup_connections = 1 if http2 else warmup_connections
+        self.warmup_interval = warmup_interval
+        self.origins: List[str] = []
+        self._client = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.connect_latency = LatencyHistogram()
+        self.tls_latency = LatencyHistogram()
+        self.warmups = 0
+        self.warmup_failures = 0
+        self.last_warmup: Optional[float] = None
+
+    def add_origin(self, url: str) -> None:
+        """Register an upstream origin (scheme://host[:port]) for warmup."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.origins:
+            self.origins.append(origin)
+
+    @property
+    def client(self):
+        """httpx.AsyncClient over the shared pool, built on first access."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def _build_client(self):
+        import httpx
+
+        transport = _TracingTransport(self, httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        ))
+        return httpx.AsyncClient(transport=transport, timeout=self.timeout("predict"), follow_redirects=True)
+
+    def timeout(self, kind: str):
+        """httpx.Timeout for a call type ("predict", "compare", "warmup"), defaulting to predict's."""
+        import httpx
+
+        return httpx.Timeout(self.timeouts.get(kind, self.timeouts["predict"]), connect=self.connect_timeout)
+
+    async def _trace(self, event: str, info: Dict[str, Any], started: Dict[str, float]) -> None:
+        name, _, stage = event.rpartition(".")
+        if stage == "started":
+            started[name] = time.perf_counter()
+        elif stage == "complete" and name in started:
+            elapsed_ms = (time.perf_counter() - started.pop(name)) * 1000
+            if name == "connection.connect_tcp":
+                self.connections_opened += 1
+                self.connect_latency.record(elapsed_ms)
+            elif name == "connection.start_tls":
+                self.tls_handshakes += 1
+                self.tls_latency.record(elapsed_ms)
+
+    async def warm_up(self) -> None:
+        """Open warmup_connections connections to every registered origin."""
+        if not self.origins:
+            return
+        timeout = self.timeout("warmup")
+
+        async def touch(origin: str) -> None:
+            # Any response means the connection is open and back in the pool
+            await self.client.head(origin, timeout=timeout)
+
+        start_time = time.time()
+        results = await asyncio.gather(
+            *(touch(origin) for origin in self.origins for _ in range(self.warmup_connections)),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        self.warmups += 1
+        self.warmup_failures += len(failures)
+        self.last_warmup = time.time()
+        if failures:
+            logger.warning(f"{len(failures)} of {len(results)} warmup connections failed: {str(failures[0])}")
+        logger.info(f"Warmed {len(results) - len(failures)} connections to {len(self.origins)} origins "
+                    f"in {(time.time() - start_time) * 1000:.0f}ms")
+
+    async def keep_warm(self) -> None:
+        """Warm up now and, with a warmup_interval, again every interval until cancelled."""
+        while True:
+            try:
+                await self.warm_up()
+            except Exception as e:
+                logger.warning(f"Connection warmup failed: {str(e)}")
+            if self.warmup_interval <= 0:
+                return
+            await asyncio.sleep(self.warmup_interval)
+
+    def _pool(self) -> List[Any]:
+        if self._client is None:
+            return []
+        # httpx exposes no pool introspection; read the httpcore pool it wraps
+        pool = getattr(self._client._transport.pool_transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self._pool()
+        idle = sum(connection.is_idle() for connection in connections)
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry_seconds": self.keepalive_expiry,
+            "timeouts_seconds": dict(self.timeouts, connect=self.connect_timeout),
+            "origins": list(self.origins),
+            "pool": {
+                "connections": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+            },
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            # Calls per new connection: high means connections are reused, close to 1 means churn
+            "requests_per_connection": self.requests / self.connections_opened if self.connections_opened else 0.0,
+            "connect_latency": self.connect_latency.stats(),
+            "tls_latency": self.tls_latency.stats(),
+            "warmup": {
+                "connections_per_origin": self.warmup_connections,
+                "interval_seconds": self.warmup_interval,
+                "runs": self.warmups,
+                "failures": self.warmup_failures,
+                "last_run": self.last_warmup,
+            },
+        }
+
+
+class _TracingTransport:
+    """Wraps the pool transport to count requests and trace connection setup for HttpTransport."""
+
+    def __init__(self, owner: HttpTransport, pool_transport):
+        self.owner = owner
+        self.pool_transport = pool_transport
+
+    async def handle_async_request(self, request):
+        self.owner.requests += 1
+        started: Dict[str, float] = {}
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            await self.owner._trace(event, info, started)
+
+        request.extensions = dict(request.extensions, trace=trace)
+        return await self.pool_transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.pool_transport.aclose()
+
+
+@lru_cache()
+def get_http_transport() -> HttpTransport:
+    """Get the shared transport configured by the HTTP_* settings."""
+    settings = get_settings()
+    return HttpTransport(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        http2=settings.HTTP2_ENABLED,
+        connect_timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        timeouts={
+            "predict": settings.HTTP_TIMEOUT_PREDICT_SECONDS,
+            "compare": settings.HTTP_TIMEOUT_COMPARE_SECONDS,
+        },
+        warmup_connections=settings.HTTP_WARMUP_CONNECTIONS,
+        warmup_interval=settings.HTTP_WARMUP_INTERVAL_SECONDS,
+    )
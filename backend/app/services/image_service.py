@@ -0,0 +1,182 @@
+import base64
+import binascii
+import hashlib
+import io
+from typing import NamedTuple, Optional, Tuple, Union
+from PIL import Image, ImageChops
+from loguru import logger
+from app.services.near_duplicate_service import dhash
+
+# Leading bytes identifying each accepted upload format
+MAGIC_BYTES = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+}
+
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+class InvalidImageError(ValueError):
+    """The submitted image cannot be decoded or is not an accepted format; surfaced as 400."""
+
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """Return the mime type implied by the file signature, or None if unsupported."""
+    for magic, mime_type in MAGIC_BYTES.items():
+        if data.startswith(magic):
+            return mime_type
+    return None
+
+
+def decode_base64(payload: str) -> bytes:
+    """Decode a base64 payload, with or without a data URL prefix."""
+    start = payload.index(",") + 1 if payload.startswith("data:") else 0
+    try:
+        return base64.b64decode(payload[start:] if start else payload, validate=True)
+    except binascii.Error:
+        raise InvalidImageError("Invalid base64 encoding")
+
+
+class ImageAnalysis(NamedTuple):
+    data: bytes
+    mime_type: str
+    digest: str
+    image_hash: Optional[int]
+
+
+def analyze_image(payload: Union[str, bytes], max_bytes: int, hash_size: Optional[int] = None) -> ImageAnalysis:
+    """
+    Decode and check one image: size limit, format by magic bytes, content
+    digest and (optionally) perceptual hash. CPU-bound, meant for the worker pool.
+    """
+    data = decode_base64(payload) if isinstance(payload, str) else payload
+    if len(data) > max_bytes:
+        raise InvalidImageError(f"Image size exceeds {max_bytes // (1024 * 1024)}MB limit")
+    mime_type = sniff_image_format(data)
+    if mime_type is None:
+        raise InvalidImageError("Unsupported image format, expected PNG, JPEG or GIF")
+
+    image_hash = None
+    if hash_size is not None:
+        try:
+            image_hash = dhash(data, hash_size)
+        except Exception as e:
+            logger.warning(f"Could not compute perceptual hash: {str(e)}")
+
+    return ImageAnalysis(data, mime_type, hashlib.sha256(data).hexdigest(), image_hash)
+
+
+def build_data_url(
+    data: bytes, mime_type: str, preprocessor: Optional["ImagePreprocessor"] = None, reuse_original: bool = False
+) -> Optional[str]:
+    """
+    Optionally shrink an image, then encode it as a data URL. Meant for the worker pool.
+    Returns None when reuse_original is set and the image was left unchanged, so the
+    caller can reuse the payload it already holds instead of re-encoding it.
+    """
+    processed, processed_mime = preprocessor.process(data, mime_type) if preprocessor else (data, mime_type)
+    if processed is data and reuse_original:
+        return None
+    return f"data:{processed_mime};base64,{base64.b64encode(processed).decode('ascii')}"
+
+
+class ImagePreprocessor:
+    """
+    Shrinks images before they are uploaded to a provider.
+
+    Canvas doodles are mostly empty margin at a much higher resolution than
+    the vision models need, so trimming and downscaling cuts both upload size
+    and image token cost.
+    """
+
+    def __init__(
+        self,
+        max_edge: int = 512,
+        trim_margins: bool = True,
+        trim_padding: int = 8,
+        grayscale: bool = False,
+        output_format: str = "png",
+        jpeg_quality: int = 85,
+    ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.max_edge = max_edge
+        self.trim_margins = trim_margins
+        self.trim_padding = trim_padding
+        self.grayscale = grayscale
+        self.output_format = output_format
+        self.jpeg_quality = jpeg_quality
+
+    @classmethod
+    def from_settings(cls, settings) -> "ImagePreprocessor":
+        return cls(
+            max_edge=settings.IMAGE_MAX_EDGE,
+            trim_margins=settings.IMAGE_TRIM_MARGINS,
+            grayscale=settings.IMAGE_GRAYSCALE,
+            output_format=settings.IMAGE_OUTPUT_FORMAT,
+            jpeg_quality=settings.IMAGE_JPEG_QUALITY,
+        )
+
+    def process(self, image_bytes: bytes, mime_type: str) -> Tuple[bytes, str]:
+        """
+        Return (encoded bytes, mime type). Falls back to the original image if
+        it cannot be decoded or if re-encoding would make it larger.
+        """
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                processed = self._transform(img)
+            encoded, processed_mime = self._encode(processed)
+        except Exception as e:
+            logger.warning(f"Image preprocessing failed, sending original: {str(e)}")
+            return image_bytes, mime_type
+
+        if len(encoded) >= len(image_bytes):
+            return image_bytes, mime_type
+        return encoded, processed_mime
+
+    def _transform(self, img: Image.Image) -> Image.Image:
+        # Flatten transparency onto white so trimming and JPEG encoding behave
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img).convert("RGB")
+
+        if self.trim_margins:
+            img = self._trim(img)
+
+        if self.grayscale:
+            img = img.convert("L")
+
+        if max(img.size) > self.max_edge:
+            img.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+        return img
+
+    def _trim(self, img: Image.Image) -> Image.Image:
+        """Crop to the bounding box of non-white pixels plus a little padding."""
+        background = Image.new(img.mode, img.size, (255, 255, 255))
+        bbox = ImageChops.difference(img, background).getbbox()
+        if bbox is None:
+            return img
+
+        left, top, right, bottom = bbox
+        pad = self.trim_padding
+        return img.crop((
+            max(0, left - pad),
+            max(0, top - pad),
+            min(img.width, right + pad),
+            min(img.height, bottom + pad),
+        ))
+
+    def _encode(self, img: Image.Image) -> Tuple[bytes, str]:
+        pil_format, mime_type = OUTPUT_FORMATS[self.output_format]
+        buffer = io.BytesIO()
+        if pil_format == "PNG":
+            img.save(buffer, format=pil_format, optimize=True)
+        else:
+            img.save(buffer, format=pil_format, quality=self.jpeg_quality)
+        return buffer.getvalue(), mime_type
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+from pydantic import BaseModel
+from app.services.metrics import current_endpoint
+from app.services.image_service import InvalidImageError
+from app.services.provider_router import OverloadedError, UpstreamResponseError
+
+
+class JobConflictError(Exception):
+    """An idempotency key was reused with a different request."""
+
+
+class Job:
+    def __init__(self, request: BaseModel, fingerprint: Optional[str], idempotency_key: Optional[str]):
+        self.id = uuid.uuid4().hex
+        # Dropped once the job finishes; the fingerprint is enough to match retries
+        self.request: Optional[BaseModel] = request
+        self.fingerprint = fingerprint
+        self.idempotency_key = idempotency_key
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Any] = None
+        self.error_message: Optional[str] = None
+        self.error_status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+
+def _error_status(error: Exception) -> int:
+    """HTTP status the same error gets from the synchronous endpoint."""
+    if isinstance(error, OverloadedError):
+        return 429
+    if isinstance(error, InvalidImageError):
+        return 400
+    if isinstance(error, UpstreamResponseError):
+        return 502
+    return 500
+
+
+class JobManager:
+    """
+    Run requests in the background and keep their results for polling.
+
+    submit() queues a job and returns at once; max_workers worker tasks take
+    jobs in order and run them, so background work cannot take more than
+    max_workers request slots. At most max_queued jobs wait: beyond that
+    submit() raises OverloadedError. Finished jobs keep their result (not
+    their request) for ttl_seconds, then are evicted; beyond max_stored jobs
+    the oldest finished ones go first.
+
+    With an idempotency key, submitting the same request again returns the
+    job already created for it instead of starting another; reusing the key
+    for a different request raises JobConflictError. A key whose job failed
+    may be reused to try again.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Any], Awaitable[Any]],
+        max_workers: int = 2,
+        max_queued: int = 100,
+        ttl_seconds: float = 3600,
+        max_stored: int = 1000,
+        endpoint: str = "internal",
+    ):
+        self.run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self.max_stored = max_stored
+        # Metrics label for the work the jobs do (stage timings, tokens)
+        self.endpoint = endpoint
+        self.jobs: Dict[str, Job] = {}
+        self.keys: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.evicted = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.max_workers)]
+
+    @staticmethod
+    def fingerprint(request: BaseModel) -> str:
+        return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job for job in self.jobs.values() if job.finished and job.finished_at < cutoff]
+        for job in expired:
+            self._forget(job)
+            self.evicted += 1
+
+    def _make_room(self) -> None:
+        """Evict the oldest finished jobs until another one fits under max_stored."""
+        excess = len(self.jobs) - self.max_stored + 1
+        if excess <= 0:
+            return
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:excess]:
+            self._forget(job)
+            self.evicted += 1
+
+    def _forget(self, job: Job) -> None:
+        del self.jobs[job.id]
+        if job.idempotency_key is not None and self.keys.get(job.idempotency_key) == job.id:
+            del self.keys[job.idempotency_key]
+
+    def queued(self) -> int:
+        return sum(job.status == "queued" for job in self.jobs.values())
+
+    async def submit(self, request: BaseModel, idempotency_key: Optional[str] = None) -> Job:
+        """Queue request, or return the job already created for idempotency_key."""
+        fingerprint = None
+        if idempotency_key is not None:
+            # Serialising up to 10 base64 images takes a while; keep it off the event loop
+            fingerprint = await asyncio.to_thread(self.fingerprint, request)
+        self._evict()
+        self._ensure_workers()
+
+        if idempotency_key is not None and idempotency_key in self.keys:
+            existing = self.jobs[self.keys[idempotency_key]]
+            if existing.fingerprint != fingerprint:
+                raise JobConflictError(f"Idempotency key '{idempotency_key}' was already used for another request")
+            if existing.status != "failed":
+                self.deduplicated += 1
+                return existing
+            self._forget(existing)
+
+        if self.queued() >= self.max_queued:
+            self.rejected += 1
+            # Roughly when a worker should free up, from the average job run time
+            finished = self.succeeded + self.failed
+            average_run = self.total_run_ms / finished / 1000 if finished else 1.0
+            raise OverloadedError(f"{self.max_queued} jobs are already queued", max(1.0, average_run))
+
+        self._make_room()
+        job = Job(request, fingerprint, idempotency_key)
+        self.jobs[job.id] = job
+        if idempotency_key is not None:
+            self.keys[idempotency_key] = job.id
+        self.submitted += 1
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._evict()
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to timeout seconds for the job to finish (long-poll); returns it either way."""
+        if timeout > 0 and not job.finished:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _work(self) -> None:
+        current_endpoint.set(self.endpoint)
+        while True:
+            job = await self._queue.get()
+            if job.id not in self.jobs:
+                continue
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self.run(job.request)
+                job.status = "succeeded"
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                self._fail(job, "Job cancelled by server shutdown", 503)
+                self._finish(job)
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}")
+                self._fail(job, str(e), _error_status(e))
+                job.retry_after = getattr(e, "retry_after", None)
+            self._finish(job)
+
+    def _fail(self, job: Job, message: str, status: int) -> None:
+        job.status = "failed"
+        job.error_message = message
+        job.error_status = status
+        self.failed += 1
+
+    def _finish(self, job: Job) -> None:
+        job.request = None
+        job.finished_at = time.time()
+        if job.started_at is not None:
+            self.total_wait_ms += (job.started_at - job.created_at) * 1000
+            self.total_run_ms += (job.finished_at - job.started_at) * 1000
+        job.done.set()
+
+    async def close(self) -> None:
+        """Stop the workers; jobs still queued or running fail."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+        for job in self.jobs.values():
+            if not job.finished:
+                self._fail(job, "Job cancelled by server shutdown", 503)
+                self._finish(job)
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.succeeded + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "ttl_seconds": self.ttl_seconds,
+            "max_stored": self.max_stored,
+            "queued": self.queued(),
+            "running": sum(job.status == "running" for job in self.jobs.values()),
+            "stored": len(self.jobs),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "evicted": self.evicted,
+            "avg_queue_wait_ms": self.total_wait_ms / finished if finished else 0.0,
+            "avg_run_ms": self.total_run_ms / finished if finished else 0.0,
+        }
@@ -0,0 +1,135 @@
+import json
+import re
+import unicodedata
+from typing import Dict, Iterable, Optional
+from loguru import logger
+
+ARTICLES = re.compile(r"^(a|an|the)\s+")
+NON_WORD = re.compile(r"[^a-z0-9'\- ]+")
+SPACES = re.compile(r"\s+")
+
+# Plurals that the suffix rules below would get wrong
+IRREGULAR_PLURALS = {
+    "children": "child", "people": "person", "men": "man", "women": "woman",
+    "mice": "mouse", "geese": "goose", "teeth": "tooth", "feet": "foot", "oxen": "ox",
+    "knives": "knife", "wives": "wife", "lives": "life", "leaves": "leaf", "loaves": "loaf",
+    "wolves": "wolf", "halves": "half", "shelves": "shelf", "calves": "calf", "thieves": "thief",
+    "scarves": "scarf", "hooves": "hoof", "elves": "elf",
+    "cacti": "cactus", "fungi": "fungus", "octopi": "octopus",
+    "buses": "bus", "gases": "gas", "axes": "axe",
+    "movies": "movie", "cookies": "cookie", "zombies": "zombie", "pies": "pie", "ties": "tie",
+    "brownies": "brownie", "hoodies": "hoodie", "smoothies": "smoothie", "selfies": "selfie",
+    "shoes": "shoe", "toes": "toe", "canoes": "canoe",
+}
+
+# Words that look plural but are not (or have no singular worth using)
+INVARIANT = {
+    "sheep", "fish", "deer", "moose", "shrimp", "species", "series", "news",
+    "glasses", "sunglasses", "scissors", "pants", "jeans", "shorts", "trousers", "pajamas",
+    "binoculars", "headphones", "earphones", "tongs", "pliers", "clothes", "stairs",
+    "eyeglasses", "atlas", "canvas", "christmas", "fries", "dice", "lens", "chaos", "bias",
+    "rhinoceros", "physics", "gymnastics", "mathematics", "economics", "politics",
+}
+
+# canonical word -> aliases: synonyms and spelling variants that count as the same answer
+DEFAULT_ALIASES: Dict[str, Iterable[str]] = {
+    "car": ["automobile", "auto"],
+    "airplane": ["aeroplane", "plane", "aircraft"],
+    "bicycle": ["bike"],
+    "motorcycle": ["motorbike"],
+    "television": ["tv"],
+    "telephone": ["phone"],
+    "couch": ["sofa"],
+    "rabbit": ["bunny"],
+    "doughnut": ["donut"],
+    "hamburger": ["burger"],
+    "french fries": ["fries"],
+    "ice cream": ["icecream"],
+    "t-shirt": ["tshirt", "tee shirt", "t shirt"],
+    "color": ["colour"],
+    "gray": ["grey"],
+    "theater": ["theatre"],
+    "mustache": ["moustache"],
+    "pajamas": ["pyjamas"],
+}
+
+
+def normalize_word(word: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace and drop a leading article."""
+    word = unicodedata.normalize("NFKD", word)
+    word = "".join(char for char in word if not unicodedata.combining(char)).lower()
+    word = NON_WORD.sub(" ", word.replace("_", " "))
+    word = SPACES.sub(" ", word).strip(" '-")
+    return ARTICLES.sub("", word)
+
+
+def singularize(word: str) -> str:
+    """Singular form of a normalised English noun (the last word of a phrase)."""
+    head, _, last = word.rpartition(" ")
+    prefix = f"{head} " if head else ""
+
+    if last in IRREGULAR_PLURALS:
+        return prefix + IRREGULAR_PLURALS[last]
+    if len(last) <= 3 or last in INVARIANT or last.endswith(("ss", "us", "is", "'s")):
+        return word
+    if last.endswith("ies") and len(last) > 4:
+        return prefix + last[:-3] + "y"
+    if last.endswith(("ches", "shes", "xes", "zzes", "oes")):
+        return prefix + last[:-2]
+    if last.endswith("s"):
+        return prefix + last[:-1]
+    return word
+
+
+class Lexicon:
+    """
+    Canonical forms of words for comparison and cache keys: normalised,
+    singularised, then mapped through the alias table, so "Cars", "car" and
+    "automobile" are all "car".
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, Iterable[str]]] = None):
+        self.aliases: Dict[str, str] = {}
+        for canonical, words in (DEFAULT_ALIASES if aliases is None else aliases).items():
+            self.add_alias(canonical, words)
+
+    def add_alias(self, canonical: str, words: Iterable[str]) -> None:
+        canonical = self.canonical(canonical)
+        for word in words:
+            normalized = self._normalize(word)
+            for form in (normalized, singularize(normalized)):
+                if form != canonical:
+                    self.aliases[form] = canonical
+
+    @staticmethod
+    def _normalize(word: str) -> str:
+        # Hyphens only separate words here, so "ice-cream" and "ice cream" match
+        return normalize_word(word).replace("-", " ")
+
+    def canonical(self, word: str) -> str:
+        normalized = self._normalize(word)
+        if normalized in self.aliases:
+            return self.aliases[normalized]
+        lemma = singularize(normalized)
+        return self.aliases.get(lemma, lemma)
+
+    def same(self, word1: str, word2: str) -> bool:
+        return self.canonical(word1) == self.canonical(word2)
+
+
+def load_lexicon(aliases_path: Optional[str] = None) -> Lexicon:
+    """
+    Built-in aliases, extended by an optional JSON file of
+    {"canonical": ["alias", ...]} entries.
+    """
+    lexicon = Lexicon()
+    if aliases_path:
+        try:
+            with open(aliases_path, encoding="utf-8") as f:
+                extra = json.load(f)
+            for canonical, words in extra.items():
+                lexicon.add_alias(canonical, words)
+            logger.info(f"Loaded {len(extra)} alias entries from {aliases_path}")
+        except Exception as e:
+            logger.error(f"Could not load alias table {aliases_path}: {str(e)}")
+    return lexicon
@@ -0,0 +1,135 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from loguru import logger
+from app.model import ImageInput, PredictionRequest, StrokePath
+from app.services.predict_service import PredictService
+from app.services.rasterizer import StrokeCanvas, changed_ratio, encode_png
+from app.services.worker_pool import get_worker_pool
+
+# Sends one JSON message back to the client
+SendCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LiveDrawingSession:
+    """
+    Server-side state of one drawing round fed by stroke deltas.
+
+    Strokes are drawn onto a small raster canvas as they arrive. A prediction
+    is scheduled once the drawer has paused for debounce_ms, and only runs if
+    the canvas changed by at least min_change_ratio since the last prediction.
+    A newer stroke cancels both the pending timer and any prediction still
+    in flight, so results are never for a stale drawing.
+    """
+
+    def __init__(
+        self,
+        predict_service: PredictService,
+        send: SendCallback,
+        model: str,
+        top_k: int,
+        width: float,
+        height: float,
+        session_id: Optional[str] = None,
+        canvas_size: int = 256,
+        debounce_ms: int = 400,
+        min_change_ratio: float = 0.002,
+    ):
+        self.predict_service = predict_service
+        self.send = send
+        self.model = model
+        self.top_k = top_k
+        self.session_id = session_id or str(uuid.uuid4())
+        self.canvas = StrokeCanvas(width, height, canvas_size)
+        self.debounce = debounce_ms / 1000
+        self.min_change_ratio = min_change_ratio
+        self.version = 0
+        self._last_predicted = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self.predictions = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    def add_stroke(self, stroke: StrokePath) -> None:
+        self.canvas.add_stroke(stroke)
+        self._changed()
+
+    def clear(self) -> None:
+        self.canvas.clear()
+        self._last_predicted = None
+        self._changed(schedule=False)
+
+    def _changed(self, schedule: bool = True) -> None:
+        self.version += 1
+        self._cancel_pending()
+        if schedule:
+            self._timer = asyncio.get_running_loop().call_later(self.debounce, self._start_prediction, False)
+
+    def _cancel_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.cancelled += 1
+
+    def request_prediction(self) -> None:
+        """Predict now, regardless of debounce and change threshold."""
+        self._cancel_pending()
+        self._start_prediction(True)
+
+    def _start_prediction(self, force: bool) -> None:
+        self._timer = None
+        snapshot = self.canvas.snapshot()
+        if not force and self._last_predicted is not None:
+            if changed_ratio(self._last_predicted, snapshot) < self.min_change_ratio:
+                self.skipped += 1
+                return
+        self._task = asyncio.ensure_future(self._predict(snapshot, self.version))
+
+    async def _predict(self, snapshot, version: int) -> None:
+        start_time = time.time()
+        try:
+            png = await get_worker_pool().run(encode_png, snapshot)
+            request = PredictionRequest.model_construct(
+                images=[ImageInput.model_construct(
+                    image_id=f"{self.session_id}:{version}", base64_data="", format="image/png"
+                )],
+                model=self.model,
+                top_k=self.top_k,
+                confidence_threshold=0.1,
+                session_id=self.session_id,
+                priority="preview",
+            )
+            response = await self.predict_service.predict_images(request, image_bytes=[png])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Live prediction failed: {str(e)}")
+            await self.send({"type": "error", "version": version, "error_message": str(e)})
+            return
+
+        self._last_predicted = snapshot
+        self.predictions += 1
+        await self.send({
+            "type": "prediction",
+            "version": version,
+            "prediction": response.results[0].model_dump(mode="json"),
+            "latency_ms": (time.time() - start_time) * 1000,
+        })
+
+    def close(self) -> None:
+        self._cancel_pending()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "version": self.version,
+            "strokes": self.canvas.strokes,
+            "predictions": self.predictions,
+            "cancelled": self.cancelled,
+            "skipped": self.skipped,
+        }
+
@@ -0,0 +1,96 @@
+import io
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from PIL import Image
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image.
+
+    The image is flattened onto white (canvas exports are often transparent),
+    reduced to (hash_size + 1) x hash_size grayscale and each bit records
+    whether a pixel is brighter than its right-hand neighbour.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        flattened = Image.alpha_composite(background, img).convert("L")
+        small = flattened.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = small.tobytes()
+
+    value = 0
+    width = hash_size + 1
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * width + col]
+            right = pixels[row * width + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    """
+    Recent perceptual hashes per session, used to reuse predictions for
+    canvas snapshots that only differ by a small stroke.
+    """
+
+    def __init__(self, max_distance: int, window: int, ttl_seconds: int, max_sessions: int):
+        self.max_distance = max_distance
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # session key -> recent (hash, expires_at, predictions)
+        self._sessions: "OrderedDict[str, Deque[Tuple[int, float, List[Dict[str, Any]]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, session: str, image_hash: int) -> Optional[List[Dict[str, Any]]]:
+        """Return the predictions of the closest recent hash within max_distance, if any."""
+        now = time.time()
+        with self._lock:
+            entries = self._sessions.get(session)
+            best: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+            if entries is not None:
+                self._sessions.move_to_end(session)
+                for candidate, expires_at, predictions in entries:
+                    if expires_at < now:
+                        continue
+                    distance = hamming_distance(candidate, image_hash)
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, predictions)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best[1]
+
+    def add(self, session: str, image_hash: int, predictions: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            entries = self._sessions.get(session)
+            if entries is None:
+                entries = deque(maxlen=self.window)
+                self._sessions[session] = entries
+            self._sessions.move_to_end(session)
+            entries.append((image_hash, time.time() + self.ttl_seconds, predictions))
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
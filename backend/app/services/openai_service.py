@@ -1,50 +1,295 @@
-from openai import OpenAI, AsyncOpenAI
+import asyncio
+import threading
+from typing import Dict, List, Optional, Type
+from pydantic import BaseModel, Field, ValidationError
+from loguru import logger
 from app.config import get_settings
+from app.services.cache_service import create_similarity_cache, make_pair_key
+from app.services.http_transport import HttpTransport, get_http_transport
+from app.services.metrics import record_tokens
+from app.services.provider_router import DeltaCallback, ProviderResponse, UpstreamResponseError
+from app.services.upstream_scheduler import get_upstream_scheduler
+from app.services.single_flight import SingleFlight
 
-settings = get_settings()
+# Bump whenever the comparison prompts change so stale cached scores are ignored
+SIMILARITY_VERSION = "v1"
+
+class WordSimilarity(BaseModel):
+    """Similarity of one candidate word to the reference word"""
+    word: str = Field(description="Candidate word, exactly as given")
+    similarity: float = Field(description="Semantic similarity between 0 and 1")
+
+class BatchSimilarityOutput(BaseModel):
+    """
+    Structured output for batched comparisons
+    """
+    scores: List[WordSimilarity] = Field(
+        description="One entry per candidate word",
+    )
+
+# Status codes worth retrying besides connection errors, timeouts, 429 and 5xx
+RETRYABLE_STATUS_CODES = {408, 409}
+
+def _usage(usage) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
 
 class OpenAIService:
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key = settings.OPENAI_API_KEY
-        )
+    name = "openai"
+
+    def __init__(self, transport: Optional[HttpTransport] = None):
+        settings = get_settings()
+        self.api_key = settings.OPENAI_API_KEY
+        self.base_url = settings.OPENAI_BASE_URL
+        # Pooled connections shared with the other providers
+        self.transport = transport or get_http_transport()
+        self.transport.add_origin(self.base_url)
+        # The openai SDK is slow to import, so the client is built on first use (see warm_up)
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = settings.MODEL_NAME
+        self.small_model = settings.CASCADE_SMALL_MODEL_NAME
         self.max_tokens = settings.MAX_TOKENS
         self.temperature = settings.TEMPERATURE
+        self.compare_in_flight = SingleFlight()
+        # Similarity calls share the OpenAI request/token budget with predictions
+        self.scheduler = get_upstream_scheduler() if settings.ADMISSION_ENABLED else None
+        self.similarity_cache = create_similarity_cache(settings)
+
+    @property
+    def client(self):
+        """AsyncOpenAI client, importing the SDK and building it on first access."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import AsyncOpenAI
+                    self._client = AsyncOpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        http_client=self.transport.client,
+                    )
+        return self._client
+
+    def warm_up(self) -> None:
+        """Build the client ahead of the first call. Blocking: run it off the event loop."""
+        self.client
+
+    async def _admit(self, messages: list, max_tokens: int, priority: str) -> int:
+        if self.scheduler is None:
+            return 0
+        return await self.scheduler.admit(self.name, messages, max_tokens, priority)
+
+    def _settle(self, tokens: int, usage) -> None:
+        record_tokens(self.name, self.model, _usage(usage))
+        if self.scheduler is not None and usage is not None:
+            self.scheduler.settle(self.name, tokens, usage.total_tokens)
 
     async def generate_response(self, prompt: str) -> str:
+        messages = [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        tokens = await self._admit(messages, self.max_tokens, "normal")
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=messages,
                 max_tokens=self.max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                timeout=self.transport.timeout("predict"),
             )
+            self._settle(tokens, response.usage)
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"Error generating OpenAI response: {str(e)}")
 
-    async def compare_semantics(self, word1: str, word2: str) -> float:
+    async def parse(
+        self, messages: list, response_format: Type[BaseModel], max_tokens: int, model: Optional[str] = None
+    ) -> ProviderResponse:
+        """Structured-output chat completion, as a provider for the router."""
+        model = model or self.model
+        try:
+            response = await self.client.beta.chat.completions.parse(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                response_format=response_format,
+                timeout=self.transport.timeout("predict"),
+            )
+        except ValidationError as e:
+            raise self._invalid_output(response_format, e)
+        return self._response(response, response_format, model)
+
+    async def stream_parse(
+        self,
+        messages: list,
+        response_format: Type[BaseModel],
+        max_tokens: int,
+        on_delta: DeltaCallback,
+        model: Optional[str] = None,
+    ) -> ProviderResponse:
+        """Like parse, but streamed: on_delta gets the partially parsed output after every chunk."""
+        model = model or self.model
+        try:
+            async with self.client.beta.chat.completions.stream(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                response_format=response_format,
+                timeout=self.transport.timeout("predict"),
+            ) as stream:
+                async for event in stream:
+                    if event.type == "content.delta" and event.parsed:
+                        on_delta(event.parsed)
+                response = await stream.get_final_completion()
+        except ValidationError as e:
+            raise self._invalid_output(response_format, e)
+        return self._response(response, response_format, model)
+
+    def _invalid_output(self, response_format: Type[BaseModel], error: ValidationError) -> UpstreamResponseError:
+        # The validation details stay in the log; clients only learn the answer was unusable
+        logger.error(f"OpenAI returned output not matching {response_format.__name__}: {str(error)}")
+        return UpstreamResponseError(f"Provider {self.name} returned output not matching {response_format.__name__}")
+
+    def _response(self, response, response_format: Type[BaseModel], model: str) -> ProviderResponse:
+        parsed = response.choices[0].message.parsed
+        if parsed is None:
+            raise UpstreamResponseError(f"Provider {self.name} returned no {response_format.__name__}")
+        return ProviderResponse(parsed, _usage(response.usage), self.name, model)
+
+    @staticmethod
+    def retryable(error: Exception) -> bool:
+        import openai
+
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+    def _pair_key(self, word1: str, word2: str) -> str:
+        return make_pair_key(word1, word2, f"{SIMILARITY_VERSION}:{self.model}")
+
+    async def cached_similarity(self, word1: str, word2: str) -> Optional[float]:
+        if self.similarity_cache is None:
+            return None
+        return await self.similarity_cache.aget(self._pair_key(word1, word2))
+
+    async def remember_similarity(self, word1: str, word2: str, similarity: float) -> None:
+        if self.similarity_cache is not None:
+            await self.similarity_cache.aset(self._pair_key(word1, word2), similarity)
+
+    async def compare_semantics(self, word1: str, word2: str, priority: str = "normal") -> float:
+        """Similarity of a word pair. Scores are cached per pair, in either order."""
+        cached = await self.cached_similarity(word1, word2)
+        if cached is not None:
+            return cached
+
+        # Identical concurrent comparisons (in either order) share one upstream call
+        similarity = await self.compare_in_flight.do(
+            self._pair_key(word1, word2), lambda: self._compare_semantics(word1, word2, priority)
+        )
+        await self.remember_similarity(word1, word2, similarity)
+        return similarity
+
+    async def compare_batch(self, reference: str, candidates: List[str], priority: str = "normal") -> List[float]:
+        """
+        Similarity of every candidate to the reference word, aligned with candidates.
+
+        Cached pairs are answered directly; all remaining candidates are scored
+        together in one structured-output call. Candidates the model skipped
+        fall back to single comparisons.
+        """
+        scores: Dict[str, float] = {}
+        missing: List[str] = []
+        for word in candidates:
+            normalized = word.strip().lower()
+            if normalized in scores or normalized in missing:
+                continue
+            cached = await self.cached_similarity(reference, word)
+            if cached is None:
+                missing.append(normalized)
+            else:
+                scores[normalized] = cached
+
+        if missing:
+            # Copied since coalesced callers share the returned dict
+            batch_key = ("batch", reference.strip().lower(), tuple(sorted(missing)))
+            fresh = dict(await self.compare_in_flight.do(
+                batch_key, lambda: self._compare_batch(reference, missing, priority)
+            ))
+
+            skipped = [word for word in missing if word not in fresh]
+            if skipped:
+                logger.warning(f"Batched comparison skipped {len(skipped)} candidates, comparing them one by one")
+                fresh.update(zip(skipped, await asyncio.gather(*[
+                    self._compare_semantics(reference, word, priority) for word in skipped
+                ])))
+
+            for word in missing:
+                await self.remember_similarity(reference, word, fresh[word])
+            scores.update(fresh)
+
+        return [scores[word.strip().lower()] for word in candidates]
+
+    async def _compare_batch(self, reference: str, candidates: List[str], priority: str = "normal") -> Dict[str, float]:
+        prompt = f"""On a scale from 0 to 1, rate the semantic similarity between '{reference}' and each of these words:
+        {", ".join(f"'{word}'" for word in candidates)}
+        Return one score per word, using the word exactly as given.
+        Examples:
+        - Identical words = 1.0
+        - Very similar words (car/automobile) = 0.95
+        - Completely different words (car/banana) = 0.1"""
+        messages = [{"role": "user", "content": prompt}]
+        max_tokens = 50 + 20 * len(candidates)
+        tokens = await self._admit(messages, max_tokens, priority)
+
+        try:
+            response = await self.client.beta.chat.completions.parse(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.3,
+                response_format=BatchSimilarityOutput,
+                timeout=self.transport.timeout("compare"),
+            )
+            self._settle(tokens, response.usage)
+
+            return {
+                item.word.strip().lower(): max(0.0, min(1.0, item.similarity))
+                for item in response.choices[0].message.parsed.scores
+            }
+
+        except Exception as e:
+            raise Exception(f"Error comparing semantics: {str(e)}")
+
+    async def _compare_semantics(self, word1: str, word2: str, priority: str = "normal") -> float:
+        prompt = f"""On a scale from 0 to 1, rate the semantic similarity between '{word1}' and '{word2}'.
+        IMPORTANT: Respond with ONLY a number between 0 and 1.
+        Do not include any other text, explanation, or punctuation.
+        Examples:
+        - Identical words = 1.0
+        - Very similar words (car/automobile) = 0.95
+        - Completely different words (car/banana) = 0.1"""
+        messages = [{"role": "user", "content": prompt}]
+        tokens = await self._admit(messages, 10, priority)
+
         try:
-            prompt = f"""On a scale from 0 to 1, rate the semantic similarity between '{word1}' and '{word2}'.
-            IMPORTANT: Respond with ONLY a number between 0 and 1.
-            Do not include any other text, explanation, or punctuation.
-            Examples:
-            - Identical words = 1.0
-            - Very similar words (car/automobile) = 0.95
-            - Completely different words (car/banana) = 0.1"""
-            
             response = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 max_tokens=10,
-                temperature=0.3
+                temperature=0.3,
+                timeout=self.transport.timeout("compare"),
             )
+            self._settle(tokens, response.usage)
             
             # Clean and extract the float from the response
             content = response.choices[0].message.content.strip()
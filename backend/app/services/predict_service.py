@@ -1,13 +1,36 @@
 import time
 import uuid
-import json
+import asyncio
 from datetime import datetime
-from typing import List
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 from pydantic import BaseModel, Field
 from loguru import logger
-from app.model import ImagePrediction, PredictionResponse, PredictionRequest,PredictionDetail
+from app.config import get_settings
+from app.model import ImageInput, ImagePrediction, PredictionResponse, PredictionRequest,PredictionDetail, MAX_IMAGE_BYTES
+from app.model import JudgeRequest, JudgeResponse, JudgedPrediction
 from app.services.openai_service import OpenAIService
 from app.services.gemini_service import GeminiService
+from app.services.cache_service import create_prediction_cache, make_cache_key
+from app.services.near_duplicate_service import NearDuplicateIndex
+from app.services.image_service import (
+    ImageAnalysis, ImagePreprocessor, InvalidImageError, analyze_image, build_data_url,
+)
+from app.services.rasterizer import rasterize_strokes
+from app.services.similarity_service import SimilarityService, create_similarity_service
+from app.services.provider_router import (
+    DeltaCallback, OverloadedError, UpstreamResponseError, create_provider_router,
+)
+from app.services.upstream_scheduler import get_upstream_scheduler
+from app.services.cascade import ModelCascade
+from app.services.worker_pool import get_worker_pool
+from app.services.single_flight import SingleFlight
+from app.services.batch_scheduler import MicroBatcher
+from app.services.metrics import stage_timer
+
+# Bump whenever the system prompt or output schema changes so stale cache entries are ignored
+PROMPT_VERSION = "v1"
+# Labels from the judge prompt (labels plus topic similarity) differ from /predict's, so they are cached apart
+JUDGE_PROMPT_VERSION = "judge-v1"
 
 class PredictionOutput(BaseModel):
     """
@@ -17,91 +40,434 @@ class PredictionOutput(BaseModel):
         description="List of predictions for each image",
     )
 
+class KeyedPredictions(BaseModel):
+    """Predictions for one image of a batched call"""
+    image_id: str = Field(description="Image id given before the image")
+    predictions: List[PredictionDetail] = Field(description="Top predictions for this image")
+
+class BatchPredictionOutput(BaseModel):
+    """
+    Structured output for batched calls, keyed by image id
+    """
+    results: List[KeyedPredictions] = Field(
+        description="One entry per image",
+    )
+
+class JudgedDetail(PredictionDetail):
+    """Prediction plus its similarity to the topic, as generated by the model"""
+    similarity: float = Field(description="Semantic similarity between the label and the topic, between 0 and 1")
+
+class JudgeOutput(BaseModel):
+    """
+    Structured output for judge calls
+    """
+    response: List[JudgedDetail] = Field(
+        description="List of predictions for the image",
+    )
+
+def _top_confidence(parsed: BaseModel) -> float:
+    """Highest confidence of a single-image output (PredictionOutput or JudgeOutput)."""
+    return max((pred.confidence for pred in parsed.response), default=0.0)
+
+def _batch_confidence(parsed: BatchPredictionOutput) -> float:
+    """Lowest top confidence across the images of a batched output."""
+    return min(
+        (max((pred.confidence for pred in item.predictions), default=0.0) for item in parsed.results),
+        default=0.0,
+    )
+
+class PreparedImage(NamedTuple):
+    """An image ready to be sent upstream: its id, cache key and the data URL built exactly once."""
+    image_id: str
+    key: str
+    url: str
+
+class IngestedImage(NamedTuple):
+    """Outcome of looking up one image before any upstream call."""
+    key: str
+    image_hash: Optional[int]
+    result: Optional[ImagePrediction]  # reused prediction, None if the model must be called
+    prepared: Optional[PreparedImage]  # set only when result is None
+
+# Receives the top-1 label of a streamed prediction as soon as it is generated
+PartialCallback = Callable[[str], None]
+# Called once the upstream call for an image holds its concurrency slot
+AdmittedCallback = Callable[[], None]
+
+def _first_label_reporter(on_partial: PartialCallback) -> DeltaCallback:
+    """Turn partially parsed PredictionOutput into a single report of the top-1 label."""
+    reported = False
+
+    def on_delta(parsed: Dict[str, Any]) -> None:
+        nonlocal reported
+        if reported:
+            return
+        first = (parsed.get("response") or [{}])[0]
+        # The label is complete once the model has moved on to the confidence
+        if "label" in first and "confidence" in first:
+            on_partial(first["label"].lower())
+            reported = True
+
+    return on_delta
+
 class PredictService:
-    def __init__(self):
-        self.openai_service = OpenAIService()
-        self.gemini_service = GeminiService()
+    def __init__(
+        self, openai_service: Optional[OpenAIService] = None, similarity_service: Optional[SimilarityService] = None
+    ):
+        settings = get_settings()
+        # Shared with the /compare routes so word similarity scores are cached once
+        self.openai_service = openai_service or OpenAIService()
+        self.similarity = similarity_service or create_similarity_service(settings, self.openai_service)
+        self.gemini_service = GeminiService() if settings.GEMINI_API_KEY else None
+        # Picks the provider per request (model field) and hedges/fails over to the other one
+        self.router = create_provider_router(
+            settings, self.openai_service, self.gemini_service,
+            scheduler=get_upstream_scheduler() if settings.ADMISSION_ENABLED else None,
+        )
+        self.cascade = ModelCascade(
+            self.router, settings.CASCADE_CONFIDENCE_THRESHOLD, enabled=settings.CASCADE_ENABLED
+        )
+        self.fan_out = settings.PREDICT_FAN_OUT
+        self.max_tokens_per_image = settings.PREDICT_MAX_TOKENS_PER_IMAGE
+        # Caps the number of upstream calls in flight across all requests
+        self.semaphore = asyncio.Semaphore(settings.PREDICT_MAX_CONCURRENCY)
+        self.cache = create_prediction_cache(settings)
+        self.near_duplicate_hash_size = settings.NEAR_DUPLICATE_HASH_SIZE
+        self.near_duplicates = NearDuplicateIndex(
+            max_distance=settings.NEAR_DUPLICATE_MAX_DISTANCE,
+            window=settings.NEAR_DUPLICATE_WINDOW,
+            ttl_seconds=settings.NEAR_DUPLICATE_TTL_SECONDS,
+            max_sessions=settings.NEAR_DUPLICATE_MAX_SESSIONS,
+        ) if settings.NEAR_DUPLICATE_ENABLED else None
+        self.preprocessor = ImagePreprocessor.from_settings(settings) if settings.IMAGE_PREPROCESS_ENABLED else None
+        self.image_detail = settings.IMAGE_DETAIL
+        self.stroke_raster_size = settings.STROKE_RASTER_SIZE
+        self.worker_pool = get_worker_pool()
+        # Bounds how many decoded images are alive at once across requests
+        self.ingest_semaphore = asyncio.Semaphore(settings.WORKER_POOL_SIZE)
+        # Coalesces identical concurrent upstream calls (e.g. retries, players finishing together)
+        self.in_flight = SingleFlight()
+        self.batcher = MicroBatcher(
+            run_batch=lambda items: self._call_batch(
+                items[0][0], [img for _, img, _ in items], [on_admitted for _, _, on_admitted in items]
+            ),
+            run_single=lambda item: self._call_single(item[0], item[1], on_admitted=item[2]),
+            window_ms=settings.MICRO_BATCH_WINDOW_MS,
+            max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+            fallback_to_direct=settings.MICRO_BATCH_FALLBACK_TO_DIRECT,
+        ) if settings.MICRO_BATCH_ENABLED else None
 
-    async def predict_images(self, request: PredictionRequest) -> PredictionResponse:
-        try:
-            start_time = time.time()
-            
-            if request.model.lower() == "gemini":
-                service = self.gemini_service
-            else:
-                service = self.openai_service
-                
-            logger.info(f"Starting image prediction with model: {service.model}")
-            logger.info(f"Configuration - Temperature: {self.openai_service.temperature}, "
-                       f"Max tokens: {300 * len(request.images)}")
-
-            # Prepare the system message for consistent formatting
-            system_message = (
-                "Analyze the images and provide:\n"
-                f"- Top {request.top_k} single-word labels for each image\n"
-                "- Confidence scores between 0 and 1\n"
-                "- Brief reasons for each prediction\n"
-                "Format your response as a list of predictions for each image."
-                "Output in JSON format"
-            )
+    def _build_system_message(self, request: PredictionRequest) -> str:
+        return (
+            "Analyze the images and provide:\n"
+            f"- Top {request.top_k} single-word labels for each image\n"
+            "- Confidence scores between 0 and 1\n"
+            "- Brief reasons for each prediction\n"
+            "Format your response as a list of predictions for each image."
+            "Output in JSON format"
+        )
 
-            # Create message with images
-            content = "Analyze these images:\n"
-            messages = [{"role": "system", "content": system_message}]
-            
-            for idx, img in enumerate(request.images):
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"Image {idx + 1}:"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{img.format};base64,{img.base64_data}"
-                            }
-                        }
-                    ]
-                })
-
-            # Log the request being sent to OpenAI
-            logger.debug("Sending request to OpenAI API:")
-            # logger.debug(f"Messages structure: {json.dumps(messages, indent=2)}")
-            
-            response = await self.openai_service.client.beta.chat.completions.parse(
-                model=self.openai_service.model,
-                messages=messages,
-                max_tokens=300 * len(request.images),  # Scale with number of images
-                temperature=self.openai_service.temperature,
-                response_format=PredictionOutput
-            )
-            
-            logger.info(f"Received response from OpenAI. Usage: {response.usage}")
-            logger.info(f"Response completion parsed: {response.choices[0].message.parsed}")
-
-            # Process response and create predictions
-            processed_results: List[ImagePrediction] = []
-
-            parsed_response = response.choices[0].message.parsed
-            for idx, img in enumerate(request.images):
-                predictions = []
-                for pred in parsed_response.response:
-                    predictions.append(PredictionDetail(
+    def _build_image_message(self, idx: int, img: PreparedImage) -> dict:
+        return {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Image {idx + 1}:"
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": img.url,
+                        "detail": self.image_detail
+                    }
+                }
+            ]
+        }
+
+    async def _call_single(
+        self,
+        request: PredictionRequest,
+        img: PreparedImage,
+        on_partial: Optional[PartialCallback] = None,
+        on_admitted: Optional[AdmittedCallback] = None,
+    ) -> List[PredictionDetail]:
+        """
+        Run one upstream call for a single image, bounded by the shared semaphore.
+        With on_partial the completion is streamed (where the provider supports
+        it) and the top-1 label is reported as soon as it has been generated.
+        """
+        async with self.semaphore:
+            if on_admitted is not None:
+                on_admitted()
+            with stage_timer("build"):
+                messages = [
+                    {"role": "system", "content": self._build_system_message(request)},
+                    self._build_image_message(0, img),
+                ]
+
+            with stage_timer("upstream"):
+                response = await self.cascade.parse(
+                    messages,
+                    PredictionOutput,
+                    self.max_tokens_per_image,
+                    _top_confidence,
+                    provider=request.model,
+                    final=request.priority == "final",
+                    priority=request.priority,
+                    on_delta=_first_label_reporter(on_partial) if on_partial is not None else None,
+                )
+
+            logger.debug(f"Image {img.image_id} usage ({response.provider}): {response.usage}")
+
+            with stage_timer("response_parse"):
+                return [
+                    PredictionDetail(
                         label=pred.label,
                         confidence=pred.confidence,
                         reason=pred.reason
-                    ))
-                
-                processed_results.append(ImagePrediction(
-                    image_id=request.images[idx].image_id,
-                    predictions=predictions,
-                    processed_at=datetime.now(),
-                    processing_time_ms=(time.time() - start_time) * 1000,
-                    response=predictions  # Add this field to match the model
-                ))
+                    )
+                    for pred in response.parsed.response
+                ]
+
+    async def _call_upstream(
+        self,
+        request: PredictionRequest,
+        img: PreparedImage,
+        on_partial: Optional[PartialCallback] = None,
+        on_admitted: Optional[AdmittedCallback] = None,
+    ) -> List[PredictionDetail]:
+        """Direct call, or via the micro-batcher so it can share a call with other clients' images."""
+        if self.batcher is None:
+            return await self._call_single(request, img, on_partial, on_admitted)
+        # A batch runs with one request's settings, so only requests that agree on all of them share it
+        return await self.batcher.submit((self._namespace(request), request.priority), (request, img, on_admitted))
+
+    async def _predict_single(
+        self, request: PredictionRequest, img: PreparedImage, on_partial: Optional[PartialCallback] = None
+    ) -> ImagePrediction:
+        """
+        Predict one image, joining an identical in-flight call (same image and namespace) if there is one.
+        processing_time_ms starts once the call holds its concurrency slot, so it leaves out queueing.
+        """
+        start_time = time.time()
+
+        def on_admitted() -> None:
+            nonlocal start_time
+            start_time = time.time()
+
+        predictions = await self.in_flight.do(
+            img.key, lambda: self._call_upstream(request, img, on_partial, on_admitted)
+        )
+        return ImagePrediction(
+            image_id=img.image_id,
+            predictions=predictions,
+            processed_at=datetime.now(),
+            processing_time_ms=(time.time() - start_time) * 1000,
+        )
+
+    async def _predict_fan_out(self, request: PredictionRequest, images: List[PreparedImage]) -> List[ImagePrediction]:
+        """Send one upstream call per image concurrently; results keep request order."""
+        return await asyncio.gather(*[
+            self._predict_single(request, img)
+            for img in images
+        ])
+
+    async def _call_batch(
+        self,
+        request: PredictionRequest,
+        images: List[PreparedImage],
+        on_admitted: Optional[List[Optional[AdmittedCallback]]] = None,
+    ) -> List[Optional[List[PredictionDetail]]]:
+        """
+        Run one upstream call for several images. Results are keyed by a per-call
+        image id so they can be split back; None where the model skipped an image.
+        """
+        async with self.semaphore:
+            for callback in on_admitted or []:
+                if callback is not None:
+                    callback()
+            with stage_timer("build"):
+                messages = [{"role": "system", "content": self._build_system_message(request) + (
+                    "\nEach image is preceded by its image id. Return one entry per image id."
+                )}]
+                for idx, img in enumerate(images):
+                    message = self._build_image_message(idx, img)
+                    message["content"][0]["text"] = f"Image id: img_{idx}"
+                    messages.append(message)
+
+            with stage_timer("upstream"):
+                response = await self.cascade.parse(
+                    messages,
+                    BatchPredictionOutput,
+                    self.max_tokens_per_image * len(images),  # Scale with number of images
+                    _batch_confidence,
+                    provider=request.model,
+                    final=request.priority == "final",
+                    priority=request.priority,
+                )
+
+            logger.info(f"Batched call for {len(images)} images ({response.provider}). Usage: {response.usage}")
+
+            with stage_timer("response_parse"):
+                by_id = {
+                    item.image_id: [
+                        PredictionDetail(label=pred.label, confidence=pred.confidence, reason=pred.reason)
+                        for pred in item.predictions
+                    ]
+                    for item in response.parsed.results
+                }
+                return [by_id.get(f"img_{idx}") for idx in range(len(images))]
+
+    async def _predict_batch(self, request: PredictionRequest, images: List[PreparedImage], start_time: float) -> List[ImagePrediction]:
+        """Legacy mode: all images of the request packed into a single upstream call."""
+        results = await self._call_batch(request, images)
+
+        processed_results: List[ImagePrediction] = []
+        for img, predictions in zip(images, results):
+            if predictions is None:
+                predictions = await self._call_single(request, img)
+            processed_results.append(ImagePrediction(
+                image_id=img.image_id,
+                predictions=predictions,
+                processed_at=datetime.now(),
+                processing_time_ms=(time.time() - start_time) * 1000,
+            ))
+
+        return processed_results
+
+    async def _prepare_image(self, img: ImageInput, key: str, analysis: ImageAnalysis) -> PreparedImage:
+        """
+        Trim, downscale and re-encode an image in the worker pool, then build its data URL.
+        The URL is the only copy of the payload made for the upstream call.
+        """
+        with stage_timer("preprocess"):
+            url = await self.worker_pool.run(
+                build_data_url, analysis.data, analysis.mime_type, self.preprocessor, bool(img.base64_data)
+            )
+        if url is None:
+            # Unchanged image from a JSON request: reuse the client's base64 instead of re-encoding
+            return PreparedImage(img.image_id, key, img.data_url())
+        return PreparedImage(img.image_id, key, url)
+
+    def _model_key(self, request: PredictionRequest) -> str:
+        """The model, or the small>large cascade and its threshold, that answers this request."""
+        large = self.router.model_for(request.model)
+        if not self.cascade.uses_small(request.priority == "final"):
+            return large
+        small = self.router.model_for(request.model, small=True)
+        return f"{small}>{large}@{self.cascade.confidence_threshold}"
+
+    def _namespace(self, request: PredictionRequest, prompt_version: str = PROMPT_VERSION) -> str:
+        """Everything besides the image that changes the model's answer."""
+        return f"{prompt_version}:{request.model.lower()}:{self._model_key(request)}:{request.top_k}"
+
+    async def _ingest_image(
+        self, request: PredictionRequest, img: ImageInput, payload: Optional[Union[str, bytes]], namespace: str
+    ) -> IngestedImage:
+        """
+        Look for a reusable prediction for one image, preparing it for upload on a miss.
+        Exact cache hits are tried first, then near-duplicates from the same session.
+        Rendering strokes, decoding, checks and transforms run in the worker pool.
+        """
+        async with self.ingest_semaphore:
+            if payload is None:
+                with stage_timer("rasterize"):
+                    payload = await self.worker_pool.run(
+                        rasterize_strokes, img.strokes, img.canvas_width, img.canvas_height, self.stroke_raster_size
+                    )
+            use_near_duplicates = self.near_duplicates is not None and request.session_id is not None
+            with stage_timer("decode"):
+                analysis = await self.worker_pool.run(
+                    analyze_image, payload, MAX_IMAGE_BYTES,
+                    self.near_duplicate_hash_size if use_near_duplicates else None,
+                )
+
+            lookup_start = time.time()
+            key = make_cache_key(analysis.digest, namespace)
+            cached = await self.cache.aget(key) if self.cache else None
+            source = "cache"
+
+            if cached is None and use_near_duplicates and analysis.image_hash is not None:
+                cached = self.near_duplicates.find(f"{request.session_id}:{namespace}", analysis.image_hash)
+                source = "near_duplicate"
+                if cached is not None and self.cache:
+                    await self.cache.aset(key, cached)
+
+            if cached is None:
+                prepared = await self._prepare_image(img, key, analysis)
+                return IngestedImage(key, analysis.image_hash, None, prepared)
 
+        result = ImagePrediction(
+            image_id=img.image_id,
+            predictions=[PredictionDetail(**pred) for pred in cached],
+            processed_at=datetime.now(),
+            processing_time_ms=(time.time() - lookup_start) * 1000,
+            reused=True,
+            reuse_source=source,
+        )
+        return IngestedImage(key, analysis.image_hash, result, None)
+
+    async def _ingest_all(
+        self, request: PredictionRequest, image_bytes: Optional[List[bytes]], prompt_version: str = PROMPT_VERSION
+    ) -> List[IngestedImage]:
+        namespace = self._namespace(request, prompt_version)
+        return await asyncio.gather(*[
+            self._ingest_image(
+                request, img, image_bytes[idx] if image_bytes is not None else img.base64_data, namespace
+            )
+            for idx, img in enumerate(request.images)
+        ])
+
+    async def _remember(
+        self, request: PredictionRequest, ingested: IngestedImage, result: ImagePrediction,
+        prompt_version: str = PROMPT_VERSION,
+    ) -> None:
+        """Store a fresh prediction for exact and near-duplicate reuse."""
+        predictions = [pred.model_dump() for pred in result.predictions]
+        if self.cache:
+            await self.cache.aset(ingested.key, predictions)
+        if self.near_duplicates and ingested.image_hash is not None:
+            self.near_duplicates.add(
+                f"{request.session_id}:{self._namespace(request, prompt_version)}", ingested.image_hash, predictions
+            )
+
+    def _log_start(self, request: PredictionRequest) -> None:
+        provider = self.router.resolve(request.model)
+        logger.info(f"Starting image prediction with model: {self._model_key(request)} ({provider}, {request.priority})")
+        logger.info(f"Configuration - Temperature: {self.openai_service.temperature}, "
+                   f"Fan-out: {self.fan_out}, "
+                   f"Max tokens per image: {self.max_tokens_per_image}")
+
+    async def predict_images(
+        self, request: PredictionRequest, image_bytes: Optional[List[bytes]] = None
+    ) -> PredictionResponse:
+        """
+        Predict labels for every image in the request.
+
+        image_bytes may carry the already-decoded images (raw uploads) so they
+        are not decoded from base64 again.
+        """
+        try:
+            start_time = time.time()
+            self._log_start(request)
+
+            ingested = await self._ingest_all(request, image_bytes)
+            processed_results = [item.result for item in ingested]
+            missing = [idx for idx, item in enumerate(ingested) if item.result is None]
+
+            if missing:
+                images = [ingested[idx].prepared for idx in missing]
+                if self.fan_out:
+                    fresh_results = await self._predict_fan_out(request, images)
+                else:
+                    fresh_results = await self._predict_batch(request, images, start_time)
+
+                for idx, result in zip(missing, fresh_results):
+                    processed_results[idx] = result
+                    await self._remember(request, ingested[idx], result)
+
+            logger.info(f"Reused predictions: {len(request.images) - len(missing)}/{len(request.images)}")
 
             response_obj = PredictionResponse(
                 request_id=str(uuid.uuid4()),
@@ -110,13 +476,223 @@ class PredictService:
                 top_k=request.top_k,
                 results=processed_results,
             )
-            
+
             logger.info(f"Successfully processed {len(request.images)} images in "
                        f"{(time.time() - start_time) * 1000:.2f}ms")
-            
+
             return response_obj
 
+        except (InvalidImageError, OverloadedError, UpstreamResponseError):
+            # Invalid image data (400), no upstream budget left (429) or an unusable model answer (502)
+            raise
         except Exception as e:
             logger.error(f"Error generating predictions: {str(e)}")
             logger.exception("Full traceback:")
             raise Exception(f"Error generating predictions: {str(e)}")
+
+    async def _call_judge(self, request: PredictionRequest, topic: str, img: PreparedImage) -> List[JudgedPrediction]:
+        """One upstream call returning the predictions and each label's similarity to the topic."""
+        async with self.semaphore:
+            with stage_timer("build"):
+                messages = [
+                    {"role": "system", "content": self._build_system_message(request) + (
+                        f"\nAlso rate the semantic similarity between each label and the word '{topic}' "
+                        "on a scale from 0 to 1: identical words = 1.0, very similar words (car/automobile) = 0.95, "
+                        "completely different words (car/banana) = 0.1."
+                    )},
+                    self._build_image_message(0, img),
+                ]
+
+            with stage_timer("upstream"):
+                response = await self.cascade.parse(
+                    messages,
+                    JudgeOutput,
+                    self.max_tokens_per_image,
+                    _top_confidence,
+                    provider=request.model,
+                    final=request.priority == "final",
+                    priority=request.priority,
+                )
+
+            logger.debug(f"Judge call for image {img.image_id} usage ({response.provider}): {response.usage}")
+
+            with stage_timer("response_parse"):
+                return [
+                    JudgedPrediction(
+                        label=pred.label,
+                        confidence=pred.confidence,
+                        reason=pred.reason,
+                        similarity=max(0.0, min(1.0, pred.similarity)),
+                    )
+                    for pred in response.parsed.response
+                ]
+
+    async def _compare_labels(
+        self, topic: str, predictions: List[PredictionDetail], priority: str = "normal"
+    ) -> List[JudgedPrediction]:
+        """Score already known predictions against the topic, all labels in one batch."""
+        similarities = await self.similarity.compare_batch(topic, [pred.label for pred in predictions], priority)
+        return [
+            JudgedPrediction(**pred.model_dump(), similarity=similarity)
+            for pred, similarity in zip(predictions, similarities)
+        ]
+
+    async def judge(self, request: JudgeRequest) -> JudgeResponse:
+        """
+        Predict labels for one drawing and score each of them against the topic.
+
+        A reused prediction (cache or near-duplicate) only needs the comparisons,
+        which run as one batch. Otherwise, with the LLM similarity backend, a
+        single structured call returns the labels and their similarities
+        together; with the embedding backends the labels are predicted as for
+        /predict and scored locally, sharing /predict's cache. Labels from the
+        judge prompt are cached under their own prompt version instead.
+        """
+        try:
+            start_time = time.time()
+            prediction_request = PredictionRequest.model_construct(
+                images=[request.image],
+                model=request.model,
+                top_k=request.top_k,
+                confidence_threshold=0.1,
+                session_id=request.session_id,
+                priority=request.priority,
+            )
+            self._log_start(prediction_request)
+
+            prompt_version = JUDGE_PROMPT_VERSION if self.similarity.backend == "llm" else PROMPT_VERSION
+            [ingested] = await self._ingest_all(prediction_request, None, prompt_version)
+            if ingested.result is not None:
+                judged = await self._compare_labels(request.topic, ingested.result.predictions, request.priority)
+            elif self.similarity.backend != "llm":
+                result = await self._predict_single(prediction_request, ingested.prepared)
+                await self._remember(prediction_request, ingested, result)
+                judged = await self._compare_labels(request.topic, result.predictions, request.priority)
+            else:
+                img = ingested.prepared
+                judged = await self.in_flight.do(
+                    (img.key, request.topic), lambda: self._call_judge(prediction_request, request.topic, img)
+                )
+                for pred in judged:
+                    if self.similarity.is_match(request.topic, pred.label):
+                        pred.similarity = 1.0
+                    await self.similarity.remember(request.topic, pred.label, pred.similarity)
+                await self._remember(prediction_request, ingested, ImagePrediction(
+                    image_id=img.image_id,
+                    predictions=[PredictionDetail(**pred.model_dump(exclude={"similarity"})) for pred in judged],
+                    processing_time_ms=(time.time() - start_time) * 1000,
+                ), JUDGE_PROMPT_VERSION)
+
+            return JudgeResponse(
+                request_id=str(uuid.uuid4()),
+                status="success",
+                model=request.model,
+                topic=request.topic,
+                image_id=request.image.image_id,
+                predictions=judged,
+                processing_time_ms=(time.time() - start_time) * 1000,
+                reused=ingested.result is not None,
+                reuse_source=ingested.result.reuse_source if ingested.result is not None else None,
+            )
+
+        except (InvalidImageError, OverloadedError, UpstreamResponseError):
+            # Invalid image data (400), no upstream budget left (429) or an unusable model answer (502)
+            raise
+        except Exception as e:
+            logger.error(f"Error judging drawing: {str(e)}")
+            logger.exception("Full traceback:")
+            raise Exception(f"Error judging drawing: {str(e)}")
+
+    async def predict_images_stream(
+        self, request: PredictionRequest, image_bytes: Optional[List[bytes]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Predict labels for every image, returning an iterator of (event, data) pairs as results arrive:
+
+        - "partial": top-1 label of an image, as soon as the model has generated it
+        - "prediction": a finished ImagePrediction
+        - "error": image_id and error_message of an image that could not be predicted
+        - "summary": request_id and totals, always last
+
+        Images are decoded and looked up before this returns, so an invalid image
+        raises InvalidImageError here instead of failing the stream once it started.
+        """
+        start_time = time.time()
+        request_id = str(uuid.uuid4())
+        self._log_start(request)
+
+        ingested = await self._ingest_all(request, image_bytes)
+        return self._stream_events(request, ingested, start_time, request_id)
+
+    async def _stream_events(
+        self, request: PredictionRequest, ingested: List[IngestedImage], start_time: float, request_id: str
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        reused = 0
+        completed = 0
+        for item in ingested:
+            if item.result is not None:
+                reused += 1
+                completed += 1
+                yield "prediction", item.result.model_dump(mode="json")
+
+        events: asyncio.Queue = asyncio.Queue()
+
+        def failed_image(image_id: str, error: Exception) -> None:
+            logger.error(f"Error streaming prediction for {image_id}: {str(error)}")
+            events.put_nowait(("error", {"image_id": image_id, "error_message": str(error)}))
+
+        async def run(item: IngestedImage) -> None:
+            image_id = item.prepared.image_id
+            on_partial = lambda label: events.put_nowait(("partial", {"image_id": image_id, "label": label}))
+            try:
+                result = await self._predict_single(request, item.prepared, on_partial)
+            except Exception as e:
+                failed_image(image_id, e)
+                return
+            await self._remember(request, item, result)
+            events.put_nowait(("prediction", result.model_dump(mode="json")))
+
+        pending = [item for item in ingested if item.result is None]
+        if self.fan_out:
+            tasks = [asyncio.ensure_future(run(item)) for item in pending]
+        else:
+            async def run_batch() -> None:
+                try:
+                    results = await self._predict_batch(request, [item.prepared for item in pending], start_time)
+                except Exception as e:
+                    for item in pending:
+                        failed_image(item.prepared.image_id, e)
+                    return
+                for item, result in zip(pending, results):
+                    await self._remember(request, item, result)
+                    events.put_nowait(("prediction", result.model_dump(mode="json")))
+            tasks = [asyncio.ensure_future(run_batch())] if pending else []
+
+        # Wake the consumer once every task has finished, successfully or not
+        done = asyncio.ensure_future(asyncio.gather(*tasks, return_exceptions=True))
+        done.add_done_callback(lambda _: events.put_nowait(("done", {})))
+
+        try:
+            while True:
+                event, data = await events.get()
+                if event == "done":
+                    break
+                if event == "prediction":
+                    completed += 1
+                yield event, data
+        finally:
+            # Client went away: stop waiting on upstream calls nobody will read
+            for task in tasks:
+                task.cancel()
+
+        failed = len(request.images) - completed
+        yield "summary", {
+            "request_id": request_id,
+            "status": "error" if failed else "success",
+            "model": request.model,
+            "top_k": request.top_k,
+            "total_images": len(request.images),
+            "reused": reused,
+            "failed": failed,
+            "processing_time_ms": (time.time() - start_time) * 1000,
+        }
@@ -0,0 +1,494 @@
+import asyncio
+import bisect
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Type
+from pydantic import BaseModel
+from loguru import logger
+from app.services.metrics import UPSTREAM_DURATION, UPSTREAM_ERRORS, UPSTREAM_REQUESTS_IN_FLIGHT, record_tokens
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls land in the overflow bucket
+LATENCY_BUCKETS_MS = (
+    25, 50, 75, 100, 150, 200, 300, 400, 500, 750, 1000, 1500, 2000,
+    3000, 4000, 5000, 7500, 10000, 15000, 20000, 30000, 60000,
+)
+
+# Receives the partially parsed structured output while a call is streaming
+DeltaCallback = Callable[[Dict[str, Any]], None]
+
+
+class ProviderResponse(NamedTuple):
+    """Result of one structured-output call, the same shape for every provider."""
+    parsed: BaseModel
+    usage: Dict[str, int]  # prompt_tokens, completion_tokens, total_tokens
+    provider: str
+    model: str
+
+
+class ProviderUnavailableError(Exception):
+    """Every provider that could serve the call has its circuit open."""
+
+
+class UpstreamResponseError(Exception):
+    """The provider answered, but not with the structured output asked for; surfaced as 502."""
+
+
+class OverloadedError(Exception):
+    """The upstream budget cannot take the call in time; surfaced as 429 with Retry-After."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _rate_limit_retry_after(error: Exception) -> Optional[float]:
+    """Retry-After (seconds) of a provider's 429 response, or None if the error is not a rate limit."""
+    if getattr(error, "status_code", None) != 429 and getattr(error, "code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class LatencyHistogram:
+    """
+    Bucketed latency distribution over the last `window` calls.
+
+    Only bucket counts are kept besides the window of bucket indexes, so
+    recording and reading a percentile are cheap enough to do on every call.
+    Percentiles are the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, window: int = 500, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self._recent: Deque[int] = deque(maxlen=window)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def record(self, latency_ms: float) -> None:
+        if len(self._recent) == self._recent.maxlen:
+            self.counts[self._recent[0]] -= 1
+        bucket = bisect.bisect_left(self.buckets, latency_ms)
+        self._recent.append(bucket)
+        self.counts[bucket] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency (ms) under which a fraction q of the recent calls finished, None without samples."""
+        if not self._recent:
+            return None
+        rank = q * len(self._recent)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(self.buckets[bucket]) if bucket < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": len(self._recent),
+            "total": self.total,
+            "avg_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+        }
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds. Then a single probe call is let through (half-open): its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether a call would be let through, without claiming the half-open probe."""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.reset_seconds
+        return not self._probing
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give back a half-open probe that neither succeeded nor failed (cancelled)."""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens}
+
+
+class ProviderStats:
+    def __init__(self, window: int):
+        self.window = window
+        # model -> latency; a provider's small and large models are timed separately
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        # Answers that did not match the schema; the provider itself was reachable
+        self.invalid_outputs = 0
+
+    def latency_for(self, model: str) -> LatencyHistogram:
+        if model not in self.latency:
+            self.latency[model] = LatencyHistogram(self.window)
+        return self.latency[model]
+
+
+class ProviderRouter:
+    """
+    Route structured-output calls to model providers.
+
+    Providers are objects with a `name`, a `model`, an optional cheaper
+    `small_model`, an async `parse(messages, response_format, max_tokens,
+    model) -> ProviderResponse`, an optional async `stream_parse(...,
+    on_delta, model)`, `retryable(error) -> bool` and an optional blocking
+    `warm_up()` that builds its client. Messages use the OpenAI chat format;
+    each provider converts them itself.
+
+    With a scheduler, every attempt is first admitted against the provider's
+    request/token budget at the call's priority; hedges are only started if
+    the budget has room right away.
+
+    A call goes to the requested provider first. Retryable errors are retried
+    with full-jitter exponential backoff. If the provider has not answered
+    within its hedge delay (the hedge_percentile latency of its recent calls),
+    the call is also started on the next provider and whichever answers first
+    wins; the other is cancelled. A provider that fails outright fails over to
+    the next one right away. Providers whose circuit is open are skipped. The
+    circuit counts one failure per call, once its retries are used up; an
+    answer that does not match the schema is not a failure of the provider's
+    transport, so it neither counts nor fails over.
+
+    Calls cut short by a hedge or a timeout are recorded with the time they
+    had run, so slow tails still raise the percentile instead of vanishing
+    from the histogram.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, Any],
+        default: str = "openai",
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay_ms: int = 500,
+        hedge_max_delay_ms: int = 8000,
+        latency_window: int = 500,
+        timeout_seconds: float = 30,
+        max_retries: int = 2,
+        retry_base_ms: int = 200,
+        retry_max_ms: int = 2000,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30,
+        scheduler=None,
+    ):
+        if default not in providers:
+            raise ValueError(f"Default provider '{default}' is not configured")
+        self.providers = providers
+        self.default = default
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_max_delay = hedge_max_delay_ms / 1000
+        self.timeout = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.breakers = {name: CircuitBreaker(breaker_failures, breaker_reset_seconds) for name in providers}
+        self.provider_stats = {name: ProviderStats(latency_window) for name in providers}
+        self.scheduler = scheduler
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def resolve(self, name: Optional[str]) -> str:
+        """Provider for a request's model field; unknown or unconfigured names use the default."""
+        name = (name or "").lower()
+        return name if name in self.providers else self.default
+
+    def model_for(self, name: Optional[str], small: bool = False) -> str:
+        provider = self.providers[self.resolve(name)]
+        return (getattr(provider, "small_model", None) or provider.model) if small else provider.model
+
+    def hedge_delay(self, name: str, model: Optional[str] = None) -> float:
+        """Seconds to wait for a provider's model before hedging, from its latency percentile."""
+        latency = self.provider_stats[name].latency.get(model or self.providers[name].model)
+        if latency is None or len(latency) < self.hedge_min_samples:
+            return self.hedge_max_delay
+        delay = latency.percentile(self.hedge_percentile) / 1000
+        return max(self.hedge_min_delay, min(self.hedge_max_delay, delay))
+
+    def _candidates(self, primary: str) -> List[str]:
+        names = [primary] + [name for name in self.providers if name != primary]
+        return [name for name in names if self.breakers[name].available()]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+    async def _attempt(
+        self,
+        name: str,
+        messages: list,
+        response_format: Type[BaseModel],
+        max_tokens: int,
+        small: bool,
+        on_delta: Optional[DeltaCallback],
+        priority: str = "normal",
+        hedge: bool = False,
+    ) -> ProviderResponse:
+        """Call one provider, retrying retryable errors while its circuit allows."""
+        provider = self.providers[name]
+        model = self.model_for(name, small)
+        breaker = self.breakers[name]
+        stats = self.provider_stats[name]
+        latency = stats.latency_for(model)
+        attempt = 0
+        while True:
+            # Check the circuit before charging the budget; if it opened while the
+            # call waited for admission, the charge is refunded
+            if not breaker.available():
+                stats.rejected += 1
+                raise ProviderUnavailableError(f"Circuit open for provider '{name}'")
+            tokens = 0
+            if self.scheduler is not None:
+                tokens = await self.scheduler.admit(name, messages, max_tokens, priority, wait=not hedge)
+            if not breaker.allow():
+                if self.scheduler is not None:
+                    self.scheduler.refund(name, tokens)
+                stats.rejected += 1
+                raise ProviderUnavailableError(f"Circuit open for provider '{name}'")
+            stats.calls += 1
+            start_time = time.monotonic()
+            try:
+                if on_delta is not None and hasattr(provider, "stream_parse"):
+                    call = provider.stream_parse(messages, response_format, max_tokens, on_delta, model=model)
+                else:
+                    call = provider.parse(messages, response_format, max_tokens, model=model)
+                with UPSTREAM_REQUESTS_IN_FLIGHT.track_in_progress(provider=name):
+                    result = await asyncio.wait_for(call, self.timeout)
+            except asyncio.CancelledError:
+                latency.record((time.monotonic() - start_time) * 1000)
+                breaker.release()
+                raise
+            except UpstreamResponseError as e:
+                stats.invalid_outputs += 1
+                UPSTREAM_ERRORS.inc(provider=name, type=type(e).__name__)
+                latency.record((time.monotonic() - start_time) * 1000)
+                breaker.record_success()
+                raise
+            except Exception as e:
+                stats.failures += 1
+                UPSTREAM_ERRORS.inc(provider=name, type=type(e).__name__)
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    latency.record((time.monotonic() - start_time) * 1000)
+                # A failed half-open probe reopens the circuit right away instead of retrying
+                if (breaker.state == "half_open" or attempt >= self.max_retries
+                        or not (timed_out or provider.retryable(e))):
+                    breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                stats.retries += 1
+                logger.warning(f"Provider {name} call failed ({type(e).__name__}: {str(e)}), "
+                               f"retry {attempt}/{self.max_retries} in {delay * 1000:.0f}ms")
+                await asyncio.sleep(delay)
+                continue
+
+            latency.record((time.monotonic() - start_time) * 1000)
+            UPSTREAM_DURATION.observe(time.monotonic() - start_time, provider=name, model=model)
+            record_tokens(name, model, result.usage)
+            breaker.record_success()
+            if self.scheduler is not None:
+                self.scheduler.settle(name, tokens, result.usage.get("total_tokens"))
+            return result
+
+    async def parse(
+        self,
+        messages: list,
+        response_format: Type[BaseModel],
+        max_tokens: int,
+        provider: Optional[str] = None,
+        on_delta: Optional[DeltaCallback] = None,
+        small: bool = False,
+        priority: str = "normal",
+    ) -> ProviderResponse:
+        """
+        Structured-output call on the requested provider, hedged and failed
+        over to the others. With on_delta, providers that can stream report
+        partial output as it arrives; the others report their final output.
+        With small, each provider's small model is used instead.
+
+        Raises OverloadedError when the call could not be admitted or every
+        provider answered with a rate limit.
+        """
+        primary = self.resolve(provider)
+        names = self._candidates(primary)
+        if not names:
+            raise ProviderUnavailableError("All model providers are unavailable")
+        if names[0] != primary:
+            self.failovers += 1
+            logger.warning(f"Circuit open for provider {primary}, routing to {names[0]}")
+
+        backups = names[1:]
+        tasks: Dict[asyncio.Future, str] = {}
+        errors: List[Exception] = []
+
+        def start(name: str, hedge: bool = False) -> None:
+            task = asyncio.ensure_future(self._attempt(
+                name, messages, response_format, max_tokens, small, on_delta, priority, hedge
+            ))
+            tasks[task] = name
+
+        start(names[0])
+        hedged = False
+        try:
+            while tasks:
+                hedge_after = None
+                if self.hedge_enabled and backups and not hedged:
+                    hedge_after = self.hedge_delay(names[0], self.model_for(names[0], small))
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    self.hedges += 1
+                    logger.info(f"Provider {names[0]} slower than {hedge_after * 1000:.0f}ms, hedging on {backups[0]}")
+                    start(backups.pop(0), hedge=True)
+                    continue
+
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if hedged and name != names[0]:
+                            self.hedge_wins += 1
+                        result = task.result()
+                        if on_delta is not None and not hasattr(self.providers[name], "stream_parse"):
+                            on_delta(result.parsed.model_dump())
+                        return result
+                    errors.append(task.exception())
+                    logger.warning(f"Provider {name} failed: {str(task.exception())}")
+
+                # Another provider would get the same prompt and schema: no failover for bad output
+                if not tasks and backups and not isinstance(errors[-1], UpstreamResponseError):
+                    self.failovers += 1
+                    start(backups.pop(0))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if all(isinstance(error, OverloadedError) for error in errors):
+            # Every provider is saturated: report the one expected to have room first
+            raise min(errors, key=lambda error: error.retry_after)
+        retry_after = _rate_limit_retry_after(errors[-1])
+        if retry_after is not None:
+            raise OverloadedError(f"Provider rate limit reached: {str(errors[-1])}", retry_after) from errors[-1]
+        raise errors[-1]
+
+    async def warm_up(self) -> None:
+        """Import provider SDKs and build their clients in a thread, so neither startup nor the first call waits."""
+        for name, provider in self.providers.items():
+            if not hasattr(provider, "warm_up"):
+                continue
+            start_time = time.time()
+            try:
+                await asyncio.to_thread(provider.warm_up)
+            except Exception as e:
+                logger.warning(f"Warming up {name} failed, it will be retried on first use: {str(e)}")
+                continue
+            logger.info(f"Warmed up {name} in {(time.time() - start_time) * 1000:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "hedge_enabled": self.hedge_enabled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "providers": {
+                name: {
+                    "model": self.providers[name].model,
+                    "small_model": getattr(self.providers[name], "small_model", None),
+                    "calls": stats.calls,
+                    "failures": stats.failures,
+                    "retries": stats.retries,
+                    "rejected": stats.rejected,
+                    "invalid_outputs": stats.invalid_outputs,
+                    "hedge_delay_ms": {model: self.hedge_delay(name, model) * 1000 for model in stats.latency},
+                    "latency": {model: latency.stats() for model, latency in stats.latency.items()},
+                    "circuit": self.breakers[name].stats(),
+                }
+                for name, stats in self.provider_stats.items()
+            },
+        }
+
+
+def create_provider_router(settings, openai_service, gemini_service=None, scheduler=None) -> ProviderRouter:
+    """Router over OpenAI and, when a Gemini key is configured, Gemini."""
+    providers = {"openai": openai_service}
+    if gemini_service is not None:
+        providers["gemini"] = gemini_service
+    return ProviderRouter(
+        providers,
+        default=settings.PROVIDER_DEFAULT if settings.PROVIDER_DEFAULT in providers else "openai",
+        hedge_enabled=settings.PROVIDER_HEDGE_ENABLED,
+        hedge_percentile=settings.PROVIDER_HEDGE_PERCENTILE,
+        hedge_min_samples=settings.PROVIDER_HEDGE_MIN_SAMPLES,
+        hedge_min_delay_ms=settings.PROVIDER_HEDGE_MIN_DELAY_MS,
+        hedge_max_delay_ms=settings.PROVIDER_HEDGE_MAX_DELAY_MS,
+        latency_window=settings.PROVIDER_LATENCY_WINDOW,
+        timeout_seconds=settings.PROVIDER_TIMEOUT_SECONDS,
+        max_retries=settings.PROVIDER_MAX_RETRIES,
+        retry_base_ms=settings.PROVIDER_RETRY_BASE_MS,
+        retry_max_ms=settings.PROVIDER_RETRY_MAX_MS,
+        breaker_failures=settings.PROVIDER_BREAKER_FAILURES,
+        breaker_reset_seconds=settings.PROVIDER_BREAKER_RESET_SECONDS,
+        scheduler=scheduler,
+    )
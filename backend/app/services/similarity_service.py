@@ -0,0 +1,181 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.services.embedding_service import EmbeddingTable, load_embedding_table
+from app.services.lexicon import Lexicon, load_lexicon
+from app.services.openai_service import OpenAIService
+
+SIMILARITY_BACKENDS = ("llm", "embedding", "hybrid")
+
+# Candidates per warmup call, matching the /compare/batch limit
+WARMUP_CHUNK_SIZE = 50
+
+
+class SimilarityService:
+    """
+    Word similarity for /compare, /compare/batch and /judge.
+
+    With a lexicon, words are first reduced to their canonical form (case,
+    plurals, aliases); pairs with the same canonical form score 1.0 right
+    away, and only canonical forms reach the backends and their caches.
+
+    - "llm": every uncached pair is scored by the chat model
+    - "embedding": cosine similarity from the local embedding table; only
+      out-of-vocabulary words go to the LLM
+    - "hybrid": like "embedding", but scores inside the ambiguous band
+      [hybrid_min, hybrid_max] are re-scored by the LLM
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        backend: str = "llm",
+        embeddings: Optional[EmbeddingTable] = None,
+        hybrid_min: float = 0.35,
+        hybrid_max: float = 0.75,
+        lexicon: Optional[Lexicon] = None,
+    ):
+        if backend not in SIMILARITY_BACKENDS:
+            raise ValueError(f"Unknown similarity backend: {backend}")
+        if backend != "llm" and embeddings is None:
+            logger.warning(f"No embedding table loaded, similarity backend '{backend}' falls back to the LLM")
+            backend = "llm"
+        self.openai_service = openai_service
+        self.backend = backend
+        self.embeddings = embeddings
+        self.hybrid_min = hybrid_min
+        self.hybrid_max = hybrid_max
+        self.lexicon = lexicon
+        self.lexical_matches = 0
+        self.embedding_scores = 0
+        self.llm_scores = 0
+        self.warmup: Dict[str, Any] = {"status": "idle"}
+
+    def canonical(self, word: str) -> str:
+        return self.lexicon.canonical(word) if self.lexicon is not None else word.strip().lower()
+
+    def is_match(self, word1: str, word2: str) -> bool:
+        return self.lexicon is not None and self.lexicon.same(word1, word2)
+
+    async def remember(self, word1: str, word2: str, similarity: float) -> None:
+        """Cache a score computed elsewhere (e.g. by /judge) under the canonical pair."""
+        await self.openai_service.remember_similarity(self.canonical(word1), self.canonical(word2), similarity)
+
+    async def compare(self, word1: str, word2: str) -> float:
+        return (await self.compare_batch(word1, [word2]))[0]
+
+    async def compare_batch(self, reference: str, candidates: List[str], priority: str = "normal") -> List[float]:
+        """Similarity of every candidate to the reference, aligned with candidates."""
+        reference = self.canonical(reference)
+        canonical = [self.canonical(word) for word in candidates]
+        matches = {reference} if self.lexicon is not None else set()
+        words = list(dict.fromkeys(word for word in canonical if word not in matches))
+        self.lexical_matches += sum(word in matches for word in canonical)
+
+        scores = dict(zip(words, await self._score(reference, words, priority))) if words else {}
+        scores.update(dict.fromkeys(matches, 1.0))
+        return [scores[word] for word in canonical]
+
+    async def _score(self, reference: str, words: List[str], priority: str) -> List[float]:
+        if self.backend == "llm":
+            scores: List[Optional[float]] = [None] * len(words)
+        else:
+            scores = self.embeddings.similarities(reference, words)
+            if self.backend == "hybrid":
+                scores = [
+                    None if score is not None and self.hybrid_min <= score <= self.hybrid_max else score
+                    for score in scores
+                ]
+
+        missing = [idx for idx, score in enumerate(scores) if score is None]
+        self.embedding_scores += len(words) - len(missing)
+        self.llm_scores += len(missing)
+        if missing:
+            if len(missing) == 1:
+                fresh = [await self.openai_service.compare_semantics(reference, words[missing[0]], priority)]
+            else:
+                fresh = await self.openai_service.compare_batch(reference, [words[idx] for idx in missing], priority)
+            for idx, score in zip(missing, fresh):
+                scores[idx] = score
+        return scores
+
+    async def warm_up(self, topics: List[str], labels: List[str], concurrency: int = 2) -> None:
+        """
+        Score every topic x label pair ahead of time so round scoring is served
+        from the similarity cache. Pairs already cached cost nothing, so this
+        is cheap to repeat on every start.
+        """
+        labels = list(dict.fromkeys(labels))
+        chunks = [
+            (topic, labels[start:start + WARMUP_CHUNK_SIZE])
+            for topic in dict.fromkeys(topics)
+            for start in range(0, len(labels), WARMUP_CHUNK_SIZE)
+        ]
+        pairs = sum(len(chunk) for _, chunk in chunks)
+        self.warmup = {"status": "running", "pairs": pairs, "done": 0, "failed": 0}
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(topic: str, chunk: List[str]) -> None:
+            async with semaphore:
+                try:
+                    # Lowest priority: warmup must never delay players' calls
+                    await self.compare_batch(topic, chunk, "background")
+                    self.warmup["done"] += len(chunk)
+                except Exception as e:
+                    self.warmup["failed"] += len(chunk)
+                    logger.warning(f"Similarity warmup failed for topic '{topic}': {str(e)}")
+
+        await asyncio.gather(*[run(topic, chunk) for topic, chunk in chunks])
+        self.warmup.update(status="done", duration_ms=(time.time() - start_time) * 1000)
+        logger.info(f"Similarity warmup scored {self.warmup['done']}/{self.warmup['pairs']} pairs "
+                    f"in {self.warmup['duration_ms']:.0f}ms")
+
+    async def warm_up_from_file(self, path: str, concurrency: int = 2) -> None:
+        try:
+            topics, labels = load_warmup_file(path)
+        except Exception as e:
+            logger.error(f"Could not load similarity warmup file {path}: {str(e)}")
+            self.warmup = {"status": "error", "error_message": str(e)}
+            return
+        await self.warm_up(topics, labels, concurrency)
+
+    def stats(self) -> Dict[str, Any]:
+        scored = self.lexical_matches + self.embedding_scores + self.llm_scores
+        return {
+            "backend": self.backend,
+            "vocabulary": len(self.embeddings) if self.embeddings is not None else 0,
+            "lexical_matches": self.lexical_matches,
+            "embedding_scores": self.embedding_scores,
+            "llm_scores": self.llm_scores,
+            "lexical_ratio": self.lexical_matches / scored if scored else 0.0,
+            "embedding_ratio": self.embedding_scores / scored if scored else 0.0,
+            "warmup": self.warmup,
+        }
+
+
+def load_warmup_file(path: str) -> Tuple[List[str], List[str]]:
+    """Read {"topics": [...], "labels": [...]}; topics also count as labels."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    topics = [word for word in data.get("topics", []) if word.strip()]
+    labels = [word for word in data.get("labels", []) if word.strip()]
+    return topics, list(dict.fromkeys(labels + topics))
+
+
+def create_similarity_service(settings, openai_service: OpenAIService) -> SimilarityService:
+    """Build the similarity backend selected by SIMILARITY_BACKEND."""
+    backend = settings.SIMILARITY_BACKEND.lower()
+    embeddings = None
+    if backend != "llm":
+        embeddings = load_embedding_table(settings.EMBEDDING_VECTORS_PATH, settings.EMBEDDING_VOCAB_PATH)
+    return SimilarityService(
+        openai_service,
+        backend=backend,
+        embeddings=embeddings,
+        hybrid_min=settings.EMBEDDING_HYBRID_MIN,
+        hybrid_max=settings.EMBEDDING_HYBRID_MAX,
+        lexicon=load_lexicon(settings.LEXICON_ALIASES_PATH) if settings.LEXICAL_FAST_PATH_ENABLED else None,
+    )
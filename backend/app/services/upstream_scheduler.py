@@ -0,0 +1,332 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from app.config import get_settings
+from app.services.provider_router import LatencyHistogram, OverloadedError
+
+# Lower rank is served first; "background" is for internal work such as cache warmup
+PRIORITY_RANKS = {"final": 0, "normal": 1, "preview": 2, "background": 3}
+
+# Rough token costs used to charge the token budget before a call; corrected by settle()
+IMAGE_TOKEN_ESTIMATE = 85  # one low-detail image
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages: list, max_tokens: int) -> int:
+    """Upper estimate of a chat call's tokens: prompt text, images and the full completion budget."""
+    chars = 0
+    images = 0
+    for msg in messages:
+        if isinstance(msg["content"], str):
+            chars += len(msg["content"])
+            continue
+        for content in msg["content"]:
+            if content["type"] == "text":
+                chars += len(content["text"])
+            elif content["type"] == "image_url":
+                images += 1
+    return chars // CHARS_PER_TOKEN + images * IMAGE_TOKEN_ESTIMATE + max_tokens
+
+
+class TokenBucket:
+    """Budget refilled continuously at limit_per_minute, holding at most one minute's worth."""
+
+    def __init__(self, limit_per_minute: float):
+        self.capacity = float(limit_per_minute)
+        self.rate = limit_per_minute / 60
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (amounts above capacity only need a full bucket)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Waiter:
+    __slots__ = ("rank", "seq", "priority", "tokens", "future", "enqueued_at")
+
+    def __init__(self, rank: int, seq: int, priority: str, tokens: int, future: asyncio.Future):
+        self.rank = rank
+        self.seq = seq
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class ProviderBudget:
+    """Request and token buckets of one provider plus its queue of waiting calls."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.queue: List[Waiter] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def take(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+
+    def give_back(self, tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.give_back(1)
+        if self.tokens is not None:
+            self.tokens.give_back(tokens)
+
+    def backlog_wait(self, tokens: int, rank: int) -> float:
+        """Rough time until a call would be admitted behind the waiters served before it."""
+        ahead = [waiter for waiter in self.queue if waiter.rank <= rank]
+        requests = len(ahead) + 1
+        total_tokens = sum(waiter.tokens for waiter in ahead) + tokens
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(0.0, (requests - self.requests.level) / self.requests.rate)
+        if self.tokens is not None:
+            wait = max(wait, (total_tokens - self.tokens.level) / self.tokens.rate)
+        return wait
+
+
+class PriorityStats:
+    def __init__(self):
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.expired = 0
+        self.wait = LatencyHistogram()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "expired": self.expired,
+            "wait": self.wait.stats(),
+        }
+
+
+class UpstreamScheduler:
+    """
+    Priority-aware admission control for upstream model calls.
+
+    Every provider has a requests-per-minute and a tokens-per-minute token
+    bucket. A call is admitted right away if both buckets cover it and nobody
+    is queued; otherwise it waits in a priority queue (final before normal
+    before preview before background, FIFO within a priority) that is served
+    in order as the buckets refill.
+
+    Each priority has a queue deadline. A call that would not be admitted
+    within it, or that is still queued when it passes, fails with
+    OverloadedError carrying a Retry-After estimate instead of holding the
+    client. When the queue is full, a newcomer displaces the lowest-priority
+    waiter if it outranks it and is shed otherwise.
+
+    Token costs are estimated before the call and settled against the
+    reported usage afterwards.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        deadlines_ms: Optional[Dict[str, int]] = None,
+        max_queue: int = 64,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.budgets = {name: ProviderBudget(rpm, tpm) for name, (rpm, tpm) in limits.items()}
+        self.deadlines = {
+            priority: ms / 1000
+            for priority, ms in (deadlines_ms or {"final": 15000, "normal": 5000, "preview": 1000, "background": 60000}).items()
+        }
+        self.max_queue = max_queue
+        self._seq = itertools.count()
+        self.priority_stats = {priority: PriorityStats() for priority in PRIORITY_RANKS}
+
+    def _budget(self, provider: str) -> Optional[ProviderBudget]:
+        return self.budgets.get(provider) if self.enabled else None
+
+    def _shed(self, priority: str, message: str, retry_after: float) -> OverloadedError:
+        self.priority_stats[priority].shed += 1
+        logger.warning(f"Shedding {priority} call: {message}")
+        return OverloadedError(message, max(1.0, math.ceil(retry_after)))
+
+    def try_acquire(self, provider: str, tokens: int) -> bool:
+        """Admit a call only if the budget covers it right now and nobody is queued (used for hedges)."""
+        budget = self._budget(provider)
+        if budget is None:
+            return True
+        if budget.queue or budget.wait_time(tokens) > 0:
+            return False
+        budget.take(tokens)
+        return True
+
+    async def acquire(self, provider: str, tokens: int, priority: str = "normal") -> None:
+        """Wait until the provider's budget admits a call costing tokens, or raise OverloadedError."""
+        priority = priority if priority in PRIORITY_RANKS else "normal"
+        stats = self.priority_stats[priority]
+        budget = self._budget(provider)
+        if budget is None:
+            stats.admitted += 1
+            return
+
+        if not budget.queue and budget.wait_time(tokens) == 0:
+            budget.take(tokens)
+            stats.admitted += 1
+            stats.wait.record(0.0)
+            return
+
+        rank = PRIORITY_RANKS[priority]
+        deadline = self.deadlines.get(priority, self.deadlines["normal"])
+        expected = budget.backlog_wait(tokens, rank)
+        if expected > deadline:
+            raise self._shed(priority, f"{provider} budget exhausted, expected wait {expected:.1f}s", expected)
+
+        if len(budget.queue) >= self.max_queue:
+            lowest = max(budget.queue)
+            if lowest.rank <= rank:
+                raise self._shed(priority, f"{provider} queue full ({len(budget.queue)} waiting)", expected)
+            budget.queue.remove(lowest)
+            heapq.heapify(budget.queue)
+            lowest.future.set_exception(self._shed(
+                lowest.priority, f"{provider} queue full, displaced by a {priority} call", expected
+            ))
+
+        waiter = Waiter(rank, next(self._seq), priority, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(budget.queue, waiter)
+        stats.queued += 1
+        self._schedule(budget)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), deadline)
+        except asyncio.TimeoutError:
+            stats.expired += 1
+            raise self._shed(priority, f"{provider} queue deadline of {deadline:.1f}s passed",
+                             budget.backlog_wait(tokens, rank))
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                if waiter in budget.queue:
+                    budget.queue.remove(waiter)
+                    heapq.heapify(budget.queue)
+                self._schedule(budget)
+
+        stats.admitted += 1
+        stats.wait.record((time.monotonic() - waiter.enqueued_at) * 1000)
+
+    def _schedule(self, budget: ProviderBudget) -> None:
+        """Admit queued calls the budget covers, then wake up again when the head will fit."""
+        if budget.timer is not None:
+            budget.timer.cancel()
+            budget.timer = None
+        while budget.queue:
+            head = budget.queue[0]
+            wait = budget.wait_time(head.tokens)
+            if wait > 0:
+                budget.timer = asyncio.get_running_loop().call_later(wait, self._schedule, budget)
+                return
+            heapq.heappop(budget.queue)
+            budget.take(head.tokens)
+            head.future.set_result(None)
+
+    async def admit(
+        self, provider: str, messages: list, max_tokens: int, priority: str = "normal", wait: bool = True
+    ) -> int:
+        """
+        Admit one chat call, returning the tokens charged for it (to settle later).
+        Without wait the call is only admitted if the budget covers it right now.
+        """
+        tokens = estimate_tokens(messages, max_tokens)
+        if wait:
+            await self.acquire(provider, tokens, priority)
+        elif not self.try_acquire(provider, tokens):
+            raise OverloadedError(f"No {provider} budget available right now", 1.0)
+        return tokens
+
+    def settle(self, provider: str, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token budget once the real usage of an admitted call is known."""
+        budget = self._budget(provider)
+        if budget is None or budget.tokens is None or not actual:
+            return
+        if actual < estimated:
+            budget.tokens.give_back(estimated - actual)
+        else:
+            budget.tokens.take(actual - estimated)
+
+    def refund(self, provider: str, tokens: int) -> None:
+        """Return the request and tokens of an admitted call that was never sent."""
+        budget = self._budget(provider)
+        if budget is not None:
+            budget.give_back(tokens)
+            self._schedule(budget)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_queue": self.max_queue,
+            "deadlines_ms": {priority: deadline * 1000 for priority, deadline in self.deadlines.items()},
+            "providers": {
+                name: {
+                    "queue_depth": len(budget.queue),
+                    "queued_by_priority": {
+                        priority: sum(waiter.priority == priority for waiter in budget.queue)
+                        for priority in PRIORITY_RANKS
+                    },
+                    "requests_available": budget.requests.level if budget.requests else None,
+                    "tokens_available": budget.tokens.level if budget.tokens else None,
+                }
+                for name, budget in self.budgets.items()
+            },
+            "priorities": {priority: stats.stats() for priority, stats in self.priority_stats.items()},
+        }
+
+
+@lru_cache()
+def get_upstream_scheduler() -> UpstreamScheduler:
+    """Get the shared scheduler configured by the ADMISSION_* and *_RPM/TPM_LIMIT settings."""
+    settings = get_settings()
+    return UpstreamScheduler(
+        limits={
+            "openai": (settings.OPENAI_RPM_LIMIT, settings.OPENAI_TPM_LIMIT),
+            "gemini": (settings.GEMINI_RPM_LIMIT, settings.GEMINI_TPM_LIMIT),
+        },
+        deadlines_ms={
+            "final": settings.ADMISSION_DEADLINE_FINAL_MS,
+            "normal": settings.ADMISSION_DEADLINE_NORMAL_MS,
+            "preview": settings.ADMISSION_DEADLINE_PREVIEW_MS,
+            "background": settings.ADMISSION_DEADLINE_BACKGROUND_MS,
+        },
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        enabled=settings.ADMISSION_ENABLED,
+    )
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Tuple
+from loguru import logger
+from app.config import get_settings
+
+
+def _timed_call(fn: Callable, args: Tuple) -> Tuple[Any, float, float]:
+    """Run fn in the worker and report when it actually started and finished."""
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at, time.time()
+
+
+class WorkerPool:
+    """
+    Executor for CPU-bound work (base64 decoding, image checks and transforms)
+    so it does not block the event loop.
+
+    Functions run in a process pool must be module-level and their arguments
+    picklable.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4):
+        if kind == "thread":
+            self.executor: Executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-worker")
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.created_at = time.time()
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        self.pending += 1
+        try:
+            result, started_at, finished_at = await loop.run_in_executor(
+                self.executor, _timed_call, fn, args
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.total_wait_ms += max(0.0, started_at - submitted_at) * 1000
+        self.total_run_ms += (finished_at - started_at) * 1000
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        active = min(self.pending, self.max_workers)
+        uptime_ms = (time.time() - self.created_at) * 1000
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "active": active,
+            "queue_depth": max(0, self.pending - self.max_workers),
+            "utilization": active / self.max_workers,
+            "busy_ratio": self.total_run_ms / (uptime_ms * self.max_workers) if uptime_ms else 0.0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": self.total_wait_ms / self.completed if self.completed else 0.0,
+            "avg_run_ms": self.total_run_ms / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache()
+def get_worker_pool() -> WorkerPool:
+    """Get the shared worker pool configured by WORKER_POOL_KIND / WORKER_POOL_SIZE."""
+    settings = get_settings()
+    logger.info(f"Starting {settings.WORKER_POOL_KIND} worker pool with {settings.WORKER_POOL_SIZE} workers")
+    return WorkerPool(settings.WORKER_POOL_KIND, settings.WORKER_POOL_SIZE)
@@ -0,0 +1,150 @@
+"""
+Compare the embedding similarity backend with the LLM scores it replaces:
+latency per pair and per batch, vocabulary coverage, and agreement.
+
+    python benchmarks/compare_similarity.py                      # embedding only, built-in pairs
+    python benchmarks/compare_similarity.py --llm                # also score every pair with the LLM
+    python benchmarks/compare_similarity.py --pairs pairs.csv    # word1,word2[,llm_score] per line
+    python benchmarks/compare_similarity.py --llm --save pairs.csv
+
+LLM scores given in the pairs file are used instead of calling the model, so a
+recorded run (--save) can be re-checked offline against a new embedding table.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+# (topic, label) pairs typical of a round: exact hits, near synonyms, related and unrelated guesses
+DEFAULT_PAIRS = [
+    ("cat", "cat"), ("cat", "kitten"), ("cat", "dog"), ("cat", "lion"), ("cat", "car"),
+    ("car", "automobile"), ("car", "truck"), ("car", "wheel"), ("car", "banana"),
+    ("house", "home"), ("house", "building"), ("house", "castle"), ("house", "tree"),
+    ("tree", "plant"), ("tree", "forest"), ("tree", "leaf"), ("tree", "fish"),
+    ("sun", "star"), ("sun", "moon"), ("sun", "light"), ("sun", "circle"),
+    ("fish", "shark"), ("fish", "boat"), ("fish", "bird"), ("fish", "ocean"),
+    ("bicycle", "bike"), ("bicycle", "motorcycle"), ("bicycle", "glasses"),
+    ("apple", "fruit"), ("apple", "pear"), ("apple", "ball"), ("apple", "computer"),
+    ("guitar", "violin"), ("guitar", "music"), ("guitar", "spoon"),
+    ("airplane", "plane"), ("airplane", "bird"), ("airplane", "cross"),
+    ("flower", "rose"), ("flower", "sun"), ("flower", "stick"),
+    ("snowman", "snow"), ("snowman", "person"), ("snowman", "circle"),
+]
+
+
+def load_pairs(path: Optional[str]) -> List[Tuple[str, str, Optional[float]]]:
+    if path is None:
+        return [(word1, word2, None) for word1, word2 in DEFAULT_PAIRS]
+    pairs = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[0] and not row[0].startswith("#"):
+                pairs.append((row[0], row[1], float(row[2]) if len(row) > 2 and row[2] else None))
+    return pairs
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def rank(values: List[float]) -> np.ndarray:
+    return np.argsort(np.argsort(values)).astype(float)
+
+
+async def score_with_llm(pairs: List[Tuple[str, str, Optional[float]]]) -> Tuple[List[float], List[float]]:
+    from app.services.openai_service import OpenAIService
+
+    service = OpenAIService()
+    service.similarity_cache = None  # measure real calls
+    scores, latencies = [], []
+    for word1, word2, recorded in pairs:
+        if recorded is not None:
+            scores.append(recorded)
+            continue
+        start = time.perf_counter()
+        scores.append(await service.compare_semantics(word1, word2))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return scores, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", help="CSV of word1,word2[,llm_score]")
+    parser.add_argument("--vectors", default=os.environ.get("EMBEDDING_VECTORS_PATH", "embeddings/vectors.npy"))
+    parser.add_argument("--vocab", default=os.environ.get("EMBEDDING_VOCAB_PATH", "embeddings/vocab.txt"))
+    parser.add_argument("--llm", action="store_true", help="Score pairs without a recorded llm_score with the LLM")
+    parser.add_argument("--save", help="Write word1,word2,llm_score to this CSV")
+    parser.add_argument("--repeat", type=int, default=200, help="Timing repetitions for the embedding backend")
+    args = parser.parse_args()
+
+    from app.services.embedding_service import EmbeddingTable
+
+    pairs = load_pairs(args.pairs)
+    load_start = time.perf_counter()
+    table = EmbeddingTable(args.vectors, args.vocab)
+    print(f"Embedding table: {len(table)} words, {table.dims} dims, opened in {(time.perf_counter() - load_start) * 1000:.1f}ms")
+
+    embedding_scores = [table.similarity(word1, word2) for word1, word2, _ in pairs]
+    covered = sum(score is not None for score in embedding_scores)
+    print(f"Coverage: {covered}/{len(pairs)} pairs in vocabulary")
+
+    per_pair = []
+    for _ in range(args.repeat):
+        for word1, word2, _ in pairs:
+            start = time.perf_counter()
+            table.similarity(word1, word2)
+            per_pair.append((time.perf_counter() - start) * 1e6)
+    print(f"Embedding per pair: p50 {percentile(per_pair, 50):.1f}us  p95 {percentile(per_pair, 95):.1f}us")
+
+    by_reference = {}
+    for word1, word2, _ in pairs:
+        by_reference.setdefault(word1, []).append(word2)
+    batch = []
+    for _ in range(args.repeat):
+        for reference, candidates in by_reference.items():
+            start = time.perf_counter()
+            table.similarities(reference, candidates)
+            batch.append((time.perf_counter() - start) * 1e6)
+    print(f"Embedding per batch (avg {len(pairs) / len(by_reference):.1f} candidates): "
+          f"p50 {percentile(batch, 50):.1f}us  p95 {percentile(batch, 95):.1f}us")
+
+    if not args.llm and all(recorded is None for _, _, recorded in pairs):
+        print("No LLM scores: pass --llm, or a pairs file with an llm_score column, to measure agreement")
+        return
+
+    if not args.llm:
+        pairs = [pair for pair in pairs if pair[2] is not None]
+        embedding_scores = [table.similarity(word1, word2) for word1, word2, _ in pairs]
+    llm_scores, llm_latencies = asyncio.run(score_with_llm(pairs))
+    if llm_latencies:
+        print(f"LLM per pair: p50 {percentile(llm_latencies, 50):.0f}ms  p95 {percentile(llm_latencies, 95):.0f}ms "
+              f"({len(llm_latencies)} calls)")
+
+    if args.save:
+        with open(args.save, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows((word1, word2, score) for (word1, word2, _), score in zip(pairs, llm_scores))
+        print(f"Saved LLM scores to {args.save}")
+
+    both = [(e, l) for e, l in zip(embedding_scores, llm_scores) if e is not None]
+    if len(both) < 2:
+        print("Not enough in-vocabulary pairs to measure agreement")
+        return
+    emb, llm = (list(values) for values in zip(*both))
+    diffs = [abs(e - l) for e, l in both]
+    print(f"Agreement over {len(both)} pairs:")
+    print(f"  Pearson r         {np.corrcoef(emb, llm)[0, 1]:.3f}")
+    print(f"  Spearman rho      {np.corrcoef(rank(emb), rank(llm))[0, 1]:.3f}")
+    print(f"  Mean abs diff     {statistics.mean(diffs):.3f}")
+    print(f"  Within 0.2        {sum(diff <= 0.2 for diff in diffs) / len(diffs):.0%}")
+
+
+if __name__ == "__main__":
+    main()
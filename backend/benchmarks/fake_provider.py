@@ -0,0 +1,383 @@
+"""
+Deterministic local stand-in for the OpenAI and Gemini APIs, for load tests and
+offline tests. No network access or API spend.
+
+    python benchmarks/fake_provider.py --port 8900
+    python benchmarks/fake_provider.py --port 8900 --latency-ms 1200 --distribution lognormal --spread 0.6
+    python benchmarks/fake_provider.py --port 8900 --error-rate 0.02 --rate-limit-rate 0.05
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1 and
+GEMINI_BASE_URL=http://127.0.0.1:8900/v1beta. It serves:
+
+- POST /v1/chat/completions: structured output (response_format json_schema),
+  streamed or not, and plain completions (word similarity numbers)
+- POST /v1beta/models/{model}:generateContent: Gemini JSON output, using the
+  schema the backend appends to the prompt
+- GET /stats: request, error and token counters; HEAD anything (connection warmup)
+
+Answers are generated from the requested JSON schema and depend only on the
+request body: the same request always gets the same labels and scores. Batched
+calls get one entry per "Image id:" in the prompt and similarity batches one
+score per quoted candidate word. Latency is drawn from a fixed, uniform or
+lognormal distribution (plus a per-image cost); a share of calls can fail with
+500 or 429 (Retry-After: 1).
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+LABELS = [
+    "cat", "dog", "house", "tree", "car", "sun", "fish", "bicycle", "apple", "guitar",
+    "airplane", "flower", "snowman", "boat", "star", "moon", "bird", "chair", "clock", "cloud",
+]
+
+SCHEMA_MARKER = "matching this JSON schema:\n"
+
+
+class LatencyModel:
+    """Upstream latency: a base draw from the distribution plus per_image_ms per image."""
+
+    def __init__(
+        self, distribution: str = "lognormal", median_ms: float = 800, spread: float = 0.5,
+        per_image_ms: float = 0, seed: int = 0,
+    ):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{distribution}'")
+        self.distribution = distribution
+        self.median_ms = median_ms
+        self.spread = spread
+        self.per_image_ms = per_image_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self, images: int = 0) -> float:
+        """Seconds to wait before answering."""
+        with self.lock:
+            if self.distribution == "fixed":
+                base = self.median_ms
+            elif self.distribution == "uniform":
+                base = self.rng.uniform(self.median_ms * (1 - self.spread), self.median_ms * (1 + self.spread))
+            else:
+                base = self.median_ms * math.exp(self.rng.gauss(0, self.spread))
+        return max(0.0, base + images * self.per_image_ms) / 1000
+
+
+class RequestContext:
+    """What the answer to one request depends on, extracted from its prompt."""
+
+    def __init__(self, text: str, images: int, seed: str):
+        self.text = text
+        self.images = images
+        self.rng = random.Random(seed)
+        self.image_ids = re.findall(r"Image id: (\S+)", text)
+        top_k = re.search(r"Top (\d+) single-word labels", text)
+        self.top_k = int(top_k.group(1)) if top_k else 3
+        words = re.search(r"each of these words:\s*([^\n]*)", text)
+        self.words = re.findall(r"'([^']*)'", words.group(1)) if words else []
+
+    def score(self) -> float:
+        return round(self.rng.uniform(0.05, 0.99), 2)
+
+
+def _resolve(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    while "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def generate(schema: Dict[str, Any], root: Dict[str, Any], ctx: RequestContext, name: str = "") -> Any:
+    """A deterministic instance of a JSON schema, shaped by the request context."""
+    schema = _resolve(schema, root)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {prop: generate(sub, root, ctx, prop) for prop, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        items = _resolve(schema.get("items", {}), root)
+        properties = items.get("properties", {})
+        if "image_id" in properties and ctx.image_ids:
+            return [
+                dict(generate(items, root, ctx), image_id=image_id) for image_id in ctx.image_ids
+            ]
+        if "word" in properties and ctx.words:
+            return [dict(generate(items, root, ctx), word=word) for word in ctx.words]
+        return [generate(items, root, ctx) for _ in range(ctx.top_k)]
+    if kind == "number":
+        return ctx.score()
+    if kind == "integer":
+        return ctx.rng.randint(0, 10)
+    if kind == "boolean":
+        return ctx.rng.random() < 0.5
+    if name == "label":
+        return ctx.rng.choice(LABELS)
+    if name == "reason":
+        return "The shapes resemble one."
+    return "fake"
+
+
+def _usage(text: str, images: int, content: str) -> Tuple[int, int]:
+    return len(text) // 4 + images * 85, max(1, len(content) // 4)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients hang up on calls they no longer need (hedging, timeouts); that is not an error here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeProvider:
+    """
+    Threaded HTTP server answering like the providers. start() returns its base
+    URL; it can run inside a test or benchmark process, or standalone.
+    """
+
+    def __init__(
+        self, latency: Optional[LatencyModel] = None, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+        stream_chunk_chars: int = 12, seed: int = 0,
+    ):
+        self.latency = latency or LatencyModel(distribution="fixed", median_ms=0)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunk_chars = stream_chunk_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0,
+                         "prompt_tokens": 0, "completion_tokens": 0}
+        self.server: Optional[_Server] = None
+
+    def _count(self, **increments: int) -> None:
+        with self.lock:
+            for name, amount in increments.items():
+                self.counters[name] += amount
+
+    def _injected_failure(self) -> Optional[int]:
+        with self.lock:
+            draw = self.rng.random()
+        if draw < self.error_rate:
+            return 500
+        if draw < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        provider = self
+
+        class Handler(_Handler):
+            fake = provider
+
+        self.server = _Server((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def _openai_text(messages: List[dict]) -> Tuple[str, int]:
+    texts, images = [], 0
+    for msg in messages:
+        if isinstance(msg.get("content"), str):
+            texts.append(msg["content"])
+            continue
+        for part in msg.get("content") or []:
+            if part.get("type") == "text":
+                texts.append(part["text"])
+            elif part.get("type") == "image_url":
+                images += 1
+    return "\n".join(texts), images
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    fake: FakeProvider
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_HEAD(self) -> None:
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.fake.lock:
+                self._send_json(200, dict(self.fake.counters))
+            return
+        self._send_json(404, {"error": {"message": f"No route for GET {self.path}"}})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = json.loads(body or b"{}")
+        seed = hashlib.sha256(body).hexdigest()
+        self.fake._count(requests=1)
+
+        gemini = re.search(r"/models/([^/:]+):generateContent$", self.path)
+        if not gemini and not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"No route for POST {self.path}"}})
+            return
+
+        failure = self.fake._injected_failure()
+        if failure is not None:
+            time.sleep(self.fake.latency.sample() / 10)
+            if failure == 429:
+                self.fake._count(rate_limited=1)
+                self._send_json(429, {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_exceeded",
+                                                "code": 429}}, {"Retry-After": "1"})
+            else:
+                self.fake._count(errors=1)
+                self._send_json(500, {"error": {"message": "Internal error (fake)", "type": "server_error",
+                                                "code": 500}})
+            return
+
+        if gemini:
+            self._gemini(request, gemini.group(1), seed)
+        else:
+            self._chat_completion(request, seed)
+
+    def _chat_completion(self, request: Dict[str, Any], seed: str) -> None:
+        text, images = _openai_text(request.get("messages", []))
+        ctx = RequestContext(text, images, seed)
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(generate(schema, schema, ctx))
+        elif "similarity" in text:
+            content = f"{ctx.score():.2f}"
+        else:
+            content = "This is a fake completion."
+        prompt_tokens, completion_tokens = _usage(text, images, content)
+        self.fake._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = request.get("model", "fake")
+        latency = self.fake.latency.sample(images)
+
+        if not request.get("stream"):
+            time.sleep(latency)
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                             "message": {"role": "assistant", "content": content, "refusal": None}}],
+                "usage": usage,
+            })
+            return
+
+        # Streamed: the first token after 40% of the latency, the rest spread over the remainder
+        self.fake._count(streamed=1)
+        pieces = [content[i:i + self.fake.stream_chunk_chars]
+                  for i in range(0, len(content), self.fake.stream_chunk_chars)] or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> None:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason,
+                                                  "logprobs": None}], **extra}
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        time.sleep(latency * 0.4)
+        for idx, piece in enumerate(pieces):
+            event({"role": "assistant", "content": piece} if idx == 0 else {"content": piece})
+            time.sleep(latency * 0.6 / len(pieces))
+        event({}, "stop")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._send_chunk(f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage})}\n\n".encode())
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _gemini(self, request: Dict[str, Any], model: str, seed: str) -> None:
+        texts, images = [], 0
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    texts.append(part["text"])
+                elif "inlineData" in part or "inline_data" in part:
+                    images += 1
+        text = "\n".join(texts)
+        ctx = RequestContext(text, images, seed)
+        marker = text.rfind(SCHEMA_MARKER)
+        if marker >= 0:
+            schema = json.loads(text[marker + len(SCHEMA_MARKER):])
+            content = json.dumps(generate(schema, schema, ctx))
+        else:
+            content = "This is a fake completion."
+        prompt_tokens, completion_tokens = _usage(text, images, content)
+        self.fake._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        time.sleep(self.fake.latency.sample(images))
+        self._send_json(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": content}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                              "totalTokenCount": prompt_tokens + completion_tokens},
+            "modelVersion": model,
+        })
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Fake provider options, shared with the load benchmark."""
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median upstream latency")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="Lognormal sigma, or relative half-width of the uniform distribution")
+    parser.add_argument("--per-image-ms", type=float, default=0, help="Extra latency per image in the call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls failing with 429")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args: argparse.Namespace) -> FakeProvider:
+    return FakeProvider(
+        LatencyModel(args.distribution, args.latency_ms, args.spread, args.per_image_ms, args.seed),
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    provider = from_arguments(args)
+    url = provider.start(args.host, args.port)
+    print(f"Fake provider on {url}: OPENAI_BASE_URL={url}/v1 GEMINI_BASE_URL={url}/v1beta")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    main()
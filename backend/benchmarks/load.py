@@ -0,0 +1,337 @@
+"""
+Load test /api/v1/predict, /api/v1/compare and /health against the fake provider
+(benchmarks/fake_provider.py): no API keys, no spend, repeatable numbers.
+
+    python benchmarks/load.py                                    # every scenario, 16 clients, 15s each
+    python benchmarks/load.py --scenarios predict --concurrency 64 --duration 30 --images 4
+    python benchmarks/load.py --latency-ms 1500 --error-rate 0.02 --output runs/after.json --compare runs/before.json
+    python benchmarks/load.py --env PREDICT_FAN_OUT=false --env MICRO_BATCH_ENABLED=true
+
+Each scenario runs closed-loop clients for --duration seconds after a --warmup
+period that is not measured, against a freshly started uvicorn server whose
+providers point at the fake. It reports latency percentiles, throughput,
+responses by status, the server's peak RSS and its event loop lag (scraped
+from /metrics), and writes everything with the configuration and git commit as
+JSON. --compare prints the change of each number against an earlier result file.
+
+Caches are off and every predict request carries a different image, so each
+request reaches the provider; admission control is off so client concurrency,
+not the provider budgets, sets the load. --env overrides any setting.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_provider import LABELS, add_arguments, from_arguments  # noqa: E402
+
+SCENARIOS = ["predict", "compare", "health"]
+
+
+def server_env(provider_url: str, overrides: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "load-benchmark",
+        "GEMINI_API_KEY": "load-benchmark",
+        "OPENAI_BASE_URL": f"{provider_url}/v1",
+        "GEMINI_BASE_URL": f"{provider_url}/v1beta",
+        "PREDICTION_CACHE_BACKEND": "none",
+        "SIMILARITY_CACHE_BACKEND": "none",
+        "SIMILARITY_WARMUP_PATH": "",
+        "ADMISSION_ENABLED": "false",
+    })
+    for override in overrides:
+        name, _, value = override.partition("=")
+        env[name] = value
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: Dict[str, str], timeout: float = 30) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}; run uvicorn app.main:app to see why")
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return process, url
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"Server did not answer /health within {timeout:.0f}s")
+
+
+def read_memory_kb(pid: int, field: str) -> Optional[int]:
+    """VmHWM (peak RSS) or VmRSS of a process, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss(pid: int) -> bool:
+    """Start a new VmHWM measurement window; needs Linux 4.0+ and the right to write clear_refs."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def scrape_lag(url: str) -> Dict[float, float]:
+    """Cumulative event_loop_lag_seconds buckets (upper bound -> count), plus the sum under key -1."""
+    with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+        text = response.read().decode()
+    buckets: Dict[float, float] = {}
+    for match in re.finditer(r'^event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\S+)$', text, re.M):
+        buckets[float(match.group(1))] = float(match.group(2))
+    total = re.search(r"^event_loop_lag_seconds_sum (\S+)$", text, re.M)
+    buckets[-1] = float(total.group(1)) if total else 0.0
+    return buckets
+
+
+def lag_summary(before: Dict[float, float], after: Dict[float, float]) -> Dict[str, Optional[float]]:
+    """Event loop lag during a scenario from two scrapes; percentiles are bucket upper bounds."""
+    bounds = sorted(bound for bound in after if bound >= 0)
+    counts = [after[bound] - before.get(bound, 0) for bound in bounds]
+    samples = counts[-1] if counts else 0
+    if not samples:
+        return {"samples": 0, "mean_ms": None, "p50_ms": None, "p99_ms": None, "max_bucket_ms": None}
+
+    def percentile(q: float) -> float:
+        for bound, count in zip(bounds, counts):
+            if count >= q * samples:
+                return bound * 1000
+        return float("inf")
+
+    reached = [bound for bound, count, previous in zip(bounds, counts, [0] + counts) if count > previous]
+    return {
+        "samples": int(samples),
+        "mean_ms": round((after[-1] - before.get(-1, 0)) / samples * 1000, 3),
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+        "max_bucket_ms": reached[-1] * 1000 if reached else 0.0,
+    }
+
+
+def make_images(count: int, size: int = 128) -> List[str]:
+    """Distinct small drawings as base64 PNGs, so no two in-flight requests share an image."""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for idx in range(count):
+        image = Image.new("RGB", (size, size), "white")
+        draw = ImageDraw.Draw(image)
+        x, y = idx % (size - 20), (idx * 7) % (size - 20)
+        draw.ellipse([x, y, x + 20 + idx % 50, y + 20 + idx % 30], outline="black", width=3)
+        draw.line([0, idx % size, size, size - idx % size], fill="black", width=2)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+    return images
+
+
+def request_factory(scenario: str, args: argparse.Namespace):
+    """Function returning (method, path, json body) for the next request of a scenario."""
+    if scenario == "health":
+        return lambda: ("GET", "/health", None)
+    if scenario == "compare":
+        pairs = itertools.cycle(itertools.permutations(LABELS, 2))
+        return lambda: ("POST", "/api/v1/compare", dict(zip(("word1", "word2"), next(pairs))))
+    images = itertools.cycle(make_images(max(256, args.concurrency * args.images * 4)))
+    return lambda: ("POST", "/api/v1/predict", {
+        "images": [
+            {"image_id": f"img_{idx}", "base64_data": next(images), "format": "image/png"} for idx in range(args.images)
+        ],
+        "model": args.model,
+        "top_k": 3,
+    })
+
+
+async def drive(url: str, scenario: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Closed loop: each client sends its next request as soon as the previous one is answered."""
+    import httpx
+
+    next_request = request_factory(scenario, args)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.request_timeout) as client:
+        measure_from = time.perf_counter() + args.warmup
+        stop_at = measure_from + args.duration
+
+        async def client_loop() -> None:
+            while time.perf_counter() < stop_at:
+                method, path, body = next_request()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                if start >= measure_from:
+                    latencies.append(time.perf_counter() - start)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    return {"latencies": latencies, "statuses": statuses}
+
+
+def percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ordered = sorted(latencies)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2), "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def run_scenario(url: str, pid: int, scenario: str, args: argparse.Namespace) -> Dict[str, Any]:
+    peak_reset = reset_peak_rss(pid)
+    lag_before = scrape_lag(url)
+    result = asyncio.run(drive(url, scenario, args))
+    lag_after = scrape_lag(url)
+
+    successes = sum(count for status, count in result["statuses"].items() if status.startswith("2"))
+    return {
+        "requests": len(result["latencies"]),
+        "throughput_rps": round(successes / args.duration, 2),
+        "statuses": result["statuses"],
+        "latency": percentiles(result["latencies"]),
+        "event_loop_lag": lag_summary(lag_before, lag_after),
+        # Without a reset (old kernel, no permission) this is the peak since the server started
+        "peak_rss_mb": round((read_memory_kb(pid, "VmHWM") or 0) / 1024, 1),
+        "peak_rss_since_scenario_start": peak_reset,
+        "rss_after_mb": round((read_memory_kb(pid, "VmRSS") or 0) / 1024, 1),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    latency, lag = result["latency"], result["event_loop_lag"]
+    print(f"{name:8} {result['requests']:6d} req  {result['throughput_rps']:8.1f} req/s  "
+          f"p50 {latency['p50_ms']}ms  p95 {latency['p95_ms']}ms  p99 {latency['p99_ms']}ms  "
+          f"peak RSS {result['peak_rss_mb']}MB  loop lag p99 {lag['p99_ms']}ms  statuses {result['statuses']}")
+
+
+COMPARED = [
+    ("throughput_rps", lambda result: result["throughput_rps"]),
+    ("p50_ms", lambda result: result["latency"]["p50_ms"]),
+    ("p95_ms", lambda result: result["latency"]["p95_ms"]),
+    ("p99_ms", lambda result: result["latency"]["p99_ms"]),
+    ("peak_rss_mb", lambda result: result["peak_rss_mb"]),
+    ("loop_lag_p99_ms", lambda result: result["event_loop_lag"]["p99_ms"]),
+]
+
+
+def print_comparison(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\nAgainst {baseline.get('git_commit')} ({baseline.get('started_at')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric, value in COMPARED:
+            old, new = value(before), value(result)
+            if old and new is not None:
+                changes.append(f"{metric} {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+        print(f"{name:8} " + "  ".join(changes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--images", type=int, default=1, help="Images per predict request")
+    parser.add_argument("--model", default="openai", help="Predict request model field (openai or gemini)")
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--provider-url", help="Use a fake provider already running there instead of starting one")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Server setting override")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    provider = None
+    provider_url = args.provider_url
+    if provider_url is None:
+        provider = from_arguments(args)
+        provider_url = provider.start()
+    process, url = start_server(server_env(provider_url, args.env))
+
+    report: Dict[str, Any] = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {},
+    }
+    try:
+        for scenario in args.scenarios:
+            result = run_scenario(url, process.pid, scenario, args)
+            report["scenarios"][scenario] = result
+            print_result(scenario, result)
+    finally:
+        process.terminate()
+        process.wait()
+        if provider is not None:
+            report["provider"] = dict(provider.counters)
+            provider.stop()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as baseline:
+            print_comparison(json.load(baseline), report)
+
+
+if __name__ == "__main__":
+    main()
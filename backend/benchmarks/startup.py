@@ -0,0 +1,123 @@
+"""
+Measure cold start: importing the app and the time until a fresh server answers /health.
+Every run uses a new interpreter, like a machine resumed from zero.
+
+    python benchmarks/startup.py                         # 5 runs of each
+    python benchmarks/startup.py --runs 10 --skip-server
+    python benchmarks/startup.py --max-import-ms 1500 --max-ready-ms 3000   # exit 1 on regression
+
+Provider SDKs (openai, google.generativeai) must not be imported by the app
+import itself; they are loaded by the warmup task once the server is up, and
+the run fails if they show up earlier. API keys default to placeholders: no
+upstream call is made.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay out of the import path of app.main
+LAZY_MODULES = ["openai", "google.generativeai"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"import_ms": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def benchmark_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")
+    env.setdefault("GEMINI_API_KEY", "startup-benchmark")
+    # Keep startup work identical between runs
+    env["SIMILARITY_WARMUP_PATH"] = ""
+    return env
+
+
+def measure_import(env: Dict[str, str]) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(env: Dict[str, str], timeout: float) -> float:
+    """Milliseconds from spawning uvicorn until /health answers 200."""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}; run uvicorn app.main:app to see why")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not answer /health within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(values: List[float]) -> str:
+    return f"min {min(values):.0f}ms  median {statistics.median(values):.0f}ms  max {max(values):.0f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure the import")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for /health")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import time is above this")
+    parser.add_argument("--max-ready-ms", type=float, help="Fail if the median time to /health is above this")
+    args = parser.parse_args()
+
+    env = benchmark_env()
+    failures = []
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    import_ms = [run["import_ms"] for run in imports]
+    print(f"Import app.main ({args.runs} runs): {summary(import_ms)}")
+    loaded = sorted({module for run in imports for module in run["loaded"]})
+    if loaded:
+        failures.append(f"provider SDKs imported at import time: {', '.join(loaded)}")
+    if args.max_import_ms is not None and statistics.median(import_ms) > args.max_import_ms:
+        failures.append(f"median import {statistics.median(import_ms):.0f}ms > {args.max_import_ms:.0f}ms")
+
+    if not args.skip_server:
+        ready_ms = [measure_ready(env, args.timeout) for _ in range(args.runs)]
+        print(f"Spawn to /health ({args.runs} runs): {summary(ready_ms)}")
+        if args.max_ready_ms is not None and statistics.median(ready_ms) > args.max_ready_ms:
+            failures.append(f"median time to /health {statistics.median(ready_ms):.0f}ms > {args.max_ready_ms:.0f}ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Convert word vectors in the GloVe/word2vec text format into the memory-mapped
+table read by the embedding similarity backend.
+
+    python scripts/build_embeddings.py glove.6B.100d.txt --max-words 100000
+
+Writes EMBEDDING_VECTORS_PATH and EMBEDDING_VOCAB_PATH unless --vectors/--vocab are given.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embedding_service import build_embedding_table, resolve_table_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Text file with one 'word v1 v2 ...' line per word")
+    # Defaults land where the app looks for them, whatever the working directory
+    vectors = os.environ.get("EMBEDDING_VECTORS_PATH", "embeddings/vectors.npy")
+    vocab = os.environ.get("EMBEDDING_VOCAB_PATH", "embeddings/vocab.txt")
+    parser.add_argument("--vectors", default=resolve_table_path(vectors))
+    parser.add_argument("--vocab", default=resolve_table_path(vocab))
+    parser.add_argument("--max-words", type=int, default=None, help="Keep only the first N words (files are frequency-sorted)")
+    args = parser.parse_args()
+
+    for path in (args.vectors, args.vocab):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(args.source, encoding="utf-8", errors="ignore") as f:
+        words, dims = build_embedding_table(f, args.vectors, args.vocab, args.max_words)
+    print(f"Wrote {words} words x {dims} dims to {args.vectors} and {args.vocab}")
+
+
+if __name__ == "__main__":
+    main()
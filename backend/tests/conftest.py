@@ -0,0 +1,32 @@
+import base64
+import io
+import os
+import pytest
+from PIL import Image
+from app.config import get_settings
+from benchmarks.fake_provider import FakeProvider
+
+# Services are built against local fakes, so the suite needs no real credentials
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+# Keep caches in memory so tests neither write into the source tree nor share scores between runs
+os.environ["PREDICTION_CACHE_BACKEND"] = "memory"
+os.environ["SIMILARITY_CACHE_BACKEND"] = "memory"
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """Local stand-in for OpenAI and Gemini; services built inside the test talk to it."""
+    provider = FakeProvider()
+    url = provider.start()
+    monkeypatch.setattr(get_settings(), "OPENAI_BASE_URL", f"{url}/v1")
+    monkeypatch.setattr(get_settings(), "GEMINI_BASE_URL", f"{url}/v1beta")
+    yield provider
+    provider.stop()
+
+
+def png(size: int = 32, color: str = "white") -> str:
+    """Base64 PNG; different sizes or colors give different images."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
@@ -0,0 +1,126 @@
+import asyncio
+from app.config import get_settings
+from app.model import PredictionRequest
+from app.services.batch_scheduler import MicroBatcher
+from app.services.http_transport import HttpTransport
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictService, PreparedImage
+from app.services.provider_router import UpstreamResponseError
+
+
+def test_concurrent_items_share_a_batch_and_get_their_own_results():
+    batch_sizes = []
+
+    async def run_batch(items):
+        batch_sizes.append(len(items))
+        return [item * 10 for item in items]
+
+    async def run_single(item):
+        return item * 10
+
+    batcher = MicroBatcher(run_batch, run_single, window_ms=20, max_batch_size=4)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit("group", n) for n in range(6)])
+
+    assert asyncio.run(main()) == [0, 10, 20, 30, 40, 50]
+    assert batch_sizes == [4, 2]
+    stats = batcher.stats()
+    assert stats["batches"] == 2
+    assert stats["fill_ratio"] == 6 / 8
+
+
+def test_missing_results_fall_back_to_direct_calls():
+    singles = []
+
+    async def run_batch(items):
+        return [None if item == 1 else item for item in items]
+
+    async def run_single(item):
+        singles.append(item)
+        return -item
+
+    batcher = MicroBatcher(run_batch, run_single, window_ms=10, max_batch_size=8)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit("group", n) for n in range(3)])
+
+    assert asyncio.run(main()) == [0, -1, 2]
+    assert singles == [1]
+    assert batcher.stats()["fallbacks"] == 1
+
+
+def test_failed_batch_without_fallback_fails_every_caller():
+    async def run_batch(items):
+        raise RuntimeError("rate limited")
+
+    async def run_single(item):
+        return item
+
+    batcher = MicroBatcher(run_batch, run_single, window_ms=10, max_batch_size=8, fallback_to_direct=False)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit("group", n) for n in range(2)], return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+
+
+def test_missing_result_without_fallback_is_an_upstream_error():
+    async def run_batch(items):
+        return [None for _ in items]
+
+    async def run_single(item):
+        return item
+
+    batcher = MicroBatcher(run_batch, run_single, window_ms=10, max_batch_size=8, fallback_to_direct=False)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit("group", n) for n in range(2)], return_exceptions=True)
+
+    assert all(isinstance(result, UpstreamResponseError) for result in asyncio.run(main()))
+
+
+def test_requests_with_different_priorities_are_not_batched_together(monkeypatch):
+    monkeypatch.setattr(get_settings(), "MICRO_BATCH_ENABLED", True)
+    service = PredictService(OpenAIService(HttpTransport()))
+    batches = []
+
+    async def call_batch(request, images, on_admitted=None):
+        batches.append((request.priority, len(images)))
+        return [[] for _ in images]
+
+    async def call_single(request, img, on_partial=None, on_admitted=None):
+        batches.append((request.priority, 1))
+        return []
+
+    monkeypatch.setattr(service, "_call_batch", call_batch)
+    monkeypatch.setattr(service, "_call_single", call_single)
+
+    def call(idx, priority):
+        request = PredictionRequest.model_construct(model="openai", top_k=3, priority=priority)
+        return service._call_upstream(request, PreparedImage(f"img_{idx}", f"key_{idx}", "data:"))
+
+    async def main():
+        await asyncio.gather(call(0, "normal"), call(1, "final"), call(2, "normal"))
+
+    asyncio.run(main())
+    assert sorted(batches) == [("final", 1), ("normal", 2)]
+
+
+def test_unexpected_batch_errors_reach_callers_and_tasks_are_released():
+    async def run_batch(items):
+        return None  # not a list: fails outside the batch call's own error handling
+
+    async def run_single(item):
+        return item
+
+    batcher = MicroBatcher(run_batch, run_single, window_ms=10, max_batch_size=4)
+
+    async def main():
+        results = await asyncio.gather(*[batcher.submit("group", n) for n in range(2)], return_exceptions=True)
+        await asyncio.sleep(0)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, TypeError) for result in results)
+    assert not batcher._tasks
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import os
+import time
+import pytest
+from app.services.cache_service import (
+    BACKEND_DIR,
+    MemoryPredictionCache,
+    PredictionCache,
+    SqlitePredictionCache,
+    TieredCache,
+    make_cache_key,
+    make_pair_key,
+)
+
+PREDICTIONS = [{"label": "cat", "confidence": 0.9, "reason": "Pointed ears"}]
+
+
+def test_cache_key_depends_on_content_and_params():
+    digest = hashlib.sha256(b"image").hexdigest()
+    key = make_cache_key(digest, "v1:openai:3")
+    assert key == make_cache_key(digest, "v1:openai:3")
+    assert key != make_cache_key(hashlib.sha256(b"other").hexdigest(), "v1:openai:3")
+    assert key != make_cache_key(digest, "v1:openai:5")
+
+
+def test_pair_key_is_symmetric_and_normalised():
+    assert make_pair_key("Cat", "kitten ", "v1") == make_pair_key("kitten", "cat", "v1")
+    assert make_pair_key("cat", "kitten", "v1") != make_pair_key("cat", "kitten", "v2")
+    assert make_pair_key("cat", "kitten", "v1") != make_pair_key("cat", "dog", "v1")
+
+
+def test_memory_cache_hit_and_miss():
+    cache = MemoryPredictionCache(ttl_seconds=60, max_entries=10, max_bytes=1024 * 1024)
+    assert cache.get("a") is None
+    cache.set("a", PREDICTIONS)
+    assert cache.get("a") == PREDICTIONS
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryPredictionCache(ttl_seconds=60, max_entries=2, max_bytes=1024 * 1024)
+    cache.set("a", PREDICTIONS)
+    cache.set("b", PREDICTIONS)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", PREDICTIONS)
+    assert cache.get("b") is None
+    assert cache.get("a") == PREDICTIONS
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_byte_budget_and_ttl():
+    cache = MemoryPredictionCache(ttl_seconds=0, max_entries=10, max_bytes=100)
+    cache.set("a", PREDICTIONS)
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+    cache = MemoryPredictionCache(ttl_seconds=60, max_entries=10, max_bytes=100)
+    cache.set("a", PREDICTIONS)
+    cache.set("b", PREDICTIONS)
+    assert cache.stats()["size_bytes"] <= 100
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SqlitePredictionCache(path, ttl_seconds=60, max_entries=10, max_bytes=1024 * 1024)
+    cache.set("a", PREDICTIONS)
+
+    reopened = SqlitePredictionCache(path, ttl_seconds=60, max_entries=10, max_bytes=1024 * 1024)
+    assert reopened.get("a") == PREDICTIONS
+    assert reopened.stats()["entries"] == 1
+
+
+def test_sqlite_cache_opens_lazily_and_batches_access_times(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = SqlitePredictionCache(str(path), ttl_seconds=60, max_entries=2, max_bytes=1024 * 1024)
+    assert not path.exists()
+    assert SqlitePredictionCache("cache.sqlite3", 60, 2, 1024).path == os.path.join(BACKEND_DIR, "cache.sqlite3")
+
+    cache.set("a", PREDICTIONS)
+    cache.set("b", PREDICTIONS)
+    assert cache.get("a") == PREDICTIONS
+    assert list(cache._touched) == ["a"]
+    # The pending access time is written before evicting, so "b" is the least recently used
+    cache.set("c", PREDICTIONS)
+    assert cache.get("b") is None and cache.get("a") == PREDICTIONS
+    assert cache.stats()["evictions"] == 1
+
+
+def test_tiered_cache_promotes_disk_hits_and_persists(tmp_path):
+    path = str(tmp_path / "similarity.sqlite3")
+    cache = TieredCache(MemoryPredictionCache(60, 10, 1024), SqlitePredictionCache(path, 60, 100, 10_000))
+    cache.set("v1:car|truck", 0.7)
+    assert cache.get("v1:car|truck") == 0.7
+    assert cache.memory.hits == 1 and cache.disk.hits == 0
+
+    # A fresh process: empty memory tier, same file
+    reopened = TieredCache(MemoryPredictionCache(60, 10, 1024), SqlitePredictionCache(path, 60, 100, 10_000))
+    assert reopened.get("v1:car|truck") == 0.7
+    assert reopened.get("v1:car|truck") == 0.7
+    assert reopened.disk.hits == 1 and reopened.memory.hits == 1
+    assert reopened.get("v1:car|boat") is None
+    stats = reopened.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+
+def test_sqlite_cache_keeps_running_totals(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SqlitePredictionCache(path, ttl_seconds=60, max_entries=10, max_bytes=1024 * 1024)
+    cache.set("a", PREDICTIONS)
+    cache.set("a", PREDICTIONS + PREDICTIONS)
+    cache.set("b", PREDICTIONS)
+    counted = cache._conn.execute("SELECT COUNT(*), SUM(size) FROM predictions").fetchone()
+    assert cache._size() == counted
+    # Totals are counted once when another process opens the file
+    assert SqlitePredictionCache(path, 60, 10, 1024 * 1024)._size() == counted
+
+    # Expired rows swept on the next set() are taken off the totals
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    cache.set("c", PREDICTIONS)
+    assert cache._size() == cache._conn.execute("SELECT COUNT(*), SUM(size) FROM predictions").fetchone()
+    assert cache._size()[0] == 1
+
+
+def test_tiered_cache_async_access_runs_disk_io_in_a_thread(tmp_path, monkeypatch):
+    cache = TieredCache(
+        MemoryPredictionCache(60, 10, 1024), SqlitePredictionCache(str(tmp_path / "s.sqlite3"), 60, 100, 10_000)
+    )
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def recording_to_thread(func, *args):
+        offloaded.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", recording_to_thread)
+
+    async def main():
+        await cache.aset("v1:car|truck", 0.7)
+        assert await cache.aget("v1:car|truck") == 0.7
+        cache.memory.clear()
+        assert await cache.aget("v1:car|truck") == 0.7
+
+    asyncio.run(main())
+    # The memory hit stayed on the loop; the write and the disk read did not
+    assert offloaded == ["set", "get"]
+
+
+def test_cache_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        PredictionCache(60, 10, 1024)
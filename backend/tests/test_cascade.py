@@ -0,0 +1,87 @@
+import asyncio
+from pydantic import BaseModel
+from app.services.cascade import ModelCascade
+from app.services.provider_router import ProviderResponse, ProviderRouter
+
+
+class Output(BaseModel):
+    label: str
+    confidence: float
+
+
+class TieredProvider:
+    name = "openai"
+    model = "large"
+    small_model = "small"
+
+    def __init__(self, small_confidence, small_fails=False):
+        self.small_confidence = small_confidence
+        self.small_fails = small_fails
+        self.models = []
+
+    async def parse(self, messages, response_format, max_tokens, model=None):
+        self.models.append(model)
+        if model == "small" and self.small_fails:
+            raise ValueError("model not available")
+        confidence = self.small_confidence if model == "small" else 0.9
+        usage = {"prompt_tokens": 10, "completion_tokens": 5 if model == "small" else 8}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return ProviderResponse(response_format(label=model, confidence=confidence), usage, self.name, model)
+
+    @staticmethod
+    def retryable(error):
+        return False
+
+
+def run(cascade, final=False):
+    return asyncio.run(cascade.parse([], Output, 10, lambda parsed: parsed.confidence, final=final))
+
+
+def make_cascade(provider, **kwargs):
+    return ModelCascade(ProviderRouter({"openai": provider}, hedge_enabled=False), **kwargs)
+
+
+def test_confident_small_answer_is_kept():
+    provider = TieredProvider(small_confidence=0.8)
+    cascade = make_cascade(provider, confidence_threshold=0.6)
+
+    assert run(cascade).model == "small"
+    assert provider.models == ["small"]
+    assert cascade.stats()["escalation_rate"] == 0.0
+
+
+def test_low_confidence_escalates_to_the_large_model():
+    provider = TieredProvider(small_confidence=0.3)
+    cascade = make_cascade(provider, confidence_threshold=0.6)
+
+    assert run(cascade).model == "large"
+    assert provider.models == ["small", "large"]
+    stats = cascade.stats()
+    assert stats["escalations"] == 1 and stats["escalation_rate"] == 1.0
+    assert stats["tiers"]["small"]["tokens"]["total_tokens"] == 15
+    assert stats["tiers"]["large"]["tokens"]["total_tokens"] == 18
+
+
+def test_final_requests_skip_the_small_model():
+    provider = TieredProvider(small_confidence=0.99)
+    cascade = make_cascade(provider)
+
+    assert run(cascade, final=True).model == "large"
+    assert provider.models == ["large"]
+    assert cascade.stats()["direct"] == 1
+
+
+def test_failed_small_call_escalates():
+    provider = TieredProvider(small_confidence=0.9, small_fails=True)
+    cascade = make_cascade(provider)
+
+    assert run(cascade).model == "large"
+    assert cascade.stats()["tiers"]["small"]["failures"] == 1
+
+
+def test_disabled_cascade_always_uses_the_large_model():
+    provider = TieredProvider(small_confidence=0.99)
+    cascade = make_cascade(provider, enabled=False)
+
+    assert run(cascade).model == "large"
+    assert provider.models == ["large"]
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.api.dependencies import get_similarity_service
+from app.config import get_settings
+from app.main import app
+from app.services.http_transport import HttpTransport
+from app.services.lexicon import Lexicon
+from app.services.openai_service import OpenAIService
+from app.services.similarity_service import SimilarityService
+
+
+@pytest.fixture
+def service(fake, monkeypatch):
+    monkeypatch.setattr(get_settings(), "SIMILARITY_CACHE_BACKEND", "memory")
+    return SimilarityService(OpenAIService(HttpTransport()), lexicon=Lexicon())
+
+
+def test_batch_scores_are_aligned_and_cached(service, fake):
+    candidates = ["Cats", "dog", "tiger", "dogs", "car"]
+
+    async def main():
+        first = await service.compare_batch("cat", candidates)
+        calls = fake.counters["requests"]
+        again = await service.compare_batch("cat", candidates)
+        return first, calls, again
+
+    first, calls, again = asyncio.run(main())
+    assert len(first) == len(candidates)
+    assert first[0] == 1.0  # same canonical form as the reference
+    assert first[1] == first[3]
+    assert all(0 <= score <= 1 for score in first)
+    assert calls == 1  # dog, tiger and car in one call
+    assert again == first
+    assert fake.counters["requests"] == calls
+
+
+def test_single_compare_shares_the_batch_cache(service, fake):
+    async def main():
+        batch = await service.compare_batch("cat", ["dog", "tiger"])
+        return batch, await service.compare("cats", "dog")
+
+    batch, single = asyncio.run(main())
+    assert single == batch[0]
+    assert fake.counters["requests"] == 1
+
+
+def test_compare_batch_route(monkeypatch):
+    async def compare_batch(reference, candidates, priority="normal"):
+        return [1.0 if word == reference else 0.25 for word in candidates]
+
+    monkeypatch.setattr(get_similarity_service(), "compare_batch", compare_batch)
+    client = TestClient(app)
+    response = client.post("/api/v1/compare/batch", json={"reference": "cat", "candidates": ["cat", "dog"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["candidates"] == ["cat", "dog"]
+    assert [result["similarity"] for result in body["results"]] == [1.0, 0.25]
+    assert client.post("/api/v1/compare/batch", json={"reference": "cat", "candidates": []}).status_code == 422
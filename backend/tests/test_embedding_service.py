@@ -0,0 +1,92 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from app.services.cache_service import BACKEND_DIR
+from app.services.embedding_service import EmbeddingTable, build_embedding_table, load_embedding_table
+from app.services.similarity_service import SimilarityService
+
+VECTORS = [
+    "3 4",  # word2vec header
+    "cat 1 0 0 0",
+    "kitten 0.9 0.1 0 0",
+    "car 0 1 0 0",
+    "truck 0 0.8 0.6 0",
+    "ice 0 0 1 0",
+    "cream 0 0 0 1",
+    "Cat 5 5 5 5",  # duplicate after lowercasing, skipped
+]
+
+
+@pytest.fixture
+def table(tmp_path):
+    vectors_path, vocab_path = str(tmp_path / "vectors.npy"), str(tmp_path / "vocab.txt")
+    assert build_embedding_table(VECTORS, vectors_path, vocab_path) == (6, 4)
+    return EmbeddingTable(vectors_path, vocab_path)
+
+
+def test_table_is_memory_mapped_with_unit_rows(table):
+    assert isinstance(table.vectors, np.memmap)
+    assert np.allclose(np.linalg.norm(table.vectors, axis=1), 1.0)
+
+
+def test_cosine_similarity_and_out_of_vocabulary(table):
+    assert table.similarity("Cat ", "cat") == pytest.approx(1.0)
+    assert table.similarity("cat", "kitten") == pytest.approx(0.9 / np.hypot(0.9, 0.1), abs=1e-4)
+    assert table.similarity("truck", "car") == pytest.approx(0.8)
+    assert table.similarity("cat", "car") == 0.0
+    assert table.similarity("cat", "zebra") is None
+    assert table.similarities("zebra", ["cat", "car"]) == [None, None]
+
+
+def test_phrases_use_the_mean_of_their_tokens(table):
+    assert table.similarity("ice cream", "ice") == pytest.approx(np.sqrt(0.5), abs=1e-4)
+    assert table.similarity("ice-cream", "cream") == pytest.approx(np.sqrt(0.5), abs=1e-4)
+    assert table.similarity("ice zebra", "ice") is None
+
+
+class FakeOpenAIService:
+    def __init__(self):
+        self.compared = []
+
+    async def compare_semantics(self, word1, word2, priority="normal"):
+        self.compared.append(word2)
+        return 0.5
+
+    async def compare_batch(self, reference, candidates, priority="normal"):
+        self.compared.extend(candidates)
+        return [0.5] * len(candidates)
+
+
+def test_embedding_backend_only_sends_unknown_words_to_the_llm(table):
+    llm = FakeOpenAIService()
+    service = SimilarityService(llm, backend="embedding", embeddings=table)
+
+    scores = asyncio.run(service.compare_batch("car", ["truck", "zebra", "cat", "horse"]))
+    assert scores == [pytest.approx(0.8), 0.5, 0.0, 0.5]
+    assert llm.compared == ["zebra", "horse"]
+    assert service.stats()["embedding_ratio"] == 0.5
+
+
+def test_hybrid_backend_rescores_the_ambiguous_band(table):
+    llm = FakeOpenAIService()
+    service = SimilarityService(llm, backend="hybrid", embeddings=table, hybrid_min=0.5, hybrid_max=0.85)
+
+    assert asyncio.run(service.compare("car", "truck")) == 0.5
+    assert asyncio.run(service.compare("cat", "kitten")) == pytest.approx(0.9939, abs=1e-4)
+    assert llm.compared == ["truck"]
+
+
+def test_missing_table_falls_back_to_llm():
+    service = SimilarityService(FakeOpenAIService(), backend="embedding", embeddings=None)
+    assert service.backend == "llm"
+    with pytest.raises(ValueError):
+        SimilarityService(FakeOpenAIService(), backend="word2vec")
+
+
+def test_relative_table_paths_do_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    build_embedding_table(VECTORS, str(tmp_path / "vectors.npy"), str(tmp_path / "vocab.txt"))
+    relative = os.path.relpath(tmp_path, BACKEND_DIR)
+    monkeypatch.chdir(tmp_path)
+    table = load_embedding_table(os.path.join(relative, "vectors.npy"), os.path.join(relative, "vocab.txt"))
+    assert table is not None and len(table) == 6
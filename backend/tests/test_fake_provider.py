@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.model import ImageInput, PredictionRequest
+from app.services.gemini_service import GeminiAPIError, GeminiService
+from app.services.http_transport import HttpTransport
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictService
+from benchmarks.fake_provider import LatencyModel
+from tests.conftest import png
+
+
+class Output(BaseModel):
+    label: str
+    confidence: float
+
+
+def test_latency_models():
+    assert LatencyModel("fixed", 200, per_image_ms=50).sample(images=2) == pytest.approx(0.3)
+    samples = [LatencyModel("uniform", 100, spread=0.5, seed=seed).sample() for seed in range(50)]
+    assert all(0.05 <= sample <= 0.15 for sample in samples)
+    with pytest.raises(ValueError):
+        LatencyModel("normal")
+
+
+def test_predictions_end_to_end_against_the_fake(fake):
+    service = PredictService(OpenAIService(HttpTransport()))
+    request = PredictionRequest(
+        images=[ImageInput(image_id=f"img_{idx}", base64_data=png(32 + idx)) for idx in range(2)],
+        model="openai",
+        top_k=4,
+    )
+
+    response = asyncio.run(service.predict_images(request))
+    assert [result.image_id for result in response.results] == ["img_0", "img_1"]
+    assert all(len(result.predictions) == 4 for result in response.results)
+    assert fake.counters["requests"] == 2
+    assert fake.counters["prompt_tokens"] > 0
+
+
+def test_openai_answers_are_deterministic_and_cover_every_word(fake):
+    async def main():
+        service = OpenAIService(HttpTransport())
+        service.similarity_cache = None
+        batch = await service.compare_batch("cat", ["dog", "tiger", "car"])
+        again = await service.compare_batch("cat", ["dog", "tiger", "car"])
+        single = await service._compare_semantics("cat", "dog")
+        return batch, again, single
+
+    batch, again, single = asyncio.run(main())
+    assert len(batch) == 3 and all(0 <= score <= 1 for score in batch)
+    assert batch == again
+    assert 0 <= single <= 1
+
+
+def test_streamed_structured_output(fake):
+    deltas = []
+
+    async def main():
+        service = OpenAIService(HttpTransport())
+        return await service.stream_parse(
+            [{"role": "user", "content": "Label this"}], Output, 100, lambda parsed: deltas.append(parsed)
+        )
+
+    response = asyncio.run(main())
+    assert isinstance(response.parsed, Output)
+    assert deltas
+    assert fake.counters["streamed"] == 1
+
+
+def test_injected_failures(fake):
+    service = GeminiService(HttpTransport())
+
+    async def main():
+        errors = []
+        for rate_limit_rate, error_rate in [(1.0, 0.0), (0.0, 1.0)]:
+            fake.rate_limit_rate, fake.error_rate = rate_limit_rate, error_rate
+            with pytest.raises(GeminiAPIError) as error:
+                await service.parse([{"role": "user", "content": "hi"}], Output, 10)
+            errors.append(error.value)
+        fake.error_rate = 0.0
+        response = await service.parse([{"role": "user", "content": "hi"}], Output, 10)
+        stats = (await service.transport.client.get(f"{service.base_url}/stats")).json()
+        return errors, response, stats
+
+    (rate_limited, failed), response, stats = asyncio.run(main())
+    assert rate_limited.status_code == 429 and rate_limited.response.headers["retry-after"] == "1"
+    assert failed.status_code == 500
+    assert isinstance(response.parsed, Output)
+    assert stats["requests"] == 3 and stats["rate_limited"] == 1 and stats["errors"] == 1
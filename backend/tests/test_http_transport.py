@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from pydantic import BaseModel
+from app.services.gemini_service import GeminiAPIError, GeminiService
+from app.services.http_transport import HttpTransport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    status = 200
+
+    def _reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply(404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, dict(self.headers), request))
+        if self.server.status != 200:
+            body = json.dumps({"error": {"message": "quota exceeded"}}).encode()
+            self._reply(self.server.status, body, {"Retry-After": "7"})
+            return
+        body = json.dumps({
+            "candidates": [{"content": {"parts": [{"text": '{"label": "cat"}'}]}}],
+            "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 4, "totalTokenCount": 16},
+        }).encode()
+        self._reply(200, body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.requests = []
+    httpd.status = 200
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class Output(BaseModel):
+    label: str
+
+
+def test_warm_up_opens_connections_that_later_calls_reuse(server):
+    transport = HttpTransport(warmup_connections=3)
+    transport.add_origin(url(server) + "/v1beta")
+
+    async def main():
+        await transport.warm_up()
+        for _ in range(5):
+            await transport.client.post(url(server) + "/echo", json={})
+        stats = transport.stats()
+        await transport.aclose()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["origins"] == [url(server)]
+    assert stats["warmup"]["runs"] == 1 and stats["warmup"]["failures"] == 0
+    assert stats["connections_opened"] == 3
+    assert stats["requests"] == 8
+    assert stats["pool"]["connections"] == 3 and stats["pool"]["idle"] == 3
+
+
+def test_gemini_calls_the_rest_api_through_the_shared_transport(server):
+    transport = HttpTransport()
+    service = GeminiService(transport)
+    service.base_url = url(server)
+    messages = [{"role": "user", "content": [
+        {"type": "text", "text": "Image 1:"},
+        {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}},
+    ]}]
+
+    async def main():
+        response = await service.parse(messages, Output, 50, model="tiny")
+        await transport.aclose()
+        return response
+
+    response = asyncio.run(main())
+    assert response.parsed == Output(label="cat")
+    assert response.usage == {"prompt_tokens": 12, "completion_tokens": 4, "total_tokens": 16}
+    [(path, headers, request)] = server.requests
+    assert path == "/models/tiny:generateContent"
+    assert headers["x-goog-api-key"]
+    parts = request["contents"][0]["parts"]
+    assert parts[1] == {"inlineData": {"mimeType": "image/jpeg", "data": "AAAA"}}
+    assert request["generationConfig"]["maxOutputTokens"] == 50
+    assert transport.requests == 1
+
+
+def test_gemini_rate_limits_are_retryable_and_keep_retry_after(server):
+    server.status = 429
+    transport = HttpTransport()
+    service = GeminiService(transport)
+    service.base_url = url(server)
+
+    async def main():
+        try:
+            await service.parse([{"role": "user", "content": "hi"}], Output, 10)
+        finally:
+            await transport.aclose()
+
+    with pytest.raises(GeminiAPIError) as error:
+        asyncio.run(main())
+    assert error.value.status_code == 429
+    assert error.value.response.headers["retry-after"] == "7"
+    assert "quota exceeded" in str(error.value)
+    assert GeminiService.retryable(error.value)
@@ -0,0 +1,65 @@
+import base64
+import io
+import pytest
+from PIL import Image, ImageDraw
+from app.model import ImageInput
+from app.services.image_service import ImagePreprocessor, analyze_image, decode_base64
+
+
+def canvas_png(size: int = 1600) -> bytes:
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([size // 2, size // 2, size // 2 + 400, size // 2 + 200], outline="black", width=12)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_trims_and_downscales_canvas():
+    original = canvas_png()
+    processed, mime_type = ImagePreprocessor(max_edge=256).process(original, "image/png")
+
+    assert mime_type == "image/png"
+    assert len(processed) < len(original)
+    with Image.open(io.BytesIO(processed)) as img:
+        assert max(img.size) <= 256
+        # Trimmed to the ellipse's 2:1 bounding box rather than the square canvas
+        assert img.width > img.height
+
+
+def test_grayscale_jpeg_output():
+    processed, mime_type = ImagePreprocessor(grayscale=True, output_format="jpeg").process(
+        canvas_png(), "image/png"
+    )
+    assert mime_type == "image/jpeg"
+    with Image.open(io.BytesIO(processed)) as img:
+        assert img.mode == "L"
+
+
+def test_undecodable_image_passes_through():
+    data = b"not an image"
+    assert ImagePreprocessor().process(data, "image/png") == (data, "image/png")
+
+
+def test_analyze_image_checks_size_and_format():
+    data = canvas_png(64)
+    analysis = analyze_image(base64.b64encode(data).decode(), max_bytes=1024 * 1024, hash_size=8)
+    assert analysis.data == data
+    assert analysis.mime_type == "image/png"
+    assert analysis.image_hash is not None
+
+    with pytest.raises(ValueError):
+        analyze_image(data, max_bytes=10)
+    with pytest.raises(ValueError):
+        analyze_image(base64.b64encode(b"GIF00a not an image").decode(), max_bytes=1024)
+    with pytest.raises(ValueError):
+        analyze_image("not base64!", max_bytes=1024)
+
+
+def test_line_wrapped_base64_is_accepted():
+    data = canvas_png(64)
+    encoded = base64.b64encode(data).decode()
+    wrapped = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76)) + "\r\n"
+    for payload in (wrapped, "data:image/png;base64," + wrapped):
+        image = ImageInput(image_id="a", base64_data=payload)
+        assert decode_base64(image.base64_data) == data
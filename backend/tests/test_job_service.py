@@ -0,0 +1,187 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.api.dependencies import get_job_manager
+from app.config import get_settings
+from app.main import app
+from app.model import ImageInput, PredictionRequest, PredictionResponse
+from app.services.job_service import JobConflictError, JobManager
+from app.services.provider_router import OverloadedError
+from tests.conftest import png
+
+
+class Request(BaseModel):
+    word: str
+
+
+class Runner:
+    def __init__(self, delay=0.01, fail=None):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, request):
+        self.calls.append(request.word)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail is not None:
+                raise self.fail
+            return request.word.upper()
+        finally:
+            self.running -= 1
+
+
+def test_jobs_run_in_the_background_on_bounded_workers():
+    runner = Runner()
+    manager = JobManager(runner, max_workers=2)
+
+    async def main():
+        jobs = [await manager.submit(Request(word=f"w{idx}")) for idx in range(5)]
+        assert all(job.status == "queued" for job in jobs)
+        return [await manager.wait(job, 5) for job in jobs]
+
+    jobs = asyncio.run(main())
+    assert [job.result for job in jobs] == ["W0", "W1", "W2", "W3", "W4"]
+    assert all(job.status == "succeeded" and job.finished_at >= job.started_at for job in jobs)
+    assert all(job.request is None for job in jobs)
+    assert runner.max_running == 2
+    assert manager.stats()["succeeded"] == 5 and manager.stats()["queued"] == 0
+
+
+def test_idempotency_key_returns_the_existing_job():
+    runner = Runner()
+    manager = JobManager(runner)
+
+    async def main():
+        first = await manager.submit(Request(word="cat"), "key-1")
+        again = await manager.submit(Request(word="cat"), "key-1")
+        with pytest.raises(JobConflictError):
+            await manager.submit(Request(word="dog"), "key-1")
+        await manager.wait(first, 5)
+        after = await manager.submit(Request(word="cat"), "key-1")
+        return first, again, after
+
+    first, again, after = asyncio.run(main())
+    assert first is again is after
+    assert runner.calls == ["cat"]
+    assert manager.stats()["deduplicated"] == 2
+
+
+def test_failed_jobs_report_the_http_status_and_their_key_can_be_retried():
+    runner = Runner(fail=OverloadedError("budget exhausted", retry_after=3))
+    manager = JobManager(runner)
+
+    async def main():
+        failed = await manager.wait(await manager.submit(Request(word="cat"), "key-1"), 5)
+        runner.fail = None
+        retried = await manager.wait(await manager.submit(Request(word="cat"), "key-1"), 5)
+        return failed, retried
+
+    failed, retried = asyncio.run(main())
+    assert failed.status == "failed"
+    assert (failed.error_status, failed.retry_after, failed.error_message) == (429, 3, "budget exhausted")
+    assert retried is not failed and retried.result == "CAT"
+    assert manager.get(failed.id) is None
+
+
+def test_queue_limit_wait_timeout_and_ttl_eviction():
+    manager = JobManager(Runner(delay=0.2), max_workers=1, max_queued=1, ttl_seconds=0.05)
+
+    async def main():
+        running = await manager.submit(Request(word="a"), "key-a")
+        await asyncio.sleep(0)
+        await manager.submit(Request(word="b"))
+        with pytest.raises(OverloadedError):
+            await manager.submit(Request(word="c"))
+        assert (await manager.wait(running, 0.01)).status == "running"
+        await manager.wait(running, 5)
+        await asyncio.sleep(0.1)
+        return running
+
+    running = asyncio.run(main())
+    assert running.status == "succeeded"
+    assert manager.get(running.id) is None
+    assert "key-a" not in manager.keys
+    assert manager.stats()["rejected"] == 1 and manager.stats()["evicted"] == 1
+
+
+def test_close_fails_unfinished_jobs():
+    manager = JobManager(Runner(delay=10), max_workers=1)
+
+    async def main():
+        running = await manager.submit(Request(word="a"))
+        queued = await manager.submit(Request(word="b"))
+        await asyncio.sleep(0.01)
+        await manager.close()
+        return running, queued
+
+    for job in asyncio.run(main()):
+        assert job.status == "failed" and job.error_status == 503
+        assert job.done.is_set()
+
+
+def test_oldest_finished_jobs_are_evicted_beyond_max_stored():
+    manager = JobManager(Runner(delay=0), max_stored=2)
+
+    async def main():
+        first = await manager.wait(await manager.submit(Request(word="a"), "key-a"), 5)
+        second = await manager.wait(await manager.submit(Request(word="b")), 5)
+        third = await manager.submit(Request(word="c"))
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert manager.get(first.id) is None and "key-a" not in manager.keys
+    assert manager.get(second.id) is second and manager.get(third.id) is third
+    assert manager.stats()["evicted"] == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """App client sharing one event loop across requests, with jobs answered by a stub."""
+    monkeypatch.setattr(get_settings(), "PROVIDER_WARMUP_ENABLED", False)
+    monkeypatch.setattr(get_settings(), "EVENT_LOOP_LAG_INTERVAL_MS", 0)
+    monkeypatch.setattr(get_settings(), "JOBS_MAX_WAIT_SECONDS", 0.2)
+    release = asyncio.Event()
+
+    async def predict_images(request):
+        await release.wait()
+        return PredictionResponse(
+            request_id="test", status="success", model=request.model, top_k=request.top_k, results=[]
+        )
+
+    manager = JobManager(predict_images, ttl_seconds=0.1)
+    monkeypatch.setitem(app.dependency_overrides, get_job_manager, lambda: manager)
+    with TestClient(app) as client:
+        client.release = release
+        yield client
+
+
+def job_body(size=32):
+    return PredictionRequest(images=[ImageInput(image_id="img_0", base64_data=png(size))], model="openai").model_dump()
+
+
+def test_job_routes(client):
+    headers = {"Idempotency-Key": "round-1"}
+    submitted = client.post("/api/v1/jobs/predict", json=job_body(), headers=headers)
+    assert submitted.status_code == 202 and submitted.json()["status"] == "queued"
+    job_id = submitted.json()["job_id"]
+
+    assert client.post("/api/v1/jobs/predict", json=job_body(), headers=headers).json()["job_id"] == job_id
+    conflict = client.post("/api/v1/jobs/predict", json=job_body(48), headers=headers)
+    assert conflict.status_code == 409
+
+    # The wait is capped by JOBS_MAX_WAIT_SECONDS, so an unfinished job is answered anyway
+    polled = client.get(f"/api/v1/jobs/{job_id}?wait=60")
+    assert polled.status_code == 200 and polled.json()["status"] == "running"
+
+    client.portal.call(client.release.set)
+    finished = client.get(f"/api/v1/jobs/{job_id}?wait=5").json()
+    assert finished["status"] == "succeeded" and finished["result"]["status"] == "success"
+
+    client.portal.call(asyncio.sleep, 0.2)
+    assert client.get(f"/api/v1/jobs/{job_id}").status_code == 404
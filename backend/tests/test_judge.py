@@ -0,0 +1,59 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.api.dependencies import get_predict_service
+from app.main import app
+from app.model import ImageInput, JudgedPrediction, JudgeRequest, JudgeResponse, PredictionRequest
+from app.services.http_transport import HttpTransport
+from app.services.image_service import InvalidImageError
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictService
+from tests.conftest import png
+
+
+def judge_request(topic="cat"):
+    return JudgeRequest(image=ImageInput(image_id="img_0", base64_data=png(40)), topic=topic, model="openai", top_k=3)
+
+
+def test_judge_labels_are_cached_apart_from_predict(fake):
+    service = PredictService(OpenAIService(HttpTransport()))
+
+    async def main():
+        first = await service.judge(judge_request())
+        calls = fake.counters["requests"]
+        again = await service.judge(judge_request())
+        calls_again = fake.counters["requests"]
+        predicted = await service.predict_images(
+            PredictionRequest(images=[judge_request().image], model="openai", top_k=3)
+        )
+        return first, calls, again, calls_again, predicted
+
+    first, calls, again, calls_again, predicted = asyncio.run(main())
+    assert calls == 1
+    assert len(first.predictions) == 3 and not first.reused
+    assert all(0 <= pred.similarity <= 1 for pred in first.predictions)
+    assert again.reused and again.reuse_source == "cache"
+    assert [pred.label for pred in again.predictions] == [pred.label for pred in first.predictions]
+    assert calls_again == calls
+    # /predict uses another prompt, so the judge labels are not reused for it
+    assert not predicted.results[0].reused
+    assert fake.counters["requests"] == calls + 1
+
+
+def test_judge_route(monkeypatch):
+    async def judge(request):
+        return JudgeResponse(
+            request_id="test", status="success", model=request.model, topic=request.topic,
+            image_id=request.image.image_id, processing_time_ms=1.0,
+            predictions=[JudgedPrediction(label="cat", confidence=0.9, reason="whiskers", similarity=1.0)],
+        )
+
+    monkeypatch.setattr(get_predict_service(), "judge", judge)
+    response = TestClient(app).post("/api/v1/judge", json=judge_request().model_dump())
+    assert response.status_code == 200
+    assert response.json()["predictions"][0]["similarity"] == 1.0
+
+    async def invalid(request):
+        raise InvalidImageError("Invalid base64 encoding")
+
+    monkeypatch.setattr(get_predict_service(), "judge", invalid)
+    assert TestClient(app).post("/api/v1/judge", json=judge_request().model_dump()).status_code == 400
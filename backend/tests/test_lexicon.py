@@ -0,0 +1,88 @@
+import asyncio
+import json
+import pytest
+from app.model import PredictionDetail
+from app.services.lexicon import Lexicon, load_lexicon, normalize_word, singularize
+from app.services.similarity_service import SimilarityService
+
+
+@pytest.mark.parametrize("plural, singular", [
+    ("cats", "cat"), ("boxes", "box"), ("cherries", "cherry"), ("potatoes", "potato"),
+    ("knives", "knife"), ("mice", "mouse"), ("movies", "movie"), ("shoes", "shoe"),
+    ("houses", "house"), ("buses", "bus"), ("ice creams", "ice cream"),
+    ("glasses", "glasses"), ("bus", "bus"), ("dress", "dress"), ("cactus", "cactus"), ("fish", "fish"),
+    ("rhinoceros", "rhinoceros"), ("eyeglasses", "eyeglasses"), ("lens", "lens"), ("physics", "physics"),
+    ("gymnastics", "gymnastics"), ("chaos", "chaos"), ("bias", "bias"), ("dice", "dice"), ("axes", "axe"),
+])
+def test_singularize(plural, singular):
+    assert singularize(plural) == singular
+
+
+def test_labels_are_normalized_but_keep_their_number():
+    assert normalize_word(" The Cats! ") == "cats"
+    assert normalize_word("Café") == "cafe"
+    assert PredictionDetail(label="Dogs.", confidence=0.9, reason="Four legs").label == "dogs"
+    words = ["rhinoceros", "eyeglasses", "lens", "physics", "gymnastics", "chaos", "bias", "dice", "axes"]
+    for word in words:
+        assert PredictionDetail(label=word.capitalize(), confidence=0.9, reason="Shape").label == word
+    with pytest.raises(ValueError):
+        PredictionDetail(label="hot dog", confidence=0.9, reason="Sausage")
+
+
+def test_canonical_forms_apply_aliases():
+    lexicon = Lexicon()
+    assert lexicon.canonical("Automobiles") == "car"
+    assert lexicon.same("grey", "Gray")
+    assert lexicon.same("ice-cream", "Ice Cream")
+    assert lexicon.same("icecream", "ice cream")
+    assert lexicon.same("fries", "French Fries")
+    assert not lexicon.same("cat", "kitten")
+    assert lexicon.same("T-Shirts", "tshirt")
+    assert not lexicon.same("dice", "die")
+
+
+def test_alias_file_extends_built_in_aliases(tmp_path):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps({"cat": ["kitty", "Kitties"]}))
+    lexicon = load_lexicon(str(path))
+    assert lexicon.same("kitty", "cats")
+    assert lexicon.same("kitties", "cat")
+    assert lexicon.same("bike", "bicycle")
+
+
+class FakeOpenAIService:
+    def __init__(self):
+        self.compared = []
+        self.remembered = {}
+
+    async def compare_semantics(self, word1, word2, priority="normal"):
+        self.compared.append((word1, word2))
+        return 0.5
+
+    async def compare_batch(self, reference, candidates, priority="normal"):
+        self.compared.extend((reference, word) for word in candidates)
+        return [0.5] * len(candidates)
+
+    async def remember_similarity(self, word1, word2, similarity):
+        self.remembered[(word1, word2)] = similarity
+
+
+def test_matching_canonical_forms_skip_the_model():
+    llm = FakeOpenAIService()
+    service = SimilarityService(llm, lexicon=Lexicon())
+
+    scores = asyncio.run(service.compare_batch("Car", ["cars", "automobile", "Trucks", "truck", "CAR"]))
+    assert scores == [1.0, 1.0, 0.5, 0.5, 1.0]
+    # Only the canonical form of the one non-matching word reaches the model
+    assert llm.compared == [("car", "truck")]
+    assert service.stats()["lexical_matches"] == 3
+
+    asyncio.run(service.remember("Automobiles", "Trucks", 0.6))
+    assert llm.remembered == {("car", "truck"): 0.6}
+
+
+def test_without_lexicon_every_pair_is_scored():
+    llm = FakeOpenAIService()
+    service = SimilarityService(llm)
+    assert asyncio.run(service.compare("car", "car")) == 0.5
+    assert llm.compared == [("car", "car")]
@@ -0,0 +1,107 @@
+import asyncio
+import types
+from fastapi.testclient import TestClient
+from app.main import app
+from app.model import StrokePath
+from app.services.live_session import LiveDrawingSession
+from app.services.rasterizer import StrokeCanvas
+
+
+def stroke(x0: float, eraser: bool = False) -> StrokePath:
+    return StrokePath.model_validate({
+        "paths": [{"x": x0 + i * 10, "y": 100 + i * 5} for i in range(30)],
+        "strokeWidth": 6,
+        "strokeColor": "#000000",
+        "drawMode": not eraser,
+    })
+
+
+class FakePredictService:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def predict_images(self, request, image_bytes=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        result = types.SimpleNamespace(model_dump=lambda mode: {"image_id": request.images[0].image_id})
+        return types.SimpleNamespace(results=[result])
+
+
+def make_session(service, sent, **kwargs):
+    async def send(message):
+        sent.append(message)
+    return LiveDrawingSession(service, send, model="openai", top_k=3, width=800, height=600, **kwargs)
+
+
+def test_canvas_scales_strokes_and_eraser_restores_background():
+    canvas = StrokeCanvas(800, 600, size=200)
+    canvas.add_stroke(stroke(50))
+    assert canvas.image.getbbox() is not None
+    assert canvas.image.convert("L").getextrema()[0] == 0
+
+    canvas.add_stroke(stroke(50, eraser=True))
+    assert canvas.image.convert("L").getextrema()[0] == 255
+
+
+def test_strokes_are_debounced_into_one_prediction():
+    service, sent = FakePredictService(), []
+
+    async def main():
+        session = make_session(service, sent, debounce_ms=30)
+        for x0 in (50, 80, 110):
+            session.add_stroke(stroke(x0))
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.1)
+        # Nothing new drawn: a second debounce window does not predict again
+        session.add_stroke(stroke(110))
+        await asyncio.sleep(0.1)
+        return session
+
+    session = asyncio.run(main())
+    assert service.calls == 1
+    assert [m["type"] for m in sent] == ["prediction"]
+    assert sent[0]["version"] == 3
+    assert session.stats()["skipped"] == 1
+
+
+def test_new_stroke_cancels_stale_prediction():
+    service, sent = FakePredictService(delay=0.1), []
+
+    async def main():
+        session = make_session(service, sent, debounce_ms=10)
+        session.add_stroke(stroke(50))
+        await asyncio.sleep(0.05)  # prediction for version 1 is in flight
+        session.add_stroke(stroke(200))
+        await asyncio.sleep(0.2)
+        return session
+
+    session = asyncio.run(main())
+    assert [m["version"] for m in sent] == [2]
+    assert session.stats()["cancelled"] == 1
+
+
+def test_malformed_frames_get_an_error_and_keep_the_session_open():
+    with TestClient(app).websocket_connect("/api/v1/ws/draw") as websocket:
+        websocket.send_json({"type": "start", "model": "openai", "width": 800, "height": 600})
+        assert websocket.receive_json()["type"] == "ready"
+        for frame in ("not json", "[1, 2]", "42"):
+            websocket.send_text(frame)
+            reply = websocket.receive_json()
+            assert reply["type"] == "error" and reply["error_message"].startswith("Invalid message")
+        websocket.send_bytes(b"\x00")
+        assert websocket.receive_json()["error_message"] == "Invalid message: expected a text frame"
+        websocket.send_json({"type": "wave"})
+        assert websocket.receive_json()["error_message"] == "Unknown message type: wave"
+
+
+def test_malformed_start_frames_get_an_error_before_closing():
+    for frame in ("not json", b"\x00", "[1, 2]"):
+        with TestClient(app).websocket_connect("/api/v1/ws/draw") as websocket:
+            if isinstance(frame, bytes):
+                websocket.send_bytes(frame)
+            else:
+                websocket.send_text(frame)
+            reply = websocket.receive_json()
+            assert reply["type"] == "error" and reply["error_message"].startswith("Invalid start message")
+            assert websocket.receive()["code"] == 1008
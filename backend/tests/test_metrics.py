@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.api.instrumentation import InstrumentedRoute
+from app.services.metrics import (
+    EVENT_LOOP_LAG, HTTP_ERRORS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, STAGE_DURATION, UPSTREAM_TOKENS,
+    MetricsRegistry, monitor_event_loop_lag, record_tokens, stage_timer,
+)
+
+
+class Payload(BaseModel):
+    word: str
+
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.post("/work/{item}")
+async def work(item: str, payload: Payload):
+    with stage_timer("build"):
+        pass
+    record_tokens("openai", "model", {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10})
+    if payload.word == "missing":
+        raise HTTPException(status_code=404, detail="not found")
+    return {"item": item}
+
+
+app = FastAPI()
+app.include_router(router, prefix="/test")
+client = TestClient(app)
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ["kind"])
+    histogram = registry.histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+    counter.inc(kind='say "hi"')
+    counter.inc(2, kind='say "hi"')
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{kind="say \\"hi\\""} 3' in lines
+    assert 'wait_seconds_bucket{le="0.1"} 1' in lines
+    assert 'wait_seconds_bucket{le="1"} 2' in lines
+    assert 'wait_seconds_bucket{le="+Inf"} 3' in lines
+    assert "wait_seconds_sum 5.55" in lines
+    assert "wait_seconds_count 3" in lines
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_route_metrics_are_labelled_with_the_route_template():
+    endpoint = "/test/work/{item}"
+    before = STAGE_DURATION.count(endpoint=endpoint, stage="parse")
+
+    assert client.post("/test/work/a", json={"word": "cat"}).status_code == 200
+    assert client.post("/test/work/b", json={"word": "missing"}).status_code == 404
+    assert client.post("/test/work/c", json={}).status_code == 422
+
+    # Requests failing validation never reach the endpoint
+    assert STAGE_DURATION.count(endpoint=endpoint, stage="parse") == before + 2
+    assert STAGE_DURATION.count(endpoint=endpoint, stage="build") >= 2
+    assert HTTP_REQUEST_DURATION.count(endpoint=endpoint, method="POST", status="200") >= 1
+    assert HTTP_ERRORS.get(endpoint=endpoint, type="http_404") >= 1
+    assert HTTP_ERRORS.get(endpoint=endpoint, type="validation") >= 1
+    assert HTTP_REQUESTS_IN_FLIGHT.get(endpoint=endpoint) == 0
+    assert UPSTREAM_TOKENS.get(provider="openai", model="model", endpoint=endpoint, type="prompt") >= 14
+
+
+def test_event_loop_lag_probe_sees_blocking_work():
+    before = EVENT_LOOP_LAG.count()
+
+    async def main():
+        probe = asyncio.ensure_future(monitor_event_loop_lag(0.01))
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop
+        await asyncio.sleep(0.05)
+        probe.cancel()
+
+    asyncio.run(main())
+    _, total = EVENT_LOOP_LAG.values[()]
+    assert EVENT_LOOP_LAG.count() > before
+    assert total[0] >= 0.15
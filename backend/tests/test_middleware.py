@@ -0,0 +1,60 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.middleware import BodySizeLimitMiddleware
+
+app = FastAPI()
+app.add_middleware(BodySizeLimitMiddleware, max_body_bytes=1024)
+
+
+@app.post("/echo")
+async def echo(payload: dict):
+    return {"size": len(payload.get("data", ""))}
+
+
+@app.post("/stream")
+async def stream(request: Request):
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    return {"size": size}
+
+
+client = TestClient(app)
+
+
+def test_small_body_passes():
+    response = client.post("/echo", json={"data": "x" * 100})
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_declared_length_rejected_before_parsing():
+    response = client.post("/echo", json={"data": "x" * 2048})
+    assert response.status_code == 413
+
+
+def test_undeclared_streamed_body_rejected():
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 512
+
+    response = client.post("/stream", content=chunks())
+    assert response.status_code == 413
+
+
+def test_413_carries_cors_headers_in_the_app():
+    from fastapi.middleware.cors import CORSMiddleware
+    from app.main import app as main_app
+
+    # The first middleware is the outermost: CORS must wrap the size limit
+    assert [middleware.cls for middleware in main_app.user_middleware] == [CORSMiddleware, BodySizeLimitMiddleware]
+
+    cors_app = FastAPI()
+    cors_app.add_middleware(BodySizeLimitMiddleware, max_body_bytes=1024)
+    cors_app.add_middleware(CORSMiddleware, allow_origins=["*"])
+    cors_app.post("/echo")(echo)
+    response = TestClient(cors_app).post(
+        "/echo", json={"data": "x" * 2048}, headers={"Origin": "http://example.com"}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "*"
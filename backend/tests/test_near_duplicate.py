@@ -0,0 +1,36 @@
+import io
+from PIL import Image, ImageDraw
+from app.services.near_duplicate_service import NearDuplicateIndex, dhash, hamming_distance
+
+PREDICTIONS = [{"label": "house", "confidence": 0.8, "reason": "Square with a roof"}]
+
+
+def render(extra_stroke: bool = False, shape: str = "house") -> bytes:
+    img = Image.new("RGBA", (256, 256), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    if shape == "house":
+        draw.rectangle([60, 110, 196, 220], outline="black", width=6)
+        draw.polygon([(50, 110), (128, 40), (206, 110)], outline="black", width=6)
+    else:
+        draw.ellipse([40, 40, 216, 216], fill="black")
+    if extra_stroke:
+        draw.line([(110, 220), (110, 180)], fill="black", width=4)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_small_stroke_is_near_duplicate():
+    base = dhash(render())
+    assert hamming_distance(base, dhash(render(extra_stroke=True))) <= 4
+    assert hamming_distance(base, dhash(render(shape="circle"))) > 4
+
+
+def test_index_reuses_within_session_only():
+    index = NearDuplicateIndex(max_distance=4, window=5, ttl_seconds=60, max_sessions=10)
+    index.add("room1", dhash(render()), PREDICTIONS)
+
+    assert index.find("room1", dhash(render(extra_stroke=True))) == PREDICTIONS
+    assert index.find("room2", dhash(render(extra_stroke=True))) is None
+    assert index.find("room1", dhash(render(shape="circle"))) is None
+    assert index.stats()["hits"] == 1
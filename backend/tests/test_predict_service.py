@@ -0,0 +1,28 @@
+import asyncio
+from app.model import PredictionDetail, PredictionRequest
+from app.services.http_transport import HttpTransport
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictionOutput, PredictService, PreparedImage
+from app.services.provider_router import ProviderResponse
+
+
+def test_processing_time_leaves_out_the_wait_for_a_concurrency_slot(monkeypatch):
+    service = PredictService(OpenAIService(HttpTransport()))
+
+    async def parse(*args, **kwargs):
+        await asyncio.sleep(0.1)
+        output = PredictionOutput(response=[PredictionDetail(label="cat", confidence=0.9, reason="Whiskers")])
+        return ProviderResponse(output, {}, "openai", "test")
+
+    monkeypatch.setattr(service.cascade, "parse", parse)
+    request = PredictionRequest.model_construct(model="openai", top_k=1, priority="normal")
+
+    async def main():
+        service.semaphore = asyncio.Semaphore(1)
+        return await asyncio.gather(*[
+            service._predict_single(request, PreparedImage(f"img_{idx}", f"key_{idx}", "data:")) for idx in range(2)
+        ])
+
+    first, second = asyncio.run(main())
+    # The second image waited ~100ms for the first one's slot; that is not processing time
+    assert first.processing_time_ms < 190 and second.processing_time_ms < 190
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.api.dependencies import get_predict_service
+from app.config import get_settings
+from app.main import app
+from app.model import ImageInput, JudgeRequest, PredictionRequest
+from app.services.http_transport import HttpTransport
+from app.services.image_service import InvalidImageError
+from app.services.openai_service import OpenAIService
+from app.services.predict_service import PredictService
+from app.services.provider_router import UpstreamResponseError
+from tests.conftest import png
+
+
+def stream_events(service, request):
+    async def main():
+        return [event async for event in await service.predict_images_stream(request)]
+
+    return asyncio.run(main())
+
+
+def request_for(count):
+    return PredictionRequest(
+        images=[ImageInput(image_id=f"img_{idx}", base64_data=png(32 + idx)) for idx in range(count)],
+        model="openai",
+    )
+
+
+def test_partials_come_before_their_prediction_and_summary_is_last(fake):
+    service = PredictService(OpenAIService(HttpTransport()))
+    events = stream_events(service, request_for(2))
+
+    names = [event for event, _ in events]
+    assert names[-1] == "summary" and names.count("summary") == 1
+    for image_id in ("img_0", "img_1"):
+        own = [event for event, data in events if data.get("image_id") == image_id]
+        assert own[-1] == "prediction" and own.count("prediction") == 1
+        assert "partial" in own
+    summary = events[-1][1]
+    assert summary["status"] == "success"
+    assert (summary["total_images"], summary["failed"], summary["reused"]) == (2, 0, 0)
+
+
+def test_failed_images_get_an_error_event(fake, monkeypatch):
+    monkeypatch.setattr(get_settings(), "PROVIDER_MAX_RETRIES", 0)
+    monkeypatch.setattr(get_settings(), "PROVIDER_HEDGE_ENABLED", False)
+    service = PredictService(OpenAIService(HttpTransport()))
+    fake.error_rate = 1.0
+    events = stream_events(service, request_for(2))
+
+    errors = [data for event, data in events if event == "error"]
+    assert sorted(error["image_id"] for error in errors) == ["img_0", "img_1"]
+    assert all(error["error_message"] for error in errors)
+    assert events[-1][0] == "summary"
+    assert events[-1][1]["status"] == "error" and events[-1][1]["failed"] == 2
+
+
+def test_stream_route_sends_server_sent_events(monkeypatch):
+    async def events():
+        yield "partial", {"image_id": "img_0", "label": "cat"}
+        yield "error", {"image_id": "img_1", "error_message": "upstream down"}
+        yield "summary", {"status": "error", "failed": 1}
+
+    async def predict_images_stream(request, image_bytes=None):
+        return events()
+
+    monkeypatch.setattr(get_predict_service(), "predict_images_stream", predict_images_stream)
+    response = TestClient(app).post("/api/v1/predict/stream", json=request_for(2).model_dump())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+    assert [frame[0] for frame in frames] == ["event: partial", "event: error", "event: summary"]
+    assert json.loads(frames[1][1][len("data: "):]) == {"image_id": "img_1", "error_message": "upstream down"}
+
+
+def test_unusable_model_output_is_an_upstream_error(fake, monkeypatch):
+    monkeypatch.setattr("benchmarks.fake_provider.LABELS", ["ice cream"])
+    monkeypatch.setattr(get_settings(), "PROVIDER_HEDGE_ENABLED", False)
+    service = PredictService(OpenAIService(HttpTransport()))
+
+    async def main():
+        messages = []
+        for call in (
+            service.predict_images(request_for(1)),
+            service.judge(JudgeRequest(image=request_for(1).images[0], topic="cat", model="openai")),
+        ):
+            with pytest.raises(UpstreamResponseError) as error:
+                await call
+            messages.append(str(error.value))
+        return messages
+
+    predict, judge = asyncio.run(main())
+    assert "PredictionOutput" in predict and "JudgeOutput" in judge
+    assert "validation error" not in predict + judge
+
+
+def test_upstream_errors_are_a_502(monkeypatch):
+    async def predict_images(request, image_bytes=None):
+        raise UpstreamResponseError("Provider openai returned output not matching PredictionOutput")
+
+    monkeypatch.setattr(get_predict_service(), "predict_images", predict_images)
+    response = TestClient(app).post("/api/v1/predict", json=request_for(1).model_dump())
+    assert response.status_code == 502
+    assert response.json()["detail"] == "Provider openai returned output not matching PredictionOutput"
+
+
+def test_invalid_images_are_rejected_before_the_stream_starts(monkeypatch):
+    async def predict_images_stream(request, image_bytes=None):
+        raise InvalidImageError("Could not decode image")
+
+    monkeypatch.setattr(get_predict_service(), "predict_images_stream", predict_images_stream)
+    response = TestClient(app).post("/api/v1/predict/stream", json=request_for(1).model_dump())
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Could not decode image"
@@ -0,0 +1,190 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.services.provider_router import (
+    CircuitBreaker, LatencyHistogram, ProviderResponse, ProviderRouter, ProviderUnavailableError,
+    UpstreamResponseError,
+)
+
+
+class Output(BaseModel):
+    label: str
+
+
+class Transient(Exception):
+    pass
+
+
+class FakeProvider:
+    def __init__(self, name, delay=0.0, failures=0, error=Transient):
+        self.name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def parse(self, messages, response_format, max_tokens, model=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failures:
+            self.failures -= 1
+            raise self.error(f"{self.name} failed")
+        return ProviderResponse(response_format(label=self.name), {"total_tokens": 1}, self.name, model)
+
+    @staticmethod
+    def retryable(error):
+        return isinstance(error, Transient)
+
+
+def make_router(primary, backup=None, **kwargs):
+    providers = {"openai": primary}
+    if backup is not None:
+        providers["gemini"] = backup
+    options = dict(hedge_min_samples=1, hedge_min_delay_ms=10, retry_base_ms=1, retry_max_ms=5)
+    options.update(kwargs)
+    return ProviderRouter(providers, **options)
+
+
+def call(router, provider=None):
+    return asyncio.run(router.parse([], Output, 10, provider=provider))
+
+
+def test_histogram_percentiles_follow_the_recent_window():
+    histogram = LatencyHistogram(window=10)
+    assert histogram.percentile(0.95) is None
+    for latency in [40] * 9 + [900]:
+        histogram.record(latency)
+    assert histogram.percentile(0.5) == 50
+    assert histogram.percentile(0.95) == 1000
+    for latency in [40] * 10:
+        histogram.record(latency)
+    # The slow call has left the window
+    assert histogram.percentile(0.99) == 50
+    assert histogram.total == 20
+
+
+def test_request_model_picks_the_provider():
+    router = make_router(FakeProvider("openai"), FakeProvider("gemini"))
+    assert call(router, "gemini").provider == "gemini"
+    assert call(router, "OpenAI").provider == "openai"
+    # Unknown names use the default provider
+    assert call(router, "gemni").provider == "openai"
+
+
+def test_slow_primary_is_hedged_on_the_backup():
+    primary = FakeProvider("openai", delay=0.5)
+    router = make_router(primary, FakeProvider("gemini"), hedge_max_delay_ms=20)
+
+    result = call(router)
+
+    assert result.provider == "gemini"
+    assert router.hedges == 1 and router.hedge_wins == 1
+    # The loser is cancelled and its elapsed time still counts as a sample
+    assert primary.cancelled == 1
+    assert router.provider_stats["openai"].latency["openai-model"].total == 1
+
+
+def test_hedge_delay_comes_from_the_latency_percentile():
+    router = make_router(FakeProvider("openai"), FakeProvider("gemini"), hedge_min_samples=5)
+    assert router.hedge_delay("openai") == router.hedge_max_delay
+    for _ in range(5):
+        router.provider_stats["openai"].latency_for("openai-model").record(1200)
+    assert router.hedge_delay("openai") == 1.5
+    # The small model has its own latency and falls back to the maximum delay
+    assert router.hedge_delay("openai", "openai-small") == router.hedge_max_delay
+
+
+def test_retryable_errors_are_retried_on_the_same_provider():
+    primary = FakeProvider("openai", failures=2)
+    router = make_router(primary, hedge_enabled=False, max_retries=2)
+
+    assert call(router).provider == "openai"
+    assert primary.calls == 3
+    assert router.provider_stats["openai"].retries == 2
+
+
+def test_failed_provider_fails_over_to_the_next():
+    primary = FakeProvider("openai", failures=1, error=ValueError)
+    backup = FakeProvider("gemini")
+    router = make_router(primary, backup)
+
+    assert call(router).provider == "gemini"
+    # Not retryable: no second attempt on the primary
+    assert primary.calls == 1
+    assert router.failovers == 1
+
+
+def test_open_circuit_skips_the_provider_until_reset():
+    primary = FakeProvider("openai", failures=2, error=ValueError)
+    backup = FakeProvider("gemini")
+    router = make_router(primary, backup, breaker_failures=2, breaker_reset_seconds=60)
+
+    call(router)
+    call(router)
+    assert router.breakers["openai"].state == "open"
+
+    assert call(router).provider == "gemini"
+    assert primary.calls == 2
+
+
+def test_every_circuit_open_raises():
+    router = make_router(FakeProvider("openai", failures=1, error=ValueError), breaker_failures=1)
+    with pytest.raises(ValueError):
+        call(router)
+    with pytest.raises(ProviderUnavailableError):
+        call(router)
+
+
+def test_a_retried_call_counts_as_one_failure():
+    primary = FakeProvider("openai", failures=3)
+    router = make_router(primary, breaker_failures=2, max_retries=2)
+    with pytest.raises(Transient):
+        call(router)
+    assert primary.calls == 3
+    assert router.breakers["openai"].stats()["consecutive_failures"] == 1
+    assert router.breakers["openai"].state == "closed"
+
+
+def test_invalid_output_neither_trips_the_circuit_nor_fails_over():
+    primary = FakeProvider("openai", failures=1, error=UpstreamResponseError)
+    backup = FakeProvider("gemini")
+    router = make_router(primary, backup, breaker_failures=1, hedge_enabled=False)
+    with pytest.raises(UpstreamResponseError):
+        call(router)
+    assert primary.calls == 1 and backup.calls == 0
+    assert router.breakers["openai"].state == "closed"
+    assert router.stats()["providers"]["openai"]["invalid_outputs"] == 1
+
+
+def test_half_open_circuit_lets_one_probe_through(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10)
+    now = [100.0]
+    monkeypatch.setattr("app.services.provider_router.time.monotonic", lambda: now[0])
+
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_warm_up_builds_clients_and_tolerates_failures():
+    warmed = []
+
+    class WarmingProvider(FakeProvider):
+        def warm_up(self):
+            if self.name == "gemini":
+                raise RuntimeError("SDK not installed")
+            warmed.append(self.name)
+
+    router = make_router(WarmingProvider("openai"), WarmingProvider("gemini"))
+    asyncio.run(router.warm_up())
+    assert warmed == ["openai"]
@@ -0,0 +1,49 @@
+import io
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+from app.model import ImageInput, StrokePath
+from app.services.rasterizer import _scaled_points, rasterize_strokes
+
+
+def test_object_and_pair_points_are_equivalent():
+    objects = StrokePath.model_validate({"paths": [{"x": 1, "y": 2}, {"x": 3.5, "y": 4}]})
+    pairs = StrokePath.model_validate({"paths": [[1, 2], [3.5, 4]]})
+    assert objects.paths == pairs.paths == [(1.0, 2.0), (3.5, 4.0)]
+
+
+def test_points_on_the_same_pixel_are_dropped():
+    # 1000 pointer events along a 100px line, scaled down 4x to 25 pixels
+    stroke = StrokePath(paths=[(i / 10, 0.0) for i in range(1000)])
+    points = _scaled_points(stroke, 0.25)
+    assert len(points) <= 27
+    assert points[0] == (0.0, 0.0)
+    assert points[-1] == pytest.approx((999 / 10 * 0.25, 0.0))
+
+
+def test_rasterizes_to_model_resolution():
+    strokes = [StrokePath(paths=[(100.0, 100.0), (700.0, 500.0)], stroke_width=8.0)]
+    png = rasterize_strokes(strokes, 800, 600, size=128)
+
+    with Image.open(io.BytesIO(png)) as img:
+        assert img.format == "PNG"
+        assert img.size == (128, 128)
+        # Ink bounding box: the line scaled by 128 / 800, plus its round caps
+        left, top, right, bottom = Image.eval(img.convert("L"), lambda v: 255 - v).getbbox()
+        assert (left, top) == pytest.approx((15, 15), abs=2)
+        assert (right, bottom) == pytest.approx((113, 81), abs=2)
+
+
+def test_image_input_requires_one_source():
+    with pytest.raises(ValidationError):
+        ImageInput(image_id="a")
+    with pytest.raises(ValidationError):
+        ImageInput(image_id="a", base64_data="iVBORw0K", strokes=[StrokePath(paths=[(0.0, 0.0)])])
+    with pytest.raises(ValidationError, match="at least one stroke"):
+        ImageInput(image_id="a", strokes=[], canvas_width=800, canvas_height=600)
+    with pytest.raises(ValidationError, match="canvas_width"):
+        ImageInput(image_id="a", strokes=[StrokePath(paths=[(0.0, 0.0)])])
+
+    image = ImageInput(image_id="a", strokes=[StrokePath(paths=[(0.0, 0.0)])], canvas_width=800, canvas_height=600)
+    assert image.base64_data is None
+    assert image.format == "image/png"
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from app.services.lexicon import Lexicon
+from app.services.similarity_service import SimilarityService
+
+
+class CachingOpenAIService:
+    """Counts upstream calls; scores are cached per pair like the real service."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache = {}
+
+    async def compare_semantics(self, word1, word2, priority="normal"):
+        return (await self.compare_batch(word1, [word2]))[0]
+
+    async def compare_batch(self, reference, candidates, priority="normal"):
+        missing = [word for word in candidates if (reference, word) not in self.cache]
+        if missing:
+            self.calls += 1
+            self.cache.update({(reference, word): 0.5 for word in missing})
+        return [self.cache[(reference, word)] for word in candidates]
+
+
+def test_warmup_scores_every_pair_so_rounds_hit_the_cache(tmp_path):
+    path = tmp_path / "warmup.json"
+    path.write_text(json.dumps({"topics": ["cat", "car"], "labels": ["dog", "Cats", "truck", "automobile"]}))
+    llm = CachingOpenAIService()
+    service = SimilarityService(llm, lexicon=Lexicon())
+
+    asyncio.run(service.warm_up_from_file(str(path)))
+    warmup = service.stats()["warmup"]
+    assert warmup["status"] == "done"
+    assert warmup["done"] == warmup["pairs"] == 2 * 6  # topics count as labels too
+    assert llm.calls == 2  # one batch per topic
+
+    scores = asyncio.run(service.compare_batch("car", ["automobiles", "truck", "dog", "cat"]))
+    assert scores == [1.0, 0.5, 0.5, 0.5]
+    assert llm.calls == 2
+
+
+def test_warmup_progress_counts_distinct_pairs():
+    llm = CachingOpenAIService()
+    service = SimilarityService(llm, lexicon=Lexicon())
+    asyncio.run(service.warm_up(["cat", "cat", "car"], ["dog", "truck", "dog"]))
+    warmup = service.stats()["warmup"]
+    assert warmup["done"] == warmup["pairs"] == 2 * 2
+
+
+def test_missing_warmup_file_is_reported():
+    service = SimilarityService(CachingOpenAIService())
+    asyncio.run(service.warm_up_from_file("/nonexistent/warmup.json"))
+    assert service.stats()["warmup"]["status"] == "error"
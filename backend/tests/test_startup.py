@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys
+from app.config import Settings
+
+parsed = []
+original = Settings.__init__
+def counting_init(self, *args, **kwargs):
+    parsed.append(1)
+    original(self, *args, **kwargs)
+Settings.__init__ = counting_init
+
+import app.main
+print(len(parsed))
+
+from app.api.dependencies import get_job_manager
+get_job_manager()
+print(len(parsed), "openai" in sys.modules, "google.generativeai" in sys.modules)
+"""
+
+
+def test_app_import_defers_settings_and_provider_sdks():
+    env = dict(os.environ, OPENAI_API_KEY="test", GEMINI_API_KEY="test", SIMILARITY_WARMUP_PATH="")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    # Nothing is configured at import; building the services parses settings once
+    assert result.stdout.split() == ["0", "1", "False", "False"]
+
+
+def test_app_imports_without_api_keys():
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "GEMINI_API_KEY")}
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND_DIR, env=env, check=True)
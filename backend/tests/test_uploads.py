@@ -0,0 +1,95 @@
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.api.dependencies import get_predict_service
+from app.main import app
+from app.model import MAX_IMAGE_BYTES, PredictionResponse
+
+client = TestClient(app)
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record what reaches the prediction pipeline instead of calling a model."""
+    calls = []
+
+    async def predict_images(request, image_bytes=None):
+        calls.append((request, image_bytes))
+        return PredictionResponse(
+            request_id="test", status="success", model=request.model, top_k=request.top_k, results=[]
+        )
+
+    monkeypatch.setattr(get_predict_service(), "predict_images", predict_images)
+    return calls
+
+
+def test_upload_passes_raw_bytes_and_ids(calls):
+    data = png_bytes()
+    response = client.post(
+        "/api/v1/predict/upload",
+        files=[("files", ("a.png", data, "image/png")), ("files", ("b.png", data, "image/png"))],
+        data={"model": "openai", "image_ids": ["first", "second"]},
+    )
+    assert response.status_code == 200
+    [(request, image_bytes)] = calls
+    assert [image.image_id for image in request.images] == ["first", "second"]
+    assert [image.format for image in request.images] == ["image/png", "image/png"]
+    assert image_bytes == [data, data]
+
+
+def test_upload_rejects_unknown_formats_by_magic_bytes(calls):
+    response = client.post(
+        "/api/v1/predict/upload",
+        files=[("files", ("fake.png", b"not really a png", "image/png"))],
+        data={"model": "openai"},
+    )
+    assert response.status_code == 415
+    assert not calls
+
+
+def test_upload_rejects_oversized_files(calls):
+    data = png_bytes() + b"\0" * MAX_IMAGE_BYTES
+    response = client.post(
+        "/api/v1/predict/upload", files=[("files", ("big.png", data, "image/png"))], data={"model": "openai"}
+    )
+    assert response.status_code == 413
+    assert not calls
+
+
+def test_upload_image_ids_must_match_files(calls):
+    response = client.post(
+        "/api/v1/predict/upload",
+        files=[("files", ("a.png", png_bytes(), "image/png"))],
+        data={"model": "openai", "image_ids": ["first", "second"]},
+    )
+    assert response.status_code == 400
+    assert "image_ids" in response.json()["detail"]
+    assert not calls
+
+
+def test_raw_upload(calls):
+    data = png_bytes()
+    response = client.post(
+        "/api/v1/predict/raw?model=openai&image_id=img_1", content=data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 200
+    [(request, image_bytes)] = calls
+    assert request.images[0].image_id == "img_1"
+    assert image_bytes == [data]
+
+
+def test_raw_upload_rejections(calls):
+    headers = {"Content-Type": "application/octet-stream"}
+    assert client.post("/api/v1/predict/raw?model=openai", content=b"GIF", headers=headers).status_code == 415
+    assert client.post("/api/v1/predict/raw?model=openai", content=b"", headers=headers).status_code == 400
+    oversized = png_bytes() + b"\0" * MAX_IMAGE_BYTES
+    assert client.post("/api/v1/predict/raw?model=openai", content=oversized, headers=headers).status_code == 413
+    assert not calls
@@ -0,0 +1,164 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.services.provider_router import OverloadedError, ProviderRouter, ProviderUnavailableError
+from app.services.upstream_scheduler import UpstreamScheduler, estimate_tokens
+
+DEADLINES = {"final": 5000, "normal": 5000, "preview": 5000, "background": 5000}
+
+
+def drained_scheduler(rpm=1200, tpm=0, **kwargs):
+    """Scheduler whose request bucket is empty and refills 20 requests per second."""
+    options = dict(deadlines_ms=DEADLINES)
+    options.update(kwargs)
+    scheduler = UpstreamScheduler({"openai": (rpm, tpm)}, **options)
+    scheduler.budgets["openai"].requests.level = 0
+    return scheduler
+
+
+def test_calls_within_budget_are_admitted_immediately():
+    scheduler = UpstreamScheduler({"openai": (60, 1000)})
+
+    async def main():
+        await scheduler.acquire("openai", 400, "preview")
+        await scheduler.acquire("openai", 400, "preview")
+
+    asyncio.run(main())
+    stats = scheduler.stats()
+    assert stats["priorities"]["preview"]["admitted"] == 2
+    assert stats["priorities"]["preview"]["queued"] == 0
+    assert stats["providers"]["openai"]["tokens_available"] == pytest.approx(200, abs=1)
+
+
+def test_queued_calls_are_served_by_priority():
+    scheduler = drained_scheduler()
+    order = []
+
+    async def call(priority):
+        await scheduler.acquire("openai", 1, priority)
+        order.append(priority)
+
+    async def main():
+        await asyncio.gather(call("preview"), call("normal"), call("preview"), call("final"))
+
+    asyncio.run(main())
+    assert order == ["final", "normal", "preview", "preview"]
+    assert scheduler.stats()["priorities"]["final"]["wait"]["samples"] == 1
+
+
+def test_calls_that_cannot_make_their_deadline_are_shed_with_retry_after():
+    scheduler = drained_scheduler(rpm=60, deadlines_ms=dict(DEADLINES, preview=100))
+
+    with pytest.raises(OverloadedError) as error:
+        asyncio.run(scheduler.acquire("openai", 1, "preview"))
+    assert error.value.retry_after >= 1
+    assert scheduler.stats()["priorities"]["preview"]["shed"] == 1
+
+
+def test_full_queue_displaces_the_lowest_priority_waiter():
+    scheduler = drained_scheduler(max_queue=1)
+
+    async def main():
+        preview = asyncio.ensure_future(scheduler.acquire("openai", 1, "preview"))
+        await asyncio.sleep(0)
+        await scheduler.acquire("openai", 1, "final")
+        return await asyncio.gather(preview, return_exceptions=True)
+
+    [preview] = asyncio.run(main())
+    assert isinstance(preview, OverloadedError)
+    assert scheduler.stats()["priorities"]["final"]["admitted"] == 1
+
+
+def test_settle_returns_unused_tokens():
+    scheduler = UpstreamScheduler({"openai": (0, 1000)})
+    asyncio.run(scheduler.acquire("openai", 600))
+    scheduler.settle("openai", 600, 150)
+    assert scheduler.budgets["openai"].tokens.level == pytest.approx(850, abs=1)
+
+
+def test_token_estimate_counts_text_images_and_completion():
+    messages = [
+        {"role": "system", "content": "x" * 400},
+        {"role": "user", "content": [
+            {"type": "text", "text": "Image 1:"},
+            {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+        ]},
+    ]
+    assert estimate_tokens(messages, 300) == 102 + 85 + 300
+
+
+class Output(BaseModel):
+    label: str
+
+
+class RateLimited(Exception):
+    status_code = 429
+    response = None
+
+
+class RateLimitedProvider:
+    name = "openai"
+    model = "model"
+
+    async def parse(self, messages, response_format, max_tokens, model=None):
+        raise RateLimited("rate limit exceeded")
+
+    @staticmethod
+    def retryable(error):
+        return False
+
+
+def test_provider_rate_limits_surface_as_overloaded():
+    router = ProviderRouter({"openai": RateLimitedProvider()})
+    with pytest.raises(OverloadedError):
+        asyncio.run(router.parse([], Output, 10))
+
+
+def test_saturated_providers_report_the_earliest_retry_after():
+    scheduler = UpstreamScheduler({"openai": (60, 0), "gemini": (6, 0)}, deadlines_ms=dict(DEADLINES, normal=100))
+    scheduler.budgets["openai"].requests.level = 0
+    scheduler.budgets["gemini"].requests.level = 0
+    gemini = RateLimitedProvider()
+    gemini.name = "gemini"
+    router = ProviderRouter({"openai": RateLimitedProvider(), "gemini": gemini}, scheduler=scheduler)
+
+    with pytest.raises(OverloadedError) as error:
+        asyncio.run(router.parse([], Output, 10))
+    assert error.value.retry_after == 1
+
+
+class FlakyProvider(RateLimitedProvider):
+    def __init__(self):
+        self.breaker = None
+
+    async def parse(self, messages, response_format, max_tokens, model=None):
+        # Other calls failing meanwhile open the circuit before this one retries
+        self.breaker.record_failure()
+        raise TimeoutError("upstream timed out")
+
+    @staticmethod
+    def retryable(error):
+        return True
+
+
+def test_calls_rejected_by_the_circuit_are_not_charged():
+    scheduler = UpstreamScheduler({"openai": (60, 0)})
+    requests = scheduler.budgets["openai"].requests
+    provider = FlakyProvider()
+    router = ProviderRouter(
+        {"openai": provider}, scheduler=scheduler, breaker_failures=1, max_retries=2,
+        retry_base_ms=1, retry_max_ms=1,
+    )
+    provider.breaker = router.breakers["openai"]
+
+    # The circuit opens during the first attempt, so the retry is rejected before it is admitted
+    with pytest.raises(ProviderUnavailableError):
+        asyncio.run(router.parse([], Output, 10))
+    assert requests.level == pytest.approx(59, abs=0.1)
+
+    # A circuit that opens while the call waits for admission refunds the charge
+    router.breakers["openai"].record_success()
+    router.breakers["openai"].allow = lambda: False
+    with pytest.raises(ProviderUnavailableError):
+        asyncio.run(router.parse([], Output, 10))
+    assert requests.level == pytest.approx(59, abs=0.1)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+import pytest
+from app.services.worker_pool import WorkerPool
+
+
+def slow_square(value: int) -> int:
+    time.sleep(0.05)
+    return value * value
+
+
+def fail() -> None:
+    raise ValueError("boom")
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_runs_work_off_the_event_loop(kind):
+    pool = WorkerPool(kind, max_workers=2)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        results = await asyncio.gather(*[pool.run(slow_square, n) for n in range(4)])
+        task.cancel()
+        return results, ticks
+
+    try:
+        results, ticks = asyncio.run(main())
+        assert results == [0, 1, 4, 9]
+        # The loop kept running while the workers were busy
+        assert ticks >= 5
+        stats = pool.stats()
+        assert stats["completed"] == 4
+        assert stats["queue_depth"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_errors_propagate_and_are_counted():
+    pool = WorkerPool("thread", max_workers=1)
+    with pytest.raises(ValueError):
+        asyncio.run(pool.run(fail))
+    assert pool.stats()["failed"] == 1
+    pool.shutdown()
@@ -641,32 +641,30 @@ const Game = () => {
     console.log("HI PLAYERS");
   }, [players]);
 
-  const predictDrawing = async (base64Image: string) => {
+  const judgeDrawing = async (base64Image: string) => {
     try {
       const response = await fetch(
-        "https://art-ificialfailure-backend.fly.dev/api/v1/predict",
+        "https://art-ificialfailure-backend.fly.dev/api/v1/judge",
         {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
           },
           body: JSON.stringify({
-            images: [
-              {
-                image_id: `round_${currentRound}`,
-                base64_data: base64Image.split(",")[1], // Remove data URL prefix
-                format: "image/png",
-              },
-            ],
+            image: {
+              image_id: `round_${currentRound}`,
+              base64_data: base64Image.split(",")[1], // Remove data URL prefix
+              format: "image/png",
+            },
+            topic: topic,
             model: "openai",
             top_k: 3,
-            confidence_threshold: 0.5,
           }),
         }
       );
 
       const data = await response.json();
-      console.log("Prediction response:", data);
+      console.log("Judge response:", data);
       return data;
     } catch (error) {
       console.error("Error getting predictions:", error);
@@ -704,33 +702,11 @@ const Game = () => {
       // Get the canvas image as base64
       const imageData = await canvasRef.current.exportImage("png");
 
-      // Get predictions first
-      let predict = await predictDrawing(imageData);
-      console.log(predict);
-      let prediction = predict["results"][0]["predictions"][0];
+      // Predictions and their similarity to the topic in one request
+      let judged = await judgeDrawing(imageData);
+      console.log(judged);
+      let prediction = judged["predictions"][0];
       await addGuessData("1", prediction["label"], prediction["confidence"]);
-      try {
-        const response = await fetch(
-          "https://art-ificialfailure-backend.fly.dev/api/v1/compare",
-          {
-            method: "POST",
-            headers: {
-              "Content-Type": "application/json",
-            },
-            body: JSON.stringify({
-              word1: topic,
-              word2: prediction["label"],
-            }),
-          }
-        );
-
-        const data = await response.json();
-        console.log("Prediction response:", data);
-        prediction["similarity"] = data["similarity"];
-      } catch (error) {
-        console.error("Error getting predictions:", error);
-        throw error;
-      }
       if (!is_final) {
         return prediction;
       }